@@ -53,6 +53,7 @@ INSTALLED_APPS = [
     'notifications',
     'reports',
     'support',
+    'geo',
 ]
 
 MIDDLEWARE = [
@@ -102,6 +103,26 @@ DATABASES = {
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# geo_search holds search_nearby responses; point it at a shared backend
+# (e.g. Redis) when running several workers so invalidations reach all of them
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'geo_search': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'geo-search',
+        'TIMEOUT': 120,
+        'OPTIONS': {
+            'MAX_ENTRIES': 2000,
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -0,0 +1,167 @@
+"""
+Cart checkout.
+
+Turns every Cart row of a consumer into a ProduceOrder in one transaction:
+the produce rows are locked in primary key order, checked, and their
+available_quantity lowered with a single UPDATE; the orders are written
+with one bulk_create, and each farmer gets one notification for all of
+their items rather than one per order, queued as one outbox event.
+
+Single orders follow the same rule: take_produce lowers the quantity with a
+conditional UPDATE when the order is placed, and set_order_status gives it
+back when the order is cancelled (and takes it again if it is reinstated).
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, When, F, Sum, Count, DecimalField
+
+from farmers.models import FarmProduce
+from farmers.indexes import produce_cache
+from geo.utils import grid_cell
+from notifications.models import Notification
+from notifications.outbox import publish
+from .models import ProduceOrder, Cart
+
+
+class CheckoutError(Exception):
+    """The cart cannot be checked out as it stands"""
+
+
+def cart_totals(cart_items):
+    """{'total', 'items_count'} for a Cart queryset, summed by the database"""
+    return cart_items.aggregate(
+        total=Sum(
+            F('quantity') * F('produce__price_per_unit'),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+            default=Decimal('0'),
+        ),
+        items_count=Count('id'),
+    )
+
+
+def checkout_cart(consumer, delivery_address, notes=''):
+    """
+    Place one pending ProduceOrder per cart item, lower the produce's
+    available quantity and empty the cart. Returns the orders; raises
+    CheckoutError, leaving everything untouched, if the cart is empty or an
+    item is unavailable or short.
+    """
+    with transaction.atomic():
+        quantities = dict(
+            Cart.objects.select_for_update().filter(consumer=consumer).values_list('produce_id', 'quantity')
+        )
+        if not quantities:
+            raise CheckoutError('Your cart is empty.')
+
+        produce = list(
+            FarmProduce.objects.select_for_update(of=('self',)).filter(pk__in=quantities)
+            .select_related('farmer__user').order_by('pk')
+        )
+        for item in produce:
+            if quantities[item.pk] <= 0:
+                raise CheckoutError(f'Quantity of {item.name} must be positive.')
+            if not item.is_available:
+                raise CheckoutError(f'{item.name} is no longer available.')
+            if item.available_quantity < quantities[item.pk]:
+                raise CheckoutError(f'Insufficient quantity of {item.name}. Only {item.available_quantity} available.')
+
+        # Every row is locked and checked, so one UPDATE can take all quantities
+        FarmProduce.objects.filter(pk__in=quantities).update(available_quantity=Case(
+            *[When(pk=pk, then=F('available_quantity') - quantity) for pk, quantity in quantities.items()],
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        ))
+
+        orders = ProduceOrder.objects.bulk_create([
+            ProduceOrder(
+                consumer=consumer,
+                produce=item,
+                quantity=quantities[item.pk],
+                total_price=(quantities[item.pk] * item.price_per_unit).quantize(Decimal('0.01')),
+                delivery_address=delivery_address,
+                notes=notes,
+                status='pending',
+                payment_status='pending',
+            )
+            for item in produce
+        ])
+
+        by_farmer = defaultdict(list)
+        for order in orders:
+            by_farmer[order.produce.farmer_id].append(order)
+        notifications = [
+            Notification(
+                user=consumer.user,
+                title="Order Placed",
+                message=f"Your order for {len(orders)} item(s) has been placed successfully.",
+                notification_type='order',
+                related_object_id=f"PORD-{orders[0].id}"
+            )
+        ]
+        for farmer_orders in by_farmer.values():
+            names = ', '.join(order.produce.name for order in farmer_orders)
+            notifications.append(Notification(
+                user=farmer_orders[0].produce.farmer.user,
+                title="New Sale Received",
+                message=f"You have received a new order for {names} from {consumer.user.username}.",
+                notification_type='order',
+                related_object_id=f"PORD-{farmer_orders[0].id}"
+            ))
+        publish('order_placed', notifications)
+
+        Cart.objects.filter(consumer=consumer).delete()
+
+    # queryset.update() sends no post_save, so expire cached searches showing the old quantities here
+    for farmer_orders in by_farmer.values():
+        user = farmer_orders[0].produce.farmer.user
+        produce_cache.invalidate_cell(grid_cell(user.latitude, user.longitude))
+    return orders
+
+
+def invalidate_produce_cell(produce_id):
+    # queryset.update() sends no post_save, so expire cached searches showing the old quantity here
+    location = FarmProduce.objects.filter(pk=produce_id).values_list(
+        'farmer__user__latitude', 'farmer__user__longitude'
+    ).first()
+    if location is not None:
+        produce_cache.invalidate_cell(grid_cell(*location))
+
+
+def take_produce(produce_id, quantity):
+    """Lower a produce's available quantity with one conditional UPDATE; CheckoutError if short or unavailable"""
+    if quantity <= 0:
+        raise CheckoutError('Quantity must be positive.')
+    taken = FarmProduce.objects.filter(
+        pk=produce_id, is_available=True, available_quantity__gte=quantity
+    ).update(available_quantity=F('available_quantity') - quantity)
+    if not taken:
+        available = FarmProduce.objects.filter(pk=produce_id, is_available=True).values_list('available_quantity', flat=True).first()
+        if available is None:
+            raise CheckoutError('This produce is no longer available.')
+        raise CheckoutError(f'Insufficient quantity. Only {available} available.')
+    transaction.on_commit(lambda: invalidate_produce_cell(produce_id))
+
+
+def return_produce(produce_id, quantity):
+    """Give a cancelled order's quantity back to its produce"""
+    FarmProduce.objects.filter(pk=produce_id).update(available_quantity=F('available_quantity') + quantity)
+    transaction.on_commit(lambda: invalidate_produce_cell(produce_id))
+
+
+def set_order_status(order, new_status):
+    """
+    Move a ProduceOrder to new_status, returning its quantity to the produce
+    on cancellation and taking it again if a cancelled order is reinstated.
+    Returns the updated order; raises CheckoutError if the quantity is gone.
+    """
+    with transaction.atomic():
+        # Lock the order so two concurrent updates cannot both move its quantity
+        order = ProduceOrder.objects.select_for_update().get(pk=order.pk)
+        if new_status == 'cancelled' and order.status != 'cancelled':
+            return_produce(order.produce_id, order.quantity)
+        elif order.status == 'cancelled' and new_status != 'cancelled':
+            take_produce(order.produce_id, order.quantity)
+        order.status = new_status
+        order.save(update_fields=['status', 'updated_at'])
+    return order
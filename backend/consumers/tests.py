@@ -1,3 +1,97 @@
+from decimal import Decimal
+
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from farmers.models import FarmerProfile, FarmProduce
+from notifications.models import NotificationEvent
+from .models import ConsumerProfile, ProduceOrder, Cart
+
+
+class ProduceOrderTests(TestCase):
+    """Cart checkout and single produce orders moving available_quantity"""
+
+    @classmethod
+    def setUpTestData(cls):
+        farmer_users = [
+            User.objects.create_user(
+                username=f'farmer{i}', password='pass', phone_number=f'900000000{i}', user_type='farmer'
+            )
+            for i in range(2)
+        ]
+        cls.tomatoes, cls.onions = (
+            FarmProduce.objects.create(
+                farmer=FarmerProfile.objects.create(user=user), name=name, category='vegetables',
+                price_per_unit=Decimal(price), unit='kg', quantity=Decimal('20'), available_quantity=Decimal('20')
+            )
+            for user, name, price in zip(farmer_users, ('Tomatoes', 'Onions'), ('30', '25'))
+        )
+        cls.user = User.objects.create_user(
+            username='consumer', password='pass', phone_number='9000000009', user_type='consumer'
+        )
+        cls.consumer = ConsumerProfile.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertAvailable(self, produce, quantity):
+        produce.refresh_from_db()
+        self.assertEqual(produce.available_quantity, Decimal(quantity))
+
+    def test_cart_checkout(self):
+        Cart.objects.create(consumer=self.consumer, produce=self.tomatoes, quantity=Decimal('3'))
+        Cart.objects.create(consumer=self.consumer, produce=self.onions, quantity=Decimal('2.5'))
+
+        response = self.client.post(reverse('cart-checkout'), {'delivery_address': 'Main road'}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Decimal(response.data['total']), Decimal('152.50'))
+        self.assertEqual(ProduceOrder.objects.filter(consumer=self.consumer, status='pending').count(), 2)
+        self.assertFalse(Cart.objects.exists())
+        self.assertAvailable(self.tomatoes, '17')
+        self.assertAvailable(self.onions, '17.5')
+        # The consumer and both farmers, queued as one event
+        [event] = NotificationEvent.objects.all()
+        self.assertEqual(len(event.payload), 3)
+
+    def test_short_item_rejects_whole_cart(self):
+        Cart.objects.create(consumer=self.consumer, produce=self.tomatoes, quantity=Decimal('3'))
+        Cart.objects.create(consumer=self.consumer, produce=self.onions, quantity=Decimal('21'))
+
+        response = self.client.post(reverse('cart-checkout'), {'delivery_address': 'Main road'}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ProduceOrder.objects.exists())
+        self.assertEqual(Cart.objects.count(), 2)
+        self.assertAvailable(self.tomatoes, '20')
+
+    def test_cancelling_returns_quantity(self):
+        response = self.client.post(reverse('produce-order-list'), {
+            'consumer': self.consumer.pk, 'produce': self.tomatoes.pk, 'quantity': '4',
+            'total_price': '120', 'delivery_address': 'Main road',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertAvailable(self.tomatoes, '16')
+        url = reverse('produce-order-update-status', args=[response.data['id']])
+
+        self.assertEqual(self.client.post(url, {'status': 'cancelled'}, format='json').status_code, 200)
+        self.assertAvailable(self.tomatoes, '20')
+        # A second cancellation gives nothing back twice
+        self.client.post(url, {'status': 'cancelled'}, format='json')
+        self.assertAvailable(self.tomatoes, '20')
+
+        self.assertEqual(self.client.post(url, {'status': 'confirmed'}, format='json').status_code, 200)
+        self.assertAvailable(self.tomatoes, '16')
+
+    def test_order_beyond_available_quantity(self):
+        response = self.client.post(reverse('produce-order-list'), {
+            'consumer': self.consumer.pk, 'produce': self.tomatoes.pk, 'quantity': '25',
+            'total_price': '750', 'delivery_address': 'Main road',
+        }, format='json')
 
-# Create your tests here.
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ProduceOrder.objects.exists())
+        self.assertAvailable(self.tomatoes, '20')
@@ -1,10 +1,13 @@
-from rest_framework import viewsets, filters, status
+from rest_framework import viewsets, filters, serializers, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from django.db import transaction
 from .models import ConsumerProfile, ProduceOrder, ProduceReview, Cart
 from .serializers import ConsumerProfileSerializer, ProduceOrderSerializer, ProduceReviewSerializer, CartSerializer
+from .checkout import checkout_cart, cart_totals, take_produce, set_order_status, CheckoutError
 from notifications.models import Notification
+from notifications.outbox import publish
 
 
 class ConsumerProfileViewSet(viewsets.ModelViewSet):
@@ -53,25 +56,31 @@ class ProduceOrderViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         consumer_profile = ConsumerProfile.objects.get(user=self.request.user)
-        order = serializer.save(consumer=consumer_profile)
-        
-        # Create notification for consumer
-        Notification.objects.create(
-            user=self.request.user,
-            title="Order Placed",
-            message=f"Your order for {order.produce.name} has been placed successfully.",
-            notification_type='order',
-            related_object_id=f"PORD-{order.id}"
-        )
-        
-        # Create notification for farmer
-        Notification.objects.create(
-            user=order.produce.farmer.user,
-            title="New Sale Received",
-            message=f"You have received a new order for {order.produce.name} from {self.request.user.username}.",
-            notification_type='order',
-            related_object_id=f"PORD-{order.id}"
-        )
+        with transaction.atomic():
+            data = serializer.validated_data
+            try:
+                take_produce(data['produce'].pk, data['quantity'])
+            except CheckoutError as e:
+                raise serializers.ValidationError({'error': str(e)})
+            order = serializer.save(consumer=consumer_profile)
+            
+            # Notify the consumer and the farmer once the order commits
+            publish('order_placed', [
+                Notification(
+                    user=self.request.user,
+                    title="Order Placed",
+                    message=f"Your order for {order.produce.name} has been placed successfully.",
+                    notification_type='order',
+                    related_object_id=f"PORD-{order.id}"
+                ),
+                Notification(
+                    user_id=order.produce.farmer.user_id,
+                    title="New Sale Received",
+                    message=f"You have received a new order for {order.produce.name} from {self.request.user.username}.",
+                    notification_type='order',
+                    related_object_id=f"PORD-{order.id}"
+                ),
+            ])
     
     @action(detail=True, methods=['post'])
     def update_status(self, request, pk=None):
@@ -82,17 +91,20 @@ class ProduceOrderViewSet(viewsets.ModelViewSet):
         if new_status not in dict(ProduceOrder.STATUS_CHOICES):
             return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
         
-        order.status = new_status
-        order.save()
-        
-        # Create notification for consumer
-        Notification.objects.create(
-            user=order.consumer.user,
-            title="Order Status Updated",
-            message=f"Your order #{order.id} status has been updated to {new_status}.",
-            notification_type='order',
-            related_object_id=f"PORD-{order.id}"
-        )
+        with transaction.atomic():
+            try:
+                order = set_order_status(order, new_status)
+            except CheckoutError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Notify the consumer once the update commits
+            publish('order_status_changed', [Notification(
+                user_id=order.consumer.user_id,
+                title="Order Status Updated",
+                message=f"Your order #{order.id} status has been updated to {new_status}.",
+                notification_type='order',
+                related_object_id=f"PORD-{order.id}"
+            )])
         
         # Create notification for farmer (if status is updated by system or consumer, though usually updated by farmer)
         # If farmer updates it, they might not need a notification, but it's good for record.
@@ -144,13 +156,38 @@ class CartViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def total(self, request):
         """Get cart total"""
-        cart_items = self.get_queryset()
-        total = sum([float(item.quantity) * float(item.produce.price_per_unit) for item in cart_items])
+        totals = cart_totals(self.get_queryset())
         return Response({
-            'total': round(total, 2),
-            'items_count': cart_items.count()
+            'total': round(float(totals['total']), 2),
+            'items_count': totals['items_count']
         })
     
+    @action(detail=False, methods=['post'])
+    def checkout(self, request):
+        """Turn every cart item into a produce order in one go and empty the cart"""
+        try:
+            consumer_profile = ConsumerProfile.objects.select_related('user').get(user=request.user)
+        except ConsumerProfile.DoesNotExist:
+            return Response({'error': 'Consumer profile not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        delivery_address = request.data.get('delivery_address', '')
+        notes = request.data.get('notes', '')
+        if not isinstance(delivery_address, str) or not delivery_address.strip():
+            return Response({'error': 'delivery_address is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(notes, str):
+            return Response({'error': 'notes must be text'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            orders = checkout_cart(consumer_profile, delivery_address.strip(), notes=notes)
+        except CheckoutError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        serializer = ProduceOrderSerializer(orders, many=True, context=self.get_serializer_context())
+        return Response({
+            'orders': serializer.data,
+            'total': sum(order.total_price for order in orders),
+        }, status=status.HTTP_201_CREATED)
+    
     @action(detail=False, methods=['delete'])
     def clear(self, request):
         """Clear cart"""
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class FarmersConfig(AppConfig):
     name = 'farmers'
+
+    def ready(self):
+        import farmers.receivers  # noqa: F401
@@ -0,0 +1,16 @@
+"""Spatial index, response cache and map clusters backing the FarmProduceViewSet location actions"""
+from geo.index import SpatialIndex
+from geo.cache import NearbyCache
+from geo.clusters import ClusterGrid
+from .models import FarmProduce
+
+
+def load_produce():
+    return FarmProduce.objects.filter(is_available=True).values_list(
+        'id', 'farmer__user__latitude', 'farmer__user__longitude', 'category'
+    )
+
+
+produce_index = SpatialIndex('produce', load_produce)
+produce_cache = NearbyCache('produce')
+produce_clusters = ClusterGrid(produce_index)
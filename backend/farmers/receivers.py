@@ -0,0 +1,25 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.contrib.auth import get_user_model
+
+from geo.utils import grid_cell
+from suppliers.receivers import location_may_have_changed
+from .models import FarmProduce
+from .indexes import produce_index, produce_cache
+
+User = get_user_model()
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_farmer_user_index(sender, instance, update_fields=None, **kwargs):
+    """Produce is located at the farmer user's coordinates"""
+    if instance.user_type == 'farmer' and location_may_have_changed(update_fields):
+        produce_index.mark_stale()
+        produce_cache.invalidate_all()
+
+
+@receiver([post_save, post_delete], sender=FarmProduce)
+def invalidate_produce_index(sender, instance, **kwargs):
+    produce_index.mark_stale()
+    user = instance.farmer.user
+    produce_cache.invalidate_cell(grid_cell(user.latitude, user.longitude))
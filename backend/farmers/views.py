@@ -3,21 +3,15 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework import serializers as rest_serializers
-from math import radians, cos, sin, asin, sqrt
+from django.db import transaction
+from geo.utils import hydrate, MAX_SEARCH_RADIUS_KM
+from geo.pagination import DistanceCursorPagination
+from geo.clusters import cluster_response
 from .models import FarmerProfile, FarmProduce, SupplierOrder, Land
 from .serializers import FarmerProfileSerializer, FarmProduceSerializer, SupplierOrderSerializer, LandSerializer
+from .indexes import produce_index, produce_cache, produce_clusters
 from notifications.models import Notification
-
-
-def haversine(lon1, lat1, lon2, lat2):
-    """Calculate the great circle distance between two points on the earth"""
-    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
-    dlon = lon2 - lon1
-    dlat = lat2 - lat1
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * asin(sqrt(a))
-    km = 6371 * c
-    return km
+from notifications.outbox import publish
 
 
 class FarmerProfileViewSet(viewsets.ModelViewSet):
@@ -57,7 +51,7 @@ class FarmProduceViewSet(viewsets.ModelViewSet):
     ordering_fields = ['price_per_unit', 'created_at']
 
     def get_permissions(self):
-        if self.action in ['list', 'retrieve', 'search_nearby']:
+        if self.action in ['list', 'retrieve', 'search_nearby', 'clusters']:
             return [AllowAny()]
         return [IsAuthenticated()]
 
@@ -144,37 +138,53 @@ class FarmProduceViewSet(viewsets.ModelViewSet):
         latitude = request.query_params.get('latitude')
         longitude = request.query_params.get('longitude')
         category = request.query_params.get('category')
-        max_distance = float(request.query_params.get('max_distance', 50))  # km
+        max_distance = request.query_params.get('max_distance', 50)  # km
         
         if not latitude or not longitude:
             return Response({'error': 'Latitude and longitude required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        latitude = float(latitude)
-        longitude = float(longitude)
-        
-        produce_list = FarmProduce.objects.filter(is_available=True)
-        
-        if category:
-            produce_list = produce_list.filter(category=category)
+        limit = request.query_params.get('limit')  # Optional: only the k nearest
+        try:
+            latitude = float(latitude)
+            longitude = float(longitude)
+            max_distance = float(max_distance)
+            limit = int(limit) if limit else None
+            if not 0 < max_distance <= MAX_SEARCH_RADIUS_KM or (limit is not None and limit < 1):
+                raise ValueError
+        except (ValueError, TypeError):
+            return Response(
+                {'error': f'Invalid latitude, longitude, max_distance (up to {MAX_SEARCH_RADIUS_KM} km) '
+                          'or limit (a positive integer)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Filter by distance
-        nearby_produce = []
-        for produce in produce_list:
-            if produce.farmer.user.latitude and produce.farmer.user.longitude:
-                distance = haversine(
-                    longitude, latitude,
-                    float(produce.farmer.user.longitude),
-                    float(produce.farmer.user.latitude)
-                )
-                if distance <= max_distance:
-                    produce_data = FarmProduceSerializer(produce).data
-                    produce_data['distance'] = round(distance, 2)
-                    nearby_produce.append(produce_data)
+        def serialize(ids, distances):
+            """Load and serialize only the matches, nearest first"""
+            produce = hydrate(FarmProduce.objects.filter(is_available=True).select_related('farmer', 'farmer__user'), ids)
+            distance_by_id = dict(zip(ids.tolist(), distances.tolist()))
+            data = FarmProduceSerializer(produce, many=True).data
+            for produce_data in data:
+                produce_data['distance'] = round(distance_by_id[produce_data['id']], 2)
+            return data
         
-        # Sort by distance
-        nearby_produce.sort(key=lambda x: x['distance'])
+        paginator = DistanceCursorPagination(request)
+        if paginator.enabled:
+            ids, distances = paginator.paginate(produce_index, latitude, longitude, max_distance, tag=category)
+            return paginator.get_paginated_response(serialize(ids, distances))
         
-        return Response(nearby_produce)
+        # Filter by distance through the spatial index, reusing a cached payload when possible;
+        # nearby users share cached results, so this search runs from the snapped point
+        snapped_latitude, snapped_longitude = produce_cache.snap(latitude, longitude)
+        nearby_produce = produce_cache.fetch(
+            snapped_latitude, snapped_longitude, max_distance, category,
+            build=lambda radius: serialize(*produce_index.within(snapped_latitude, snapped_longitude, radius, tag=category))
+        )
+        return Response(nearby_produce[:limit])
+
+    @action(detail=False, methods=['get'])
+    def clusters(self, request):
+        """Map clusters of available produce inside a bounding box at a zoom level"""
+        return cluster_response(request, produce_clusters, tag=request.query_params.get('category'))
 
 
 class SupplierOrderViewSet(viewsets.ModelViewSet):
@@ -195,25 +205,26 @@ class SupplierOrderViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         farmer_profile = FarmerProfile.objects.get(user=self.request.user)
-        order = serializer.save(farmer=farmer_profile)
-        
-        # Create notification for farmer
-        Notification.objects.create(
-            user=self.request.user,
-            title="Order Placed",
-            message=f"Your order for {order.product.name} has been placed successfully.",
-            notification_type='order',
-            related_object_id=f"ORD-{order.id}"
-        )
-        
-        # Create notification for supplier
-        Notification.objects.create(
-            user=order.product.supplier.user,
-            title="New Order Received",
-            message=f"You have received a new order for {order.product.name} from {self.request.user.username}.",
-            notification_type='order',
-            related_object_id=f"ORD-{order.id}"
-        )
+        with transaction.atomic():
+            order = serializer.save(farmer=farmer_profile)
+            
+            # Notify the farmer and the supplier once the order commits
+            publish('order_placed', [
+                Notification(
+                    user=self.request.user,
+                    title="Order Placed",
+                    message=f"Your order for {order.product.name} has been placed successfully.",
+                    notification_type='order',
+                    related_object_id=f"ORD-{order.id}"
+                ),
+                Notification(
+                    user_id=order.product.supplier.user_id,
+                    title="New Order Received",
+                    message=f"You have received a new order for {order.product.name} from {self.request.user.username}.",
+                    notification_type='order',
+                    related_object_id=f"ORD-{order.id}"
+                ),
+            ])
     
     @action(detail=True, methods=['post'])
     def update_status(self, request, pk=None):
@@ -224,17 +235,18 @@ class SupplierOrderViewSet(viewsets.ModelViewSet):
         if new_status not in dict(SupplierOrder.STATUS_CHOICES):
             return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
         
-        order.status = new_status
-        order.save()
-        
-        # Create notification for farmer
-        Notification.objects.create(
-            user=order.farmer.user,
-            title="Order Status Updated",
-            message=f"Your order #{order.id} status has been updated to {new_status}.",
-            notification_type='order',
-            related_object_id=f"ORD-{order.id}"
-        )
+        with transaction.atomic():
+            order.status = new_status
+            order.save()
+            
+            # Notify the farmer once the update commits
+            publish('order_status_changed', [Notification(
+                user_id=order.farmer.user_id,
+                title="Order Status Updated",
+                message=f"Your order #{order.id} status has been updated to {new_status}.",
+                notification_type='order',
+                related_object_id=f"ORD-{order.id}"
+            )])
         
         serializer = self.get_serializer(order)
         return Response(serializer.data)
@@ -0,0 +1,7 @@
+from django.contrib import admin
+from .models import IndexVersion
+
+@admin.register(IndexVersion)
+class IndexVersionAdmin(admin.ModelAdmin):
+    list_display = ['name', 'version', 'updated_at']
+    readonly_fields = ['updated_at']
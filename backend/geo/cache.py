@@ -0,0 +1,93 @@
+"""
+Response cache for public search_nearby endpoints.
+
+Requests are snapped to a coarse lat/lon grid and their radius rounded up
+to a bucket, so nearby users share one cached payload per filter. Entries
+live in the `geo_search` cache alias (LRU with a TTL, see settings.CACHES)
+and record a version token for every grid cell they cover plus one for the
+whole dataset. A listing write drops its cell's token and a seller moving
+drops the dataset token; the next read mints a new token, so stale entries
+stop matching without having to be found and deleted.
+"""
+from math import ceil
+from uuid import uuid4
+
+from django.core.cache import caches
+from django.db import transaction
+
+from .utils import cells_within
+
+# ~1.1 km; requests inside the same square share a cache entry
+SNAP_DEG = 0.01
+RADIUS_BUCKET_KM = 5
+# Wider searches touch too many cells to track and are not cached
+MAX_TRACKED_CELLS = 400
+
+
+class NearbyCache:
+    """Cache of serialized search_nearby payloads for one dataset"""
+
+    def __init__(self, name, alias='geo_search'):
+        self.name = name
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @staticmethod
+    def snap(latitude, longitude):
+        """Quantize a coordinate to the cache grid"""
+        return round(latitude / SNAP_DEG) * SNAP_DEG, round(longitude / SNAP_DEG) * SNAP_DEG
+
+    @staticmethod
+    def radius_bucket(radius_km):
+        return max(ceil(radius_km / RADIUS_BUCKET_KM), 1) * RADIUS_BUCKET_KM
+
+    def _generation_key(self):
+        return f'geo:{self.name}:generation'
+
+    def _cell_key(self, cell):
+        return f'geo:{self.name}:cell:{cell}'
+
+    def _versions(self, cells):
+        """Current tokens for the dataset and the given cells, creating missing ones"""
+        keys = [self._generation_key()] + [self._cell_key(cell) for cell in cells]
+        tokens = self.cache.get_many(keys)
+        missing = {key: uuid4().hex for key in keys if key not in tokens}
+        if missing:
+            for key, token in missing.items():
+                # add() keeps a token another request created in the meantime
+                self.cache.add(key, token)
+            tokens.update(self.cache.get_many(list(missing)))
+        return tuple(tokens.get(key) for key in keys)
+
+    def fetch(self, latitude, longitude, max_distance, tag, build):
+        """
+        Return the payload list for a search around an already snapped point.
+        On a miss, build(radius_km) computes it for the bucketed radius; rows
+        carry a 'distance' key and are trimmed to max_distance here.
+        """
+        radius = self.radius_bucket(max_distance)
+        cells = cells_within(latitude, longitude, radius)
+        if len(cells) > MAX_TRACKED_CELLS:
+            return [row for row in build(radius) if row['distance'] <= max_distance]
+
+        key = f'geo:{self.name}:{latitude:.2f}:{longitude:.2f}:{tag or ""}:{radius}'
+        versions = self._versions(cells)
+        entry = self.cache.get(key)
+        if entry is not None and entry[0] == versions:
+            payload = entry[1]
+        else:
+            payload = build(radius)
+            self.cache.set(key, (versions, payload))
+        return [row for row in payload if row['distance'] <= max_distance]
+
+    def invalidate_cell(self, cell):
+        """Expire cached searches covering a cell once the current transaction commits"""
+        if cell is not None:
+            transaction.on_commit(lambda: self.cache.delete(self._cell_key(cell)))
+
+    def invalidate_all(self):
+        """Expire every cached search for this dataset once the current transaction commits"""
+        transaction.on_commit(lambda: self.cache.delete(self._generation_key()))
@@ -0,0 +1,204 @@
+"""
+Per-worker multi-resolution grid aggregates for map clustering.
+
+A ClusterGrid shares the loader and version counter of a SpatialIndex and
+precomputes, for every zoom level, the count and centroid of the points in
+each grid cell, both overall and per category tag. A map request then only
+reads the cells inside its bounding box at the requested zoom, so the payload
+grows with the visible area rather than with the number of points.
+"""
+import threading
+
+import numpy as np
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IndexVersion
+
+MAX_ZOOM = 16
+# A 256px web map tile spans 360 / 2**zoom degrees; cluster in ~64px cells
+TILE_DIVISIONS = 4
+# Requests that would return more clusters are answered at a coarser zoom
+MAX_CLUSTERS = 2000
+
+
+def cell_size(zoom):
+    """Cluster cell edge in degrees at a zoom level"""
+    return 360.0 / (2 ** zoom) / TILE_DIVISIONS
+
+
+def split_tags(value):
+    """Comma-separated tag field -> list of lowercase tags"""
+    return [tag.strip().lower() for tag in (value or '').split(',') if tag.strip()]
+
+
+class ClusterLevel:
+    """Cell and (cell, tag) aggregates of one zoom level"""
+
+    def __init__(self, zoom, latitudes, longitudes, ids, tag_points, tag_codes):
+        size = cell_size(zoom)
+        rows = np.floor((latitudes + 90) / size).astype(np.int64)
+        cols = np.floor((longitudes + 180) / size).astype(np.int64)
+        keys = rows * (int(360 / size) + 1) + cols
+
+        self.keys, groups = np.unique(keys, return_inverse=True)
+        self.counts, self.latitudes, self.longitudes, self.ids = self._aggregate(
+            groups, len(self.keys), latitudes, longitudes, ids
+        )
+        first = np.zeros(len(self.keys), dtype=np.int64)
+        first[groups] = np.arange(len(groups))
+        self.rows, self.cols = rows[first], cols[first]
+
+        # Per (cell, tag) aggregates, ordered by cell
+        stride = tag_codes.max(initial=0) + 1
+        pairs, pair_groups = np.unique(groups[tag_points] * stride + tag_codes, return_inverse=True)
+        self.tag_cells, self.tag_codes = np.divmod(pairs, stride)
+        self.tag_counts, self.tag_latitudes, self.tag_longitudes, self.tag_ids = self._aggregate(
+            pair_groups, len(pairs), latitudes[tag_points], longitudes[tag_points], ids[tag_points]
+        )
+
+    @staticmethod
+    def _aggregate(groups, size, latitudes, longitudes, ids):
+        counts = np.bincount(groups, minlength=size)
+        safe = np.maximum(counts, 1)
+        mean_latitudes = np.bincount(groups, latitudes, minlength=size) / safe
+        mean_longitudes = np.bincount(groups, longitudes, minlength=size) / safe
+        first_ids = np.full(size, np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(first_ids, groups, ids)
+        return counts, mean_latitudes, mean_longitudes, first_ids
+
+    def visible(self, zoom, bbox):
+        """Boolean mask of the cells overlapping (min_lat, max_lat, min_lon, max_lon)"""
+        min_lat, max_lat, min_lon, max_lon = bbox
+        size = cell_size(zoom)
+        first_row, last_row = np.floor((np.array([min_lat, max_lat]) + 90) / size)
+        first_col, last_col = np.floor((np.array([min_lon, max_lon]) + 180) / size)
+        in_rows = (self.rows >= first_row) & (self.rows <= last_row)
+        if min_lon <= max_lon:
+            return in_rows & (self.cols >= first_col) & (self.cols <= last_col)
+        # The box crosses the antimeridian
+        return in_rows & ((self.cols >= first_col) | (self.cols <= last_col))
+
+
+class ClusterGrid:
+    """Multi-resolution cluster aggregates over the points of a SpatialIndex"""
+
+    def __init__(self, index):
+        """
+        Tags of indexes with tag_contains are comma-separated lists; each
+        point counts once towards every tag it carries.
+        """
+        self.index = index
+        self._lock = threading.Lock()
+        self._snapshot = (None, [], [])
+
+    def _build(self, version):
+        rows = [row for row in self.index.loader() if row[1] is not None and row[2] is not None]
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        coords = np.array([(row[1], row[2]) for row in rows], dtype=float).reshape(-1, 2)
+
+        tag_names, tag_lookup, tag_points, tag_codes = [], {}, [], []
+        for position, row in enumerate(rows):
+            tags = split_tags(row[3]) if self.index.tag_contains else [row[3]] if row[3] else []
+            for tag in tags:
+                if tag not in tag_lookup:
+                    tag_lookup[tag] = len(tag_names)
+                    tag_names.append(tag)
+                tag_points.append(position)
+                tag_codes.append(tag_lookup[tag])
+
+        tag_points = np.array(tag_points, dtype=np.int64)
+        tag_codes = np.array(tag_codes, dtype=np.int64)
+        levels = [
+            ClusterLevel(zoom, coords[:, 0], coords[:, 1], ids, tag_points, tag_codes)
+            for zoom in range(MAX_ZOOM + 1)
+        ]
+        return version, levels, tag_names
+
+    def _current(self):
+        """Return an immutable (version, levels, tag_names) snapshot, rebuilding if stale"""
+        version = IndexVersion.current(self.index.name)
+        snapshot = self._snapshot
+        if snapshot[0] != version:
+            with self._lock:
+                snapshot = self._snapshot
+                if snapshot[0] != version:
+                    snapshot = self._snapshot = self._build(version)
+        return snapshot
+
+    def clusters(self, bbox, zoom, tag=None):
+        """
+        Return (zoom, clusters) for the cells inside bbox. Each cluster has the
+        centroid, count and per-tag counts of its points, plus the point id
+        when it holds a single point. The zoom is lowered until at most
+        MAX_CLUSTERS cells are visible.
+        """
+        _, levels, tag_names = self._current()
+        zoom = min(max(zoom, 0), MAX_ZOOM)
+        if self.index.tag_contains and tag:
+            tag = tag.strip().lower()
+
+        while True:
+            level = levels[zoom]
+            visible = level.visible(zoom, bbox)
+            if tag:
+                code = tag_names.index(tag) if tag in tag_names else -1
+                selected = np.flatnonzero((level.tag_codes == code) & visible[level.tag_cells])
+            else:
+                selected = np.flatnonzero(visible)
+            if len(selected) <= MAX_CLUSTERS or zoom == 0:
+                break
+            zoom -= 1
+
+        if tag:
+            return zoom, [
+                {
+                    'latitude': round(float(level.tag_latitudes[i]), 6),
+                    'longitude': round(float(level.tag_longitudes[i]), 6),
+                    'count': int(level.tag_counts[i]),
+                    'categories': {tag: int(level.tag_counts[i])},
+                    **({'id': int(level.tag_ids[i])} if level.tag_counts[i] == 1 else {}),
+                }
+                for i in selected.tolist()
+            ]
+
+        categories = {}
+        wanted = visible[level.tag_cells]
+        for cell, code, count in zip(
+            level.tag_cells[wanted].tolist(), level.tag_codes[wanted].tolist(), level.tag_counts[wanted].tolist()
+        ):
+            categories.setdefault(cell, {})[tag_names[code]] = count
+
+        return zoom, [
+            {
+                'latitude': round(float(level.latitudes[i]), 6),
+                'longitude': round(float(level.longitudes[i]), 6),
+                'count': int(level.counts[i]),
+                'categories': categories.get(i, {}),
+                **({'id': int(level.ids[i])} if level.counts[i] == 1 else {}),
+            }
+            for i in selected.tolist()
+        ]
+
+
+def parse_bbox(value):
+    """'min_lon,min_lat,max_lon,max_lat' -> (min_lat, max_lat, min_lon, max_lon)"""
+    min_lon, min_lat, max_lon, max_lat = (float(part) for part in value.split(','))
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= 180 and -180 <= max_lon <= 180):
+        raise ValueError(value)
+    return min_lat, max_lat, min_lon, max_lon
+
+
+def cluster_response(request, grid, tag=None):
+    """Shared body of the `clusters` actions"""
+    try:
+        bbox = parse_bbox(request.query_params.get('bbox', ''))
+        zoom = int(request.query_params.get('zoom', ''))
+    except (ValueError, TypeError):
+        return Response(
+            {'error': 'bbox (min_lon,min_lat,max_lon,max_lat) and an integer zoom are required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    zoom, clusters = grid.clusters(bbox, zoom, tag=tag)
+    return Response({'zoom': zoom, 'clusters': clusters})
@@ -0,0 +1,159 @@
+"""
+Per-worker KD-tree cache of listing and seller coordinates.
+
+Each SpatialIndex holds ids, coordinates and an optional filter tag for one
+dataset, stored as unit-sphere vectors in a KD-tree so radius and k-nearest
+queries cost O(log N) instead of a table scan. Writes call mark_stale(),
+which bumps a shared IndexVersion row once the transaction commits; every
+worker compares that counter on query and rebuilds its tree when it moved.
+"""
+import threading
+
+import numpy as np
+from django.db import transaction
+from scipy.spatial import cKDTree
+
+from .models import IndexVersion
+from .utils import EARTH_RADIUS_KM
+
+
+def to_unit_vectors(latitudes, longitudes):
+    """Convert degree coordinates to 3D points on the unit sphere"""
+    lat = np.radians(latitudes)
+    lon = np.radians(longitudes)
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def km_to_chord(distance_km):
+    """Straight-line distance through the unit sphere for a surface distance"""
+    return 2 * np.sin(np.minimum(distance_km / EARTH_RADIUS_KM, np.pi) / 2)
+
+
+def chord_to_km(chord):
+    """Inverse of km_to_chord"""
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0.0, 1.0))
+
+
+class SpatialIndex:
+    """KD-tree over the (id, latitude, longitude, tag) rows returned by a loader"""
+
+    def __init__(self, name, loader, tag_contains=False):
+        """
+        loader() returns an iterable of (id, latitude, longitude, tag) rows.
+        With tag_contains the tag filter is a case-insensitive substring match
+        (for comma-separated fields), otherwise an exact match.
+        """
+        self.name = name
+        self.loader = loader
+        self.tag_contains = tag_contains
+        self._lock = threading.Lock()
+        self._snapshot = (None, None, np.empty(0, dtype=np.int64), np.empty(0, dtype=object))
+
+    def mark_stale(self):
+        """Invalidate this index in every worker once the current transaction commits"""
+        transaction.on_commit(lambda: IndexVersion.bump(self.name))
+
+    def _build(self, version):
+        rows = [row for row in self.loader() if row[1] is not None and row[2] is not None]
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        tags = np.array([(row[3] or '') for row in rows], dtype=object)
+        if rows:
+            coords = np.array([(row[1], row[2]) for row in rows], dtype=float)
+            tree = cKDTree(to_unit_vectors(coords[:, 0], coords[:, 1]))
+        else:
+            tree = None
+        return version, tree, ids, tags
+
+    def _current(self):
+        """Return an immutable (version, tree, ids, tags) snapshot, rebuilding if stale"""
+        version = IndexVersion.current(self.name)
+        snapshot = self._snapshot
+        if snapshot[0] != version:
+            with self._lock:
+                snapshot = self._snapshot
+                if snapshot[0] != version:
+                    snapshot = self._snapshot = self._build(version)
+        return snapshot
+
+    def _tag_mask(self, tags, tag):
+        if self.tag_contains:
+            lowered = np.char.lower(tags.astype(str))
+            return np.char.find(lowered, tag.lower()) >= 0
+        return tags == tag
+
+    def _candidates(self, latitude, longitude, radius_km, tag=None, keep=None):
+        """
+        Unordered (ids, distances_km) of every point within radius_km. keep,
+        if given, maps an id array to a boolean mask of the ids to return.
+        """
+        _, tree, ids, tags = self._current()
+        if tree is None:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        point = to_unit_vectors(latitude, longitude)[0]
+        positions = np.array(tree.query_ball_point(point, km_to_chord(radius_km)), dtype=np.int64)
+        if tag and len(positions):
+            positions = positions[self._tag_mask(tags[positions], tag)]
+        if keep is not None and len(positions):
+            positions = positions[keep(ids[positions])]
+
+        distances = chord_to_km(np.linalg.norm(tree.data[positions] - point, axis=1))
+        return ids[positions], distances
+
+    def within(self, latitude, longitude, radius_km, tag=None, keep=None):
+        """Return (ids, distances_km) within radius_km, nearest first, ties broken by id"""
+        ids, distances = self._candidates(latitude, longitude, radius_km, tag, keep)
+        order = np.lexsort((ids, distances))
+        return ids[order], distances[order]
+
+    def page(self, latitude, longitude, radius_km, size, after=None, tag=None, keep=None):
+        """
+        Keyset page of the radius search ordered by (distance, id): the first
+        `size` points strictly after the `after` (distance, id) key. Returns
+        (ids, distances_km, has_more). Only the page itself is sorted.
+        """
+        ids, distances = self._candidates(latitude, longitude, radius_km, tag, keep)
+        if after is not None:
+            after_distance, after_id = after
+            later = (distances > after_distance) | ((distances == after_distance) & (ids > after_id))
+            ids, distances = ids[later], distances[later]
+
+        has_more = len(ids) > size
+        if has_more:
+            # Smallest `size` distances in linear time; ties at the cut-off are
+            # resolved by id after the partition so the (distance, id) order holds
+            cutoff = np.partition(distances, size - 1)[size - 1]
+            nearer = distances < cutoff
+            ties = np.flatnonzero(distances == cutoff)
+            ties = ties[np.argsort(ids[ties])][:size - np.count_nonzero(nearer)]
+            selected = np.concatenate((np.flatnonzero(nearer), ties))
+            ids, distances = ids[selected], distances[selected]
+
+        order = np.lexsort((ids, distances))
+        return ids[order], distances[order], has_more
+
+    def nearest(self, latitude, longitude, k, max_distance=None, tag=None):
+        """Return the k nearest (ids, distances_km), optionally capped at max_distance"""
+        if tag:
+            # The tree has no notion of tags, so filter the radius match instead
+            ids, distances = self.within(latitude, longitude, max_distance or np.pi * EARTH_RADIUS_KM, tag)
+            return ids[:k], distances[:k]
+
+        _, tree, ids, _ = self._current()
+        if tree is None or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        bound = km_to_chord(max_distance) if max_distance is not None else np.inf
+        point = to_unit_vectors(latitude, longitude)[0]
+        chords, positions = tree.query(point, k=min(k, tree.n), distance_upper_bound=bound * (1 + 1e-9))
+        chords, positions = np.atleast_1d(chords), np.atleast_1d(positions)
+        found = positions < tree.n
+        distances = chord_to_km(chords[found])
+        return ids[positions[found]], distances
+
+    def search(self, latitude, longitude, max_distance, tag=None, limit=None):
+        """Radius search, or the `limit` nearest within max_distance when given"""
+        if limit is not None:
+            return self.nearest(latitude, longitude, limit, max_distance, tag)
+        return self.within(latitude, longitude, max_distance, tag)
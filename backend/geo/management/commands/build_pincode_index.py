@@ -0,0 +1,60 @@
+import csv
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from geo.pincodes import parse_pin_code, write_table, table_path
+
+
+class Command(BaseCommand):
+    help = 'Build the offline PIN code centroid table from a post office directory CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'csv_path',
+            type=str,
+            help='CSV with pincode, latitude and longitude columns (e.g. the All India Pincode Directory)',
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='Where to write the table (defaults to PIN_CODE_CENTROIDS_PATH)',
+        )
+
+    def handle(self, *args, **options):
+        # One PIN code covers several post offices; its centroid is their mean
+        totals = defaultdict(lambda: [0.0, 0.0, 0])
+        skipped = 0
+
+        try:
+            with open(options['csv_path'], newline='', encoding='utf-8-sig') as source:
+                reader = csv.DictReader(source)
+                columns = {name.strip().lower(): name for name in reader.fieldnames or []}
+                if not {'pincode', 'latitude', 'longitude'} <= set(columns):
+                    raise CommandError('CSV must have pincode, latitude and longitude columns')
+
+                for row in reader:
+                    pin_code = parse_pin_code(row[columns['pincode']])
+                    try:
+                        latitude = float(row[columns['latitude']])
+                        longitude = float(row[columns['longitude']])
+                    except (TypeError, ValueError):
+                        latitude = longitude = None
+                    if pin_code is None or latitude is None or not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+                        skipped += 1
+                        continue
+                    total = totals[pin_code]
+                    total[0] += latitude
+                    total[1] += longitude
+                    total[2] += 1
+        except OSError as e:
+            raise CommandError(f'Could not read {options["csv_path"]}: {e}')
+
+        output = options.get('output') or table_path()
+        count = write_table(
+            ((pin_code, lat_sum / n, lon_sum / n) for pin_code, (lat_sum, lon_sum, n) in totals.items()),
+            output
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {count} PIN code centroid(s) to {output} ({skipped} row(s) skipped)'
+        ))
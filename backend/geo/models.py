@@ -0,0 +1,26 @@
+from django.db import models
+from django.db.models import F
+from django.utils import timezone
+
+
+class IndexVersion(models.Model):
+    """Version counter per spatial index, shared by every worker process"""
+    name = models.CharField(max_length=50, unique=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+    
+    @classmethod
+    def current(cls, name):
+        return cls.objects.filter(name=name).values_list('version', flat=True).first() or 0
+    
+    @classmethod
+    def bump(cls, name):
+        """Atomically increment the version so every worker rebuilds its copy"""
+        updated = cls.objects.filter(name=name).update(version=F('version') + 1, updated_at=timezone.now())
+        if not updated:
+            _, created = cls.objects.get_or_create(name=name, defaults={'version': 1})
+            if not created:
+                cls.objects.filter(name=name).update(version=F('version') + 1, updated_at=timezone.now())
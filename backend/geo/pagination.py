@@ -0,0 +1,72 @@
+"""Cursor pagination for distance-ordered search_nearby results"""
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class DistanceCursorPagination:
+    """
+    Keyset pagination over a SpatialIndex radius search, ordered by
+    (distance, id). The opaque cursor carries the last key of the previous
+    page, so every page costs work proportional to its size to hydrate and
+    serialize, however many points match. Pagination is opt-in: it is only
+    enabled when the client sends `page_size` or `cursor`.
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, request):
+        self.request = request
+        self.next_key = None
+        params = request.query_params
+        self.enabled = self.page_size_query_param in params or self.cursor_query_param in params
+
+    def get_page_size(self):
+        try:
+            size = int(self.request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def decode_cursor(self):
+        encoded = self.request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            distance, pk = b64decode(encoded.encode('ascii')).decode('ascii').split(':')
+            return float(distance), int(pk)
+        except (TypeError, ValueError, UnicodeError, BinasciiError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, key):
+        distance, pk = key
+        return b64encode(f'{float(distance)!r}:{int(pk)}'.encode('ascii')).decode('ascii')
+
+    def paginate(self, index, latitude, longitude, max_distance, tag=None, keep=None):
+        """Return (ids, distances) for the requested page"""
+        ids, distances, has_more = index.page(
+            latitude, longitude, max_distance, self.get_page_size(),
+            after=self.decode_cursor(), tag=tag, keep=keep
+        )
+        if has_more:
+            self.next_key = (distances[-1], ids[-1])
+        return ids, distances
+
+    def get_next_link(self):
+        if self.next_key is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_key))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        })
@@ -0,0 +1,68 @@
+"""
+Offline PIN code -> centroid lookup.
+
+The table is a numpy array of (pin_code, latitude, longitude) records sorted
+by PIN code, written by the build_pincode_index command. It is memory-mapped
+on first use, so every worker shares the OS page cache instead of holding its
+own copy, and a lookup is one binary search with no network access.
+"""
+import threading
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+PIN_CODE_DTYPE = np.dtype([('pin_code', '<u4'), ('latitude', '<f4'), ('longitude', '<f4')])
+DEFAULT_TABLE_PATH = Path(__file__).resolve().parent / 'data' / 'pincode_centroids.npy'
+
+_lock = threading.Lock()
+_table = None
+
+
+def table_path():
+    return Path(getattr(settings, 'PIN_CODE_CENTROIDS_PATH', DEFAULT_TABLE_PATH))
+
+
+def load_table():
+    """Memory-map the centroid table, or an empty table if it has not been built"""
+    global _table
+    if _table is None:
+        with _lock:
+            if _table is None:
+                try:
+                    _table = np.load(table_path(), mmap_mode='r')
+                except FileNotFoundError:
+                    _table = np.empty(0, dtype=PIN_CODE_DTYPE)
+    return _table
+
+
+def write_table(records, path=None):
+    """Write (pin_code, latitude, longitude) records as a sorted table"""
+    path = Path(path or table_path())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    table = np.array(list(records), dtype=PIN_CODE_DTYPE)
+    table.sort(order='pin_code')
+    np.save(path, table)
+    return len(table)
+
+
+def parse_pin_code(value):
+    """Six-digit PIN code as an int, or None if value is not one"""
+    value = str(value or '').strip().replace(' ', '')
+    if len(value) != 6 or not value.isdigit():
+        return None
+    return int(value)
+
+
+def pin_code_centroid(pin_code):
+    """Return the (latitude, longitude) centroid of a PIN code as Decimals, or None"""
+    key = parse_pin_code(pin_code)
+    if key is None:
+        return None
+    table = load_table()
+    position = np.searchsorted(table['pin_code'], key)
+    if position == len(table) or table['pin_code'][position] != key:
+        return None
+    record = table[position]
+    return Decimal(f"{record['latitude']:.6f}"), Decimal(f"{record['longitude']:.6f}")
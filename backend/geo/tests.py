@@ -0,0 +1,182 @@
+import random
+import shutil
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+from django.core.cache import caches
+from django.test import TestCase, SimpleTestCase, override_settings
+
+from . import pincodes
+from .cache import NearbyCache
+from .clusters import ClusterGrid
+from .index import SpatialIndex
+from .utils import haversine, grid_cell
+
+
+def random_rows(count, seed=1):
+    """(id, latitude, longitude, tag) rows scattered around 12N 78E, a few sharing coordinates"""
+    rng = random.Random(seed)
+    rows = []
+    for pk in range(1, count + 1):
+        if pk % 10 == 0:
+            # Same point as the previous row, so distance ties must be broken by id
+            rows.append((pk, rows[-1][1], rows[-1][2], 'seeds'))
+        else:
+            rows.append((pk, 12 + rng.uniform(-1, 1), 78 + rng.uniform(-1, 1), rng.choice(['seeds', 'tools'])))
+    return rows
+
+
+class SpatialIndexTests(TestCase):
+    """geo.index.SpatialIndex against a brute-force haversine scan"""
+
+    def setUp(self):
+        self.rows = random_rows(300)
+        self.index = SpatialIndex(f'test:{self.id()}', lambda: self.rows)
+
+    def brute_force(self, latitude, longitude, radius_km, tag=None):
+        matches = sorted(
+            (haversine(longitude, latitude, lon, lat), pk)
+            for pk, lat, lon, row_tag in self.rows
+            if tag is None or row_tag == tag
+        )
+        return [(distance, pk) for distance, pk in matches if distance <= radius_km]
+
+    def test_within_matches_haversine(self):
+        ids, distances = self.index.within(12.1, 78.2, 60)
+        expected = self.brute_force(12.1, 78.2, 60)
+
+        self.assertEqual(ids.tolist(), [pk for _, pk in expected])
+        np.testing.assert_allclose(distances, [distance for distance, _ in expected], atol=1e-6)
+
+    def test_tag_filter(self):
+        ids, _ = self.index.within(12.1, 78.2, 60, tag='tools')
+        self.assertEqual(ids.tolist(), [pk for _, pk in self.brute_force(12.1, 78.2, 60, tag='tools')])
+
+    def test_nearest(self):
+        ids, distances = self.index.nearest(12.1, 78.2, 5)
+        self.assertEqual(ids.tolist(), [pk for _, pk in self.brute_force(12.1, 78.2, 500)[:5]])
+        self.assertEqual(len(distances), 5)
+
+    def test_pages_have_no_duplicates_or_gaps(self):
+        expected, _ = self.index.within(12.1, 78.2, 80)
+        seen, after = [], None
+        while True:
+            ids, distances, has_more = self.index.page(12.1, 78.2, 80, 7, after=after)
+            seen.extend(ids.tolist())
+            if not has_more:
+                break
+            after = (distances[-1], ids[-1])
+
+        self.assertEqual(seen, expected.tolist())
+
+    def test_mark_stale_rebuilds_after_commit(self):
+        self.assertEqual(self.index.within(30, 30, 10)[0].tolist(), [])
+        self.rows.append((999, 30.0, 30.0, 'seeds'))
+
+        # Until the writing transaction commits, queries use the old tree
+        self.assertEqual(self.index.within(30, 30, 10)[0].tolist(), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.index.mark_stale()
+        self.assertEqual(self.index.within(30, 30, 10)[0].tolist(), [999])
+
+
+class ClusterGridTests(TestCase):
+    """geo.clusters.ClusterGrid"""
+
+    def setUp(self):
+        self.rows = random_rows(200)
+        self.grid = ClusterGrid(SpatialIndex(f'test:{self.id()}', lambda: self.rows))
+        self.world = (-90, 90, -180, 180)
+
+    def test_counts_add_up_at_every_zoom(self):
+        for zoom in (0, 4, 8, 12):
+            _, clusters = self.grid.clusters(self.world, zoom)
+            self.assertEqual(sum(cluster['count'] for cluster in clusters), len(self.rows))
+
+    def test_category_counts_and_filter(self):
+        _, clusters = self.grid.clusters(self.world, 0)
+        self.assertEqual(len(clusters), 1)
+        tools = sum(1 for row in self.rows if row[3] == 'tools')
+        self.assertEqual(clusters[0]['categories'], {'seeds': len(self.rows) - tools, 'tools': tools})
+
+        _, clusters = self.grid.clusters(self.world, 6, tag='tools')
+        self.assertEqual(sum(cluster['count'] for cluster in clusters), tools)
+
+    def test_single_point_cluster_carries_its_id(self):
+        _, lat, lon, _ = self.rows[0]
+        _, clusters = self.grid.clusters((lat - 0.001, lat + 0.001, lon - 0.001, lon + 0.001), 16)
+        self.assertEqual([cluster.get('id') for cluster in clusters], [1])
+
+
+class NearbyCacheTests(TestCase):
+    """geo.cache.NearbyCache"""
+
+    def setUp(self):
+        caches['geo_search'].clear()
+        self.cache = NearbyCache(f'test:{self.id()}')
+        self.builds = 0
+
+    def fetch(self, max_distance=10):
+        def build(radius):
+            self.builds += 1
+            return [{'id': 1, 'distance': 2.0}, {'id': 2, 'distance': 9.0}]
+        return self.cache.fetch(12.0, 78.0, max_distance, None, build)
+
+    def test_hits_reuse_payload_trimmed_to_radius(self):
+        self.assertEqual(len(self.fetch()), 2)
+        # 8 km shares the 10 km radius bucket
+        self.assertEqual([row['id'] for row in self.fetch(max_distance=8)], [1])
+        self.assertEqual(self.builds, 1)
+
+    def test_listing_write_in_covered_cell_expires_entry(self):
+        self.fetch()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cache.invalidate_cell(grid_cell(12.0, 78.0))
+        self.fetch()
+        self.assertEqual(self.builds, 2)
+
+    def test_write_elsewhere_keeps_entry(self):
+        self.fetch()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cache.invalidate_cell(grid_cell(30.0, 30.0))
+        self.fetch()
+        self.assertEqual(self.builds, 1)
+
+    def test_invalidate_all(self):
+        self.fetch()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cache.invalidate_all()
+        self.fetch()
+        self.assertEqual(self.builds, 2)
+
+
+class PinCodeTableTests(SimpleTestCase):
+    """geo.pincodes lookups against a small written table"""
+
+    def setUp(self):
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory)
+        path = directory / 'pincodes.npy'
+        pincodes.write_table([(641001, 11.0168, 76.9558), (110001, 28.6328, 77.2197), (600001, 13.0878, 80.2785)], path)
+
+        settings_override = override_settings(PIN_CODE_CENTROIDS_PATH=path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # The table is memory-mapped once per process; load the test one and drop it afterwards
+        pincodes._table = None
+        self.addCleanup(setattr, pincodes, '_table', None)
+
+    def test_centroid(self):
+        latitude, longitude = pincodes.pin_code_centroid('641 001')
+        self.assertIsInstance(latitude, Decimal)
+        # Stored as float32, so exact to about a metre
+        self.assertAlmostEqual(float(latitude), 11.0168, places=4)
+        self.assertAlmostEqual(float(longitude), 76.9558, places=4)
+        self.assertAlmostEqual(float(pincodes.pin_code_centroid(110001)[0]), 28.6328, places=4)
+
+    def test_unknown_or_malformed(self):
+        self.assertIsNone(pincodes.pin_code_centroid('641002'))
+        self.assertIsNone(pincodes.pin_code_centroid('64100'))
+        self.assertIsNone(pincodes.pin_code_centroid(''))
@@ -0,0 +1,90 @@
+"""Shared geographic helpers used by the location-based search endpoints"""
+from math import radians, cos, sin, asin, sqrt, floor
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+KM_PER_DEGREE_LAT = 111.32
+# Widest radius a search_nearby request may ask for
+MAX_SEARCH_RADIUS_KM = 500
+
+# Fixed lat/lon grid used to index seller locations (0.25 deg is ~28 km)
+GRID_CELL_DEG = 0.25
+GRID_COLS = int(360 / GRID_CELL_DEG)
+
+
+def haversine(lon1, lat1, lon2, lat2):
+    """Calculate the great circle distance between two points on the earth"""
+    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
+    c = 2 * asin(sqrt(a))
+    km = EARTH_RADIUS_KM * c
+    return km
+
+
+def haversine_array(latitude, longitude, latitudes, longitudes):
+    """Vectorized haversine: distances in km from one point to arrays of points"""
+    lat1, lon1 = radians(latitude), radians(longitude)
+    lat2 = np.radians(latitudes)
+    lon2 = np.radians(longitudes)
+    a = np.sin((lat2 - lat1) / 2)**2 + cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2)**2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def hydrate(queryset, ids):
+    """Fetch the objects for ids in one query, preserving the order of ids"""
+    objects = queryset.in_bulk(ids.tolist())
+    return [objects[pk] for pk in ids.tolist() if pk in objects]
+
+
+def grid_cell(latitude, longitude):
+    """Return the grid cell id containing a coordinate, or None if it is unknown"""
+    if latitude is None or longitude is None:
+        return None
+    latitude = min(max(float(latitude), -90.0), 90.0 - 1e-9)
+    longitude = min(max(float(longitude), -180.0), 180.0 - 1e-9)
+    row = int(floor((latitude + 90) / GRID_CELL_DEG))
+    col = int(floor((longitude + 180) / GRID_CELL_DEG))
+    return row * GRID_COLS + col
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """
+    Return (min_lat, max_lat, min_lon, max_lon) enclosing every point within
+    radius_km of the given coordinate. The box is clamped at the poles and the
+    antimeridian rather than wrapped.
+    """
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    min_lat = max(latitude - dlat, -90.0)
+    max_lat = min(latitude + dlat, 90.0)
+
+    # Longitude degrees shrink towards the poles, so size the box for the
+    # latitude edge furthest from the equator
+    cos_lat = cos(radians(max(abs(min_lat), abs(max_lat))))
+    dlon = 180.0 if cos_lat < 1e-6 else min(radius_km / (KM_PER_DEGREE_LAT * cos_lat), 180.0)
+    min_lon = max(longitude - dlon, -180.0)
+    max_lon = min(longitude + dlon, 180.0)
+    return min_lat, max_lat, min_lon, max_lon
+
+
+def cells_within(latitude, longitude, radius_km):
+    """Return the ids of every grid cell that intersects the circle around a coordinate"""
+    bbox = bounding_box(latitude, longitude, radius_km)
+    first_row, first_col = divmod(grid_cell(bbox[0], bbox[2]), GRID_COLS)
+    last_row, last_col = divmod(grid_cell(bbox[1], bbox[3]), GRID_COLS)
+
+    # Clamping to the cell edges in lat/lon space slightly overestimates the
+    # distance to cells off the centre's meridian, so keep a small margin
+    reach = radius_km * 1.01 + 1
+    cells = []
+    for row in range(first_row, last_row + 1):
+        south = row * GRID_CELL_DEG - 90
+        nearest_lat = min(max(latitude, south), south + GRID_CELL_DEG)
+        for col in range(first_col, last_col + 1):
+            west = col * GRID_CELL_DEG - 180
+            nearest_lon = min(max(longitude, west), west + GRID_CELL_DEG)
+            if haversine(longitude, latitude, nearest_lon, nearest_lat) <= reach:
+                cells.append(row * GRID_COLS + col)
+    return cells
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from notifications.outbox import dispatch_pending, DISPATCH_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Expand queued notification events into notifications (runs as a worker unless --once is given)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Send what is queued now and exit')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to wait when the outbox is empty')
+        parser.add_argument('--batch-size', type=int, default=DISPATCH_BATCH_SIZE, help='Events per transaction')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            sent = dispatch_pending(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Dispatched {sent} notification event(s)'))
+            return
+
+        self.stdout.write(f"Dispatching notification events every {options['interval']}s (Ctrl+C to stop)")
+        try:
+            while True:
+                close_old_connections()
+                if not dispatch_pending(options['batch_size']):
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS('Stopped'))
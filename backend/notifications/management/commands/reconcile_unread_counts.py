@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from notifications.unread import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Recompute every user\'s unread notification counter from the notifications, fixing any drift'
+
+    def handle(self, *args, **options):
+        corrected = reconcile()
+        self.stdout.write(self.style.SUCCESS(f'Corrected {corrected} unread counter(s)'))
@@ -26,3 +26,36 @@ class Notification(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Only unread rows: the badge recount and mark_all_read touch nothing else
+            models.Index(fields=['user'], condition=models.Q(is_read=False), name='notification_unread_idx'),
+        ]
+
+
+class UnreadCounter(models.Model):
+    """
+    Number of unread notifications of one user, kept current by
+    notifications.unread so the badge needs no COUNT(*).
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='unread_counter')
+    unread = models.IntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} unread"
+
+
+class NotificationEvent(models.Model):
+    """
+    Outbox row for notifications a change should send. Written in the
+    change's transaction and expanded into Notification rows by the
+    dispatch_notifications worker (see notifications.outbox).
+    """
+    kind = models.CharField(max_length=50)  # e.g. "order_placed"
+    payload = models.JSONField()  # Notification field values, one dict per notification
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.kind} #{self.pk}"
+    
+    class Meta:
+        ordering = ['id']
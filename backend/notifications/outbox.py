@@ -0,0 +1,61 @@
+"""
+Notification outbox.
+
+Request handlers do not write Notification rows themselves: publish() adds
+one NotificationEvent holding all the notifications a change sends, in the
+same transaction as the change, so they are sent exactly when it commits
+and hot order paths insert one small row instead of several. The
+dispatch_notifications worker claims pending events in id order with
+SKIP LOCKED (so several workers can share the queue), expands them into
+Notification rows with one bulk_create per batch, bumps the recipients'
+unread counters and deletes the events, all in one transaction.
+Notifications for users deleted since their event was queued are dropped,
+so one gone recipient cannot fail the batch it sits in.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from .models import Notification, NotificationEvent
+from .unread import count_created
+
+# Events claimed per dispatch transaction
+DISPATCH_BATCH_SIZE = 500
+
+NOTIFICATION_FIELDS = ('user_id', 'title', 'message', 'notification_type', 'related_object_id')
+
+
+def publish(kind, notifications):
+    """Queue unsaved Notification instances as one event; call inside the transaction making the change"""
+    return NotificationEvent.objects.create(
+        kind=kind,
+        payload=[{field: getattr(notification, field) for field in NOTIFICATION_FIELDS} for notification in notifications],
+    )
+
+
+def dispatch(batch_size=DISPATCH_BATCH_SIZE):
+    """Expand up to batch_size pending events into notifications; returns how many events were sent"""
+    with transaction.atomic():
+        events = list(NotificationEvent.objects.select_for_update(skip_locked=True).order_by('id')[:batch_size])
+        if not events:
+            return 0
+        payload = [values for event in events for values in event.payload]
+        existing = set(
+            get_user_model().objects.filter(pk__in={values['user_id'] for values in payload}).values_list('pk', flat=True)
+        )
+        notifications = Notification.objects.bulk_create(
+            [Notification(**values) for values in payload if values['user_id'] in existing],
+            batch_size=1000
+        )
+        count_created(notifications)
+        NotificationEvent.objects.filter(pk__in=[event.pk for event in events]).delete()
+    return len(events)
+
+
+def dispatch_pending(batch_size=DISPATCH_BATCH_SIZE):
+    """Dispatch batches until the outbox is empty; returns how many events were sent"""
+    total = 0
+    while True:
+        sent = dispatch(batch_size)
+        total += sent
+        if sent < batch_size:
+            return total
@@ -0,0 +1,30 @@
+from django.db.models.signals import post_init, pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from .models import Notification
+from .unread import unread_state, load_unread_state, move_unread
+
+
+@receiver(post_init, sender=Notification)
+def remember_unread_state(sender, instance, **kwargs):
+    instance._unread_state = unread_state(instance)
+
+
+@receiver([pre_save, pre_delete], sender=Notification)
+def load_notification_unread_state(sender, instance, **kwargs):
+    # Instances loaded with deferred fields did not capture their state
+    if instance._unread_state is None and instance.pk is not None:
+        instance._unread_state = load_unread_state(instance.pk)
+
+
+@receiver(post_save, sender=Notification)
+def update_unread_counter(sender, instance, created, **kwargs):
+    state = unread_state(instance) or load_unread_state(instance.pk)
+    # New instances captured their own values on init
+    move_unread(None if created else instance._unread_state, state)
+    instance._unread_state = state
+
+
+@receiver(post_delete, sender=Notification)
+def remove_from_unread_counter(sender, instance, **kwargs):
+    move_unread(instance._unread_state, None)
@@ -1,3 +1,118 @@
+from unittest import mock
+
+from django.db import transaction
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from . import outbox
+from .models import Notification, NotificationEvent, UnreadCounter
+from .unread import unread_count
+
+
+def notification(user, title='Order Placed'):
+    return Notification(user=user, title=title, message='-', notification_type='order')
+
+
+class OutboxTests(TestCase):
+    """notifications.outbox.publish and dispatch"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(
+                username=f'user{i}', password='pass', phone_number=f'900000000{i}', user_type='farmer'
+            )
+            for i in range(3)
+        ]
+
+    def test_publish_rolls_back_with_the_change(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            outbox.publish('order_placed', [notification(self.users[0])])
+            raise RuntimeError
+        self.assertFalse(NotificationEvent.objects.exists())
+
+    def test_failed_dispatch_keeps_events_for_the_next_one(self):
+        outbox.publish('order_placed', [notification(self.users[0]), notification(self.users[1])])
+        outbox.publish('order_status_changed', [notification(self.users[0], 'Order Status Updated')])
+
+        with mock.patch.object(outbox, 'count_created', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            outbox.dispatch()
+        self.assertEqual(NotificationEvent.objects.count(), 2)
+        self.assertFalse(Notification.objects.exists())
+
+        self.assertEqual(outbox.dispatch_pending(), 2)
+        self.assertFalse(NotificationEvent.objects.exists())
+        self.assertEqual(
+            sorted(Notification.objects.values_list('user_id', 'title')),
+            sorted([(self.users[0].pk, 'Order Placed'), (self.users[1].pk, 'Order Placed'),
+                    (self.users[0].pk, 'Order Status Updated')])
+        )
+        self.assertEqual(unread_count(self.users[0]), 2)
+        # Nothing is left to send twice
+        self.assertEqual(outbox.dispatch_pending(), 0)
+
+    def test_batches_drain_in_order(self):
+        for user in self.users:
+            outbox.publish('order_placed', [notification(user)])
+        self.assertEqual(outbox.dispatch(batch_size=2), 2)
+        self.assertEqual(list(Notification.objects.order_by('id').values_list('user_id', flat=True)), [u.pk for u in self.users[:2]])
+        self.assertEqual(outbox.dispatch_pending(batch_size=2), 1)
+
+    def test_deleted_recipient_is_skipped(self):
+        gone = User.objects.create_user(
+            username='gone', password='pass', phone_number='9000000099', user_type='farmer'
+        )
+        outbox.publish('order_placed', [notification(gone), notification(self.users[0])])
+        gone.delete()
+
+        self.assertEqual(outbox.dispatch(), 1)
+        self.assertEqual(list(Notification.objects.values_list('user_id', flat=True)), [self.users[0].pk])
+        self.assertFalse(UnreadCounter.objects.filter(user_id=gone.pk).exists())
+
+
+class UnreadCountTests(TestCase):
+    """NotificationViewSet.unread_count and the counter behind it"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='farmer', password='pass', phone_number='9000000001', user_type='farmer'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('notification-unread-count')
+
+    def test_etag_answers_304_until_the_count_changes(self):
+        first = notification(self.user)
+        first.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'unread_count': 1})
+        etag = response['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        notification(self.user, 'New Sale Received').save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'unread_count': 2})
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_read_and_delete_move_the_counter(self):
+        notifications = [notification(self.user) for _ in range(3)]
+        for item in notifications:
+            item.save()
 
-# Create your tests here.
+        self.client.post(reverse('notification-mark-read', args=[notifications[0].pk]))
+        self.client.post(reverse('notification-mark-read', args=[notifications[0].pk]))
+        self.assertEqual(unread_count(self.user), 2)
+        notifications[1].delete()
+        self.assertEqual(unread_count(self.user), 1)
+        self.client.post(reverse('notification-mark-all-read'))
+        self.assertEqual(self.client.get(self.url).data, {'unread_count': 0})
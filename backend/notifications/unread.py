@@ -0,0 +1,100 @@
+"""
+Per-user unread notification counters.
+
+UnreadCounter.unread moves with every change to a notification's is_read:
+single-row saves and deletes through the receivers, and the bulk paths
+(the outbox dispatcher, mark_read and mark_all_read) through the functions
+below, which adjust it with F() expressions in the transaction of the
+change. mark_read and mark_all_read flip is_read with a conditional UPDATE,
+so a notification is only ever counted down once however many requests
+race. Run reconcile_unread_counts after queryset.update() edits made
+elsewhere.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Value, When
+
+from .models import Notification, UnreadCounter
+
+
+def add_unread(counts):
+    """Add {user_id: delta} to the users' counters, creating missing ones for increments"""
+    counts = {user_id: delta for user_id, delta in counts.items() if delta}
+    if not counts:
+        return
+    # Decrements never create a counter, so deleting a user's notifications cannot revive theirs
+    UnreadCounter.objects.bulk_create(
+        [UnreadCounter(user_id=user_id) for user_id, delta in counts.items() if delta > 0], ignore_conflicts=True
+    )
+    UnreadCounter.objects.filter(user_id__in=counts).update(unread=F('unread') + Case(
+        *[When(user_id=user_id, then=Value(delta)) for user_id, delta in counts.items()],
+        output_field=IntegerField(),
+    ))
+
+
+def count_created(notifications):
+    """Count notifications written with bulk_create, which sends no post_save"""
+    add_unread(Counter(notification.user_id for notification in notifications if not notification.is_read))
+
+
+def unread_state(notification):
+    """(user id, is_read) of a notification, or None if either was not loaded"""
+    values = notification.__dict__
+    if 'user_id' not in values or 'is_read' not in values:
+        return None
+    return values['user_id'], values['is_read']
+
+
+def load_unread_state(pk):
+    return Notification.objects.filter(pk=pk).values_list('user_id', 'is_read').first()
+
+
+def move_unread(old_state, new_state):
+    """Adjust the counters for a notification going from old_state to new_state"""
+    counts = Counter()
+    for state, sign in ((old_state, -1), (new_state, 1)):
+        if state is not None and not state[1]:
+            counts[state[0]] += sign
+    add_unread(counts)
+
+
+def unread_count(user):
+    return UnreadCounter.objects.filter(user=user).values_list('unread', flat=True).first() or 0
+
+
+def mark_read(notification):
+    """Mark one notification read; returns False if it already was"""
+    with transaction.atomic():
+        changed = Notification.objects.filter(pk=notification.pk, is_read=False).update(is_read=True)
+        add_unread({notification.user_id: -changed})
+    notification.is_read = True
+    return bool(changed)
+
+
+def mark_all_read(user):
+    """Mark every unread notification of a user read; returns how many changed"""
+    with transaction.atomic():
+        changed = Notification.objects.filter(user=user, is_read=False).update(is_read=True)
+        add_unread({user.pk: -changed})
+    return changed
+
+
+def reconcile(user_ids=None):
+    """Reset counters to the actual unread counts; returns the number of counters corrected"""
+    unread = Notification.objects.filter(is_read=False)
+    counters = UnreadCounter.objects.all()
+    if user_ids is not None:
+        unread = unread.filter(user_id__in=user_ids)
+        counters = counters.filter(user_id__in=user_ids)
+    actual = dict(unread.values('user_id').annotate(count=Count('id')).order_by().values_list('user_id', 'count'))
+    stored = dict(counters.values_list('user_id', 'unread'))
+
+    corrected = {user_id: actual.get(user_id, 0) for user_id in stored.keys() | actual.keys()
+                 if actual.get(user_id, 0) != stored.get(user_id)}
+    with transaction.atomic():
+        UnreadCounter.objects.bulk_create(
+            [UnreadCounter(user_id=user_id, unread=count) for user_id, count in corrected.items()],
+            update_conflicts=True, unique_fields=['user'], update_fields=['unread'], batch_size=1000
+        )
+    return len(corrected)
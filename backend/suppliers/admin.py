@@ -1,26 +1,29 @@
 from django.contrib import admin
-from .models import SupplierProfile, Product, Equipment, Order, Rental, SupplierReview
+from .models import SupplierProfile, Product, Equipment, Order, Rental, SupplierDailyStats, StockReservation, SupplierReview, EquipmentReview
 
 @admin.register(SupplierProfile)
 class SupplierProfileAdmin(admin.ModelAdmin):
     list_display = ['business_name', 'user', 'rating', 'total_reviews', 'is_active', 'created_at']
     list_filter = ['is_active', 'created_at']
     search_fields = ['business_name', 'user__username', 'gst_number']
-    readonly_fields = ['rating', 'total_reviews', 'created_at', 'updated_at']
+    readonly_fields = ['rating', 'total_reviews', 'rating_sum', 'rating_count_1', 'rating_count_2',
+                       'rating_count_3', 'rating_count_4', 'rating_count_5', 'created_at', 'updated_at']
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ['name', 'supplier', 'category', 'price', 'stock_quantity', 'is_available', 'is_rental']
     list_filter = ['category', 'is_available', 'is_rental', 'created_at']
     search_fields = ['name', 'description', 'supplier__business_name']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['rating', 'total_reviews', 'rating_sum', 'rating_count_1', 'rating_count_2',
+                       'rating_count_3', 'rating_count_4', 'rating_count_5', 'created_at', 'updated_at']
 
 @admin.register(Equipment)
 class EquipmentAdmin(admin.ModelAdmin):
     list_display = ['name', 'supplier', 'equipment_type', 'daily_rate', 'status', 'condition', 'is_available', 'created_at']
     list_filter = ['equipment_type', 'status', 'condition', 'is_available', 'created_at']
     search_fields = ['name', 'description', 'supplier__business_name', 'brand', 'model']
-    readonly_fields = ['total_rentals', 'rating', 'created_at', 'updated_at']
+    readonly_fields = ['total_rentals', 'rating', 'total_reviews', 'rating_sum', 'rating_count_1', 'rating_count_2',
+                       'rating_count_3', 'rating_count_4', 'rating_count_5', 'created_at', 'updated_at']
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
@@ -36,9 +39,31 @@ class RentalAdmin(admin.ModelAdmin):
     search_fields = ['rental_number', 'customer__username', 'equipment__name', 'supplier__business_name']
     readonly_fields = ['rental_number', 'rental_duration_days', 'created_at', 'updated_at', 'confirmed_at', 'started_at', 'completed_at']
 
+@admin.register(SupplierDailyStats)
+class SupplierDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ['supplier', 'date', 'delivered_orders', 'order_earnings', 'completed_rentals', 'rental_earnings']
+    list_filter = ['date']
+    search_fields = ['supplier__business_name']
+    # Maintained from orders and rentals; fix drift with rebuild_supplier_stats
+    readonly_fields = [field.name for field in SupplierDailyStats._meta.fields]
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ['order', 'product', 'quantity', 'expires_at', 'created_at']
+    list_filter = ['expires_at']
+    search_fields = ['order__order_number', 'product__name']
+    readonly_fields = [field.name for field in StockReservation._meta.fields]
+
 @admin.register(SupplierReview)
 class SupplierReviewAdmin(admin.ModelAdmin):
     list_display = ['supplier', 'reviewer', 'rating', 'created_at']
     list_filter = ['rating', 'created_at']
     search_fields = ['supplier__business_name', 'reviewer__username']
     readonly_fields = ['created_at']
+
+@admin.register(EquipmentReview)
+class EquipmentReviewAdmin(admin.ModelAdmin):
+    list_display = ['equipment', 'reviewer', 'rating', 'created_at']
+    list_filter = ['rating', 'created_at']
+    search_fields = ['equipment__name', 'reviewer__username']
+    readonly_fields = ['created_at']
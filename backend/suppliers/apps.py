@@ -8,5 +8,5 @@ class SuppliersConfig(AppConfig):
     def ready(self):
         # Temporarily disabled auto-profile creation to prevent duplicate errors
         # Profiles will be created manually on first login
-        pass
         # import suppliers.signals
+        import suppliers.receivers  # noqa: F401
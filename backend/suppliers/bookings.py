@@ -0,0 +1,93 @@
+"""
+Equipment booking calendar.
+
+Confirmed and active rentals hold their dates through an EquipmentBooking
+row. New bookings are checked and written while the equipment row is
+locked, so the bookings of one piece of equipment never overlap. Sorted by
+start date they are then disjoint intervals, and a date range is free
+exactly when the last booking starting on or before its end finishes
+before its start: one seek on the (equipment, start_date) index, O(log n)
+per item however long the booking history.
+"""
+from datetime import date
+
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery
+
+from .models import Equipment, EquipmentBooking
+
+# Rentals in these statuses hold their equipment's dates
+BOOKED_STATUSES = ('confirmed', 'active')
+# Longest range one availability query may ask about
+MAX_RANGE_DAYS = 366
+
+
+class BookingConflict(Exception):
+    """The equipment is already booked for part of the requested dates"""
+
+    def __init__(self, booking):
+        super().__init__(
+            f'Equipment is already booked from {booking.start_date} to {booking.end_date}.'
+        )
+        self.booking = booking
+
+
+def parse_date_range(start, end):
+    """(start, end) dates from YYYY-MM-DD strings; ValueError unless start <= end within MAX_RANGE_DAYS"""
+    start, end = date.fromisoformat(start), date.fromisoformat(end)
+    if end < start:
+        raise ValueError('end_date must not be before start_date')
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise ValueError(f'Date ranges are limited to {MAX_RANGE_DAYS} days')
+    return start, end
+
+
+def conflicting_booking(equipment_id, start, end, exclude_rental_id=None):
+    """A booking overlapping start..end (inclusive), or None if the dates are free"""
+    bookings = EquipmentBooking.objects.filter(equipment_id=equipment_id, start_date__lte=end)
+    if exclude_rental_id is not None:
+        bookings = bookings.exclude(rental_id=exclude_rental_id)
+    booking = bookings.order_by('-start_date').first()
+    if booking is not None and booking.end_date >= start:
+        return booking
+    return None
+
+
+def free_between(queryset, start, end):
+    """Narrow an Equipment queryset to items with no booking overlapping start..end"""
+    last_end = EquipmentBooking.objects.filter(
+        equipment=OuterRef('pk'), start_date__lte=end
+    ).order_by('-start_date').values('end_date')[:1]
+    return queryset.annotate(last_booked_until=Subquery(last_end)).filter(
+        Q(last_booked_until__isnull=True) | Q(last_booked_until__lt=start)
+    )
+
+
+def bookings_between(equipment_id, start, end):
+    """Bookings of one piece of equipment overlapping start..end, earliest first"""
+    return EquipmentBooking.objects.filter(
+        equipment_id=equipment_id, start_date__lte=end, end_date__gte=start
+    ).order_by('start_date')
+
+
+def sync_booking(rental):
+    """
+    Make the rental's booking match its status and dates: held while it is
+    confirmed or active, gone otherwise. Raises BookingConflict, writing
+    nothing, if the dates overlap another booking.
+    """
+    with transaction.atomic():
+        if rental.status not in BOOKED_STATUSES:
+            EquipmentBooking.objects.filter(rental_id=rental.pk).delete()
+            return None
+
+        # Serialize bookings of this equipment so two overlapping ones cannot both pass the check
+        Equipment.objects.select_for_update().filter(pk=rental.equipment_id).values_list('pk', flat=True).get()
+        conflict = conflicting_booking(rental.equipment_id, rental.start_date, rental.end_date, exclude_rental_id=rental.pk)
+        if conflict is not None:
+            raise BookingConflict(conflict)
+        booking, _ = EquipmentBooking.objects.update_or_create(
+            rental_id=rental.pk,
+            defaults={'equipment_id': rental.equipment_id, 'start_date': rental.start_date, 'end_date': rental.end_date},
+        )
+        return booking
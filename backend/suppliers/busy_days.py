@@ -0,0 +1,151 @@
+"""
+Busy-day bitmaps for date-filtered equipment search.
+
+Each EquipmentCalendar row holds one bit per day for the HORIZON_DAYS days
+from its window_start, set on the days a booking holds the equipment. As
+bookings never overlap, writing or removing one sets or clears exactly its
+own days, so the bitmap is updated in place from the booking receivers; a
+row whose window has fallen behind today is rebuilt from its bookings on
+its next write, or by the refresh_equipment_calendars command.
+
+A search loads the bitmaps of every candidate in one query and tests them
+all against the requested days with a single numpy AND. Ranges outside the
+horizon, and the rare rows whose stale window does not cover the range, are
+answered from the booking table instead.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from .bookings import free_between
+from .models import Equipment, EquipmentBooking, EquipmentCalendar
+
+# Days ahead each bitmap covers
+HORIZON_DAYS = 180
+BITMAP_BYTES = (HORIZON_DAYS + 7) // 8
+BOOKING_FIELDS = ('equipment_id', 'start_date', 'end_date')
+
+
+def pack(bits):
+    return np.packbits(bits).tobytes()
+
+
+def unpack(busy):
+    """Boolean day array of one stored bitmap"""
+    return np.unpackbits(np.frombuffer(bytes(busy), dtype=np.uint8), count=HORIZON_DAYS).astype(bool)
+
+
+def build_bitmap(equipment_id, window_start):
+    """Bitmap of the equipment's bookings over HORIZON_DAYS from window_start"""
+    window_end = window_start + timedelta(days=HORIZON_DAYS - 1)
+    bits = np.zeros(HORIZON_DAYS, dtype=bool)
+    bookings = EquipmentBooking.objects.filter(
+        equipment_id=equipment_id, start_date__lte=window_end, end_date__gte=window_start
+    ).values_list('start_date', 'end_date')
+    for start, end in bookings:
+        bits[max((start - window_start).days, 0):(end - window_start).days + 1] = True
+    return pack(bits)
+
+
+def booking_state(booking):
+    """(equipment id, start, end) of a booking, or None if any was not loaded"""
+    values = booking.__dict__
+    if any(field not in values for field in BOOKING_FIELDS):
+        return None
+    return tuple(values[field] for field in BOOKING_FIELDS)
+
+
+def load_booking_state(pk):
+    return EquipmentBooking.objects.filter(pk=pk).values_list(*BOOKING_FIELDS).first()
+
+
+def move_booking(old_state, new_state):
+    """Clear the days of old_state's booking and mark those of new_state's"""
+    if old_state == new_state:
+        return
+    if old_state is not None:
+        mark_days(*old_state, busy=False)
+    if new_state is not None:
+        mark_days(*new_state)
+
+
+def mark_days(equipment_id, start, end, busy=True):
+    """
+    Set (or with busy=False clear) start..end in the equipment's bitmap. Call
+    in the transaction that wrote or deleted the booking, after it did so.
+    """
+    today = timezone.localdate()
+    calendar = EquipmentCalendar.objects.select_for_update().filter(equipment_id=equipment_id).first()
+    if calendar is None:
+        if not busy:
+            return
+        calendar = EquipmentCalendar(equipment_id=equipment_id, window_start=today, busy=bytes(BITMAP_BYTES))
+
+    if calendar.window_start != today:
+        # Days past the old window were never recorded; the booking table already has this change
+        calendar.window_start = today
+        calendar.busy = build_bitmap(equipment_id, today)
+    else:
+        bits = unpack(calendar.busy)
+        bits[max((start - today).days, 0):max((end - today).days + 1, 0)] = busy
+        calendar.busy = pack(bits)
+    calendar.save()
+
+
+def refresh_calendars():
+    """Roll every bitmap whose window starts before today forward to today; returns how many"""
+    today = timezone.localdate()
+    stale = list(EquipmentCalendar.objects.filter(window_start__lt=today).values_list('equipment_id', flat=True))
+    EquipmentCalendar.objects.bulk_update(
+        [
+            EquipmentCalendar(equipment_id=equipment_id, window_start=today, busy=build_bitmap(equipment_id, today))
+            for equipment_id in stale
+        ],
+        ['window_start', 'busy'],
+        batch_size=1000
+    )
+    return len(stale)
+
+
+def free_mask(equipment_ids, start, end):
+    """Boolean array: which of equipment_ids (a numpy array) have no booking overlapping start..end"""
+    equipment_ids = np.asarray(equipment_ids, dtype=np.int64)
+    free = np.ones(len(equipment_ids), dtype=bool)
+    if not len(equipment_ids):
+        return free
+
+    today = timezone.localdate()
+    if start < today or (end - today).days >= HORIZON_DAYS:
+        return free_in_table(equipment_ids, start, end)
+
+    rows = list(
+        EquipmentCalendar.objects.filter(equipment_id__in=equipment_ids.tolist())
+        .values_list('equipment_id', 'window_start', 'busy')
+    )
+    if not rows:
+        return free
+
+    row_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    offsets = np.array([(start - row[1]).days for row in rows])
+    length = (end - start).days + 1
+    bitmaps = np.frombuffer(b''.join(bytes(row[2]) for row in rows), dtype=np.uint8).reshape(len(rows), BITMAP_BYTES)
+    bits = np.unpackbits(bitmaps, axis=1, count=HORIZON_DAYS).astype(bool)
+
+    days = np.arange(HORIZON_DAYS)
+    wanted = (days >= offsets[:, None]) & (days < offsets[:, None] + length)
+    booked = (bits & wanted).any(axis=1)
+    # A window that fell behind today does not cover the last days of the range
+    stale = (offsets < 0) | (offsets + length > HORIZON_DAYS)
+
+    free[np.isin(equipment_ids, row_ids[booked & ~stale])] = False
+    if stale.any():
+        in_stale = np.isin(equipment_ids, row_ids[stale])
+        free[in_stale] = free_in_table(equipment_ids[in_stale], start, end)
+    return free
+
+
+def free_in_table(equipment_ids, start, end):
+    """free_mask answered from the booking table, in one query"""
+    free_ids = free_between(Equipment.objects.filter(pk__in=equipment_ids.tolist()), start, end).values_list('pk', flat=True)
+    return np.isin(equipment_ids, np.fromiter(free_ids, dtype=np.int64))
@@ -0,0 +1,137 @@
+"""
+Multi-item checkout of supplier products.
+
+A checkout locks every product it touches in primary key order (so two
+overlapping checkouts cannot deadlock), checks the quantities against the
+stock not held by other pending orders, writes the orders and their stock
+reservations with one bulk_create each and queues all notifications as one
+outbox event, inside one transaction. bulk_create sends no post_save, so
+the daily rollup and the cached status breakdowns are updated here instead
+of by the receivers.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from notifications.models import Notification
+from notifications.outbox import publish
+from .models import Product, Order, StockReservation
+from .rollups import ORDER_ROLLUP
+from .stats import invalidate_status_breakdown
+from .stock import InsufficientStock, reserved_quantities, reservation_ttl, invalidate_available_to_sell
+
+# Most distinct products one checkout may order
+MAX_CHECKOUT_ITEMS = 50
+
+
+class UnavailableProducts(Exception):
+    """Some ordered products do not exist or are not for sale"""
+
+    def __init__(self, product_ids):
+        super().__init__(f'Products not found or unavailable: {", ".join(map(str, product_ids))}')
+        self.product_ids = product_ids
+
+
+def parse_items(items):
+    """
+    {product_id: quantity} from a list of {'product_id', 'quantity'} dicts,
+    adding up repeated products; ValueError with a message if malformed.
+    """
+    if not isinstance(items, list) or not items:
+        raise ValueError('items must be a non-empty list of {"product_id", "quantity"} objects.')
+    quantities = defaultdict(int)
+    for item in items:
+        try:
+            product_id = int(item['product_id'])
+            quantity = int(item.get('quantity', 1))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise ValueError('Each item needs an integer product_id and quantity.')
+        if quantity <= 0:
+            raise ValueError('quantity must be a positive integer.')
+        quantities[product_id] += quantity
+    if len(quantities) > MAX_CHECKOUT_ITEMS:
+        raise ValueError(f'At most {MAX_CHECKOUT_ITEMS} different products per checkout.')
+    return dict(quantities)
+
+
+def checkout(customer, quantities, delivery_method='pickup', delivery_address='', customer_notes=''):
+    """
+    Place one pending order per product in quantities ({product_id: quantity})
+    and hold its stock. Delivery charges apply once per supplier. Returns the
+    orders in product id order; raises UnavailableProducts or
+    InsufficientStock, leaving nothing written.
+    """
+    product_ids = sorted(quantities)
+    with transaction.atomic():
+        products = list(
+            Product.objects.select_for_update(of=('self',)).filter(pk__in=product_ids, is_available=True)
+            .select_related('supplier').order_by('pk')
+        )
+        missing = sorted(set(product_ids) - {product.pk for product in products})
+        if missing:
+            raise UnavailableProducts(missing)
+
+        reserved = reserved_quantities(product_ids)
+        for product in products:
+            available = max(product.stock_quantity - reserved.get(product.pk, 0), 0)
+            if available < quantities[product.pk]:
+                raise InsufficientStock(available, product_id=product.pk)
+
+        charged_suppliers = set()
+        orders = []
+        for product in products:
+            delivery_charges = Decimal('0')
+            if delivery_method == 'delivery' and product.supplier_id not in charged_suppliers:
+                delivery_charges = product.supplier.delivery_charges or Decimal('0')
+                charged_suppliers.add(product.supplier_id)
+            quantity = quantities[product.pk]
+            orders.append(Order(
+                order_number=Order.make_order_number(),
+                supplier=product.supplier,
+                customer=customer,
+                product=product,
+                quantity=quantity,
+                unit_price=product.price,
+                total_amount=product.price * quantity + delivery_charges,
+                delivery_method=delivery_method,
+                delivery_address=delivery_address,
+                delivery_charges=delivery_charges,
+                customer_notes=customer_notes,
+                status='pending',
+                payment_status='pending',
+            ))
+        Order.objects.bulk_create(orders)
+
+        expires_at = timezone.now() + reservation_ttl()
+        StockReservation.objects.bulk_create([
+            StockReservation(product_id=order.product_id, order=order, quantity=order.quantity, expires_at=expires_at)
+            for order in orders
+        ])
+        invalidate_available_to_sell([order.product_id for order in orders])
+        publish('order_placed', [
+            notification
+            for order in orders
+            for notification in (
+                Notification(
+                    user_id=order.supplier.user_id,
+                    title="New Order Received",
+                    message=f"You have received a new order #{order.id} for {order.product.name}.",
+                    notification_type='order',
+                    related_object_id=f"SORD-{order.id}"
+                ),
+                Notification(
+                    user=customer,
+                    title="Order Placed",
+                    message=f"Your order for {order.product.name} has been placed successfully.",
+                    notification_type='order',
+                    related_object_id=f"SORD-{order.id}"
+                ),
+            )
+        ])
+
+        ORDER_ROLLUP.add_created(orders)
+        for supplier_id in {order.supplier_id for order in orders}:
+            invalidate_status_breakdown(Order, supplier_id)
+    return orders
@@ -0,0 +1,51 @@
+"""Spatial indexes, response caches and map clusters backing the supplier, product and equipment location actions"""
+from django.db.models import Q, F, Case, When
+
+from geo.index import SpatialIndex
+from geo.cache import NearbyCache
+from geo.clusters import ClusterGrid
+from geo.pincodes import pin_code_centroid
+from .models import SupplierProfile, Product, Equipment
+
+
+def load_suppliers():
+    # Mirrors SupplierProfile.get_coordinates()
+    has_own_location = Q(latitude__isnull=False, longitude__isnull=False) & (
+        Q(location_from_pin_code=False) | Q(user__latitude__isnull=True) | Q(user__longitude__isnull=True)
+    )
+    suppliers = SupplierProfile.objects.filter(
+        is_active=True,
+        verification_status='verified'
+    ).annotate(
+        geo_latitude=Case(When(has_own_location, then=F('latitude')), default=F('user__latitude')),
+        geo_longitude=Case(When(has_own_location, then=F('longitude')), default=F('user__longitude')),
+    ).values_list('id', 'geo_latitude', 'geo_longitude', 'business_types', 'pin_code')
+    
+    for pk, latitude, longitude, business_types, pin_code in suppliers:
+        if latitude is None or longitude is None:
+            # Profiles saved before the PIN code table existed
+            latitude, longitude = pin_code_centroid(pin_code) or (None, None)
+        yield pk, latitude, longitude, business_types
+
+
+def load_products():
+    return Product.objects.filter(is_available=True).values_list(
+        'id', 'seller_latitude', 'seller_longitude', 'category'
+    )
+
+
+def load_equipment():
+    return Equipment.objects.filter(is_available=True, status='available').values_list(
+        'id', 'seller_latitude', 'seller_longitude', 'equipment_type'
+    )
+
+
+supplier_index = SpatialIndex('suppliers', load_suppliers, tag_contains=True)
+product_index = SpatialIndex('products', load_products)
+equipment_index = SpatialIndex('equipment', load_equipment)
+
+product_cache = NearbyCache('products')
+equipment_cache = NearbyCache('equipment')
+
+supplier_clusters = ClusterGrid(supplier_index)
+equipment_clusters = ClusterGrid(equipment_index)
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from suppliers.models import SupplierProfile
+from suppliers.indexes import supplier_index, product_index, equipment_index, product_cache, equipment_cache
+
+UPDATED_FIELDS = ['latitude', 'longitude', 'location_from_pin_code']
+
+
+class Command(BaseCommand):
+    help = 'Fill PIN code locations and recompute supplier delivery coverage cells and the seller location copied onto listings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of profiles to update per query',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        profiles = SupplierProfile.objects.select_related('user').order_by('pk')
+        pending = []
+        updated_count = 0
+
+        for profile in profiles.iterator(chunk_size=batch_size):
+            location = (profile.latitude, profile.longitude, profile.location_from_pin_code)
+            profile.fill_location_from_pin_code()
+            if location != (profile.latitude, profile.longitude, profile.location_from_pin_code):
+                pending.append(profile)
+            profile.sync_listing_locations()
+            profile.sync_delivery_cells()
+
+            if len(pending) >= batch_size:
+                SupplierProfile.objects.bulk_update(pending, UPDATED_FIELDS)
+                updated_count += len(pending)
+                pending = []
+
+        if pending:
+            SupplierProfile.objects.bulk_update(pending, UPDATED_FIELDS)
+            updated_count += len(pending)
+
+        # Rows were changed with bulk_update() and queryset.update(), which send no signals
+        supplier_index.mark_stale()
+        product_index.mark_stale()
+        equipment_index.mark_stale()
+        product_cache.invalidate_all()
+        equipment_cache.invalidate_all()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated locations for {updated_count} supplier profile(s) and synced listing locations and delivery cells'
+        ))
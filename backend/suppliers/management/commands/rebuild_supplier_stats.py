@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from suppliers.rollups import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-supplier daily order and rental rollup from the raw rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--supplier',
+            type=int,
+            action='append',
+            help='Supplier profile id to rebuild (repeatable); defaults to all suppliers',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            row_count = rebuild_daily_stats(options.get('supplier'))
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {row_count} supplier daily stats row(s)'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from suppliers.ratings import RATINGS
+
+
+class Command(BaseCommand):
+    help = 'Recompute rating averages, counts and histograms from the reviews, fixing any drift'
+
+    def handle(self, *args, **options):
+        for aggregate in RATINGS.values():
+            with transaction.atomic():
+                corrected = aggregate.reconcile()
+            self.stdout.write(self.style.SUCCESS(
+                f'{aggregate.target_model._meta.verbose_name_plural}: corrected {corrected} row(s)'
+            ))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from suppliers.busy_days import refresh_calendars
+
+
+class Command(BaseCommand):
+    help = 'Roll equipment busy-day bitmaps forward to today so date searches stay on the bitmaps (run daily, e.g. from cron)'
+
+    def handle(self, *args, **options):
+        refreshed = refresh_calendars()
+        self.stdout.write(self.style.SUCCESS(f'Refreshed {refreshed} equipment calendar(s)'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from suppliers.stock import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = 'Release stock held by pending orders whose reservation has expired (run periodically, e.g. from cron)'
+
+    def handle(self, *args, **options):
+        released = release_expired_reservations()
+        self.stdout.write(self.style.SUCCESS(f'Released {released} expired stock reservation(s)'))
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 10:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0007_supplierprofile_account_number_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supplierprofile',
+            name='geo_cell',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+    ]
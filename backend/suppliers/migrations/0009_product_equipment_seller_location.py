@@ -0,0 +1,64 @@
+# Generated by Django 6.0.2 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+from geo.utils import grid_cell
+
+
+def copy_seller_locations(apps, schema_editor):
+    SupplierProfile = apps.get_model('suppliers', 'SupplierProfile')
+    Product = apps.get_model('suppliers', 'Product')
+    Equipment = apps.get_model('suppliers', 'Equipment')
+    for profile in SupplierProfile.objects.select_related('user').iterator():
+        if profile.latitude is not None and profile.longitude is not None:
+            latitude, longitude = profile.latitude, profile.longitude
+        else:
+            latitude, longitude = profile.user.latitude, profile.user.longitude
+        location = {
+            'seller_latitude': latitude,
+            'seller_longitude': longitude,
+            'geo_cell': grid_cell(latitude, longitude),
+        }
+        Product.objects.filter(supplier=profile).update(**location)
+        Equipment.objects.filter(supplier=profile).update(**location)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0008_supplierprofile_geo_cell'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipment',
+            name='geo_cell',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='equipment',
+            name='seller_latitude',
+            field=models.DecimalField(blank=True, decimal_places=6, editable=False, max_digits=9, null=True),
+        ),
+        migrations.AddField(
+            model_name='equipment',
+            name='seller_longitude',
+            field=models.DecimalField(blank=True, decimal_places=6, editable=False, max_digits=9, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='geo_cell',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='seller_latitude',
+            field=models.DecimalField(blank=True, decimal_places=6, editable=False, max_digits=9, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='seller_longitude',
+            field=models.DecimalField(blank=True, decimal_places=6, editable=False, max_digits=9, null=True),
+        ),
+        migrations.RunPython(copy_seller_locations, migrations.RunPython.noop),
+    ]
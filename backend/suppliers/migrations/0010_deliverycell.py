@@ -0,0 +1,52 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from geo.utils import cells_within
+
+# suppliers.models.MAX_INDEXED_DELIVERY_RADIUS_KM and DeliveryCell.WIDE_COVERAGE when written
+MAX_INDEXED_DELIVERY_RADIUS_KM = 300
+WIDE_COVERAGE = -1
+
+
+def register_delivery_cells(apps, schema_editor):
+    SupplierProfile = apps.get_model('suppliers', 'SupplierProfile')
+    DeliveryCell = apps.get_model('suppliers', 'DeliveryCell')
+    profiles = SupplierProfile.objects.filter(
+        home_delivery_available=True, delivery_radius_km__gt=0
+    ).select_related('user')
+    for profile in profiles.iterator():
+        if profile.latitude is not None and profile.longitude is not None:
+            latitude, longitude = profile.latitude, profile.longitude
+        else:
+            latitude, longitude = profile.user.latitude, profile.user.longitude
+        if latitude is None or longitude is None:
+            continue
+        if profile.delivery_radius_km > MAX_INDEXED_DELIVERY_RADIUS_KM:
+            cells = [WIDE_COVERAGE]
+        else:
+            cells = cells_within(float(latitude), float(longitude), profile.delivery_radius_km)
+        DeliveryCell.objects.bulk_create([DeliveryCell(supplier=profile, cell=cell) for cell in cells])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0009_product_equipment_seller_location'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cell', models.IntegerField(db_index=True)),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='delivery_cells', to='suppliers.supplierprofile')),
+            ],
+            options={
+                'unique_together': {('supplier', 'cell')},
+            },
+        ),
+        migrations.RunPython(register_delivery_cells, migrations.RunPython.noop),
+    ]
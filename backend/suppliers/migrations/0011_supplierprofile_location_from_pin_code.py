@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0010_deliverycell'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supplierprofile',
+            name='location_from_pin_code',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 6.0.2 on 2026-10-18 13:40
+
+import django.db.models.deletion
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+# (model, status prefix, open statuses, earned status, earned-at field,
+#  open amount field, earned count field, earnings field) as in suppliers.rollups
+ROLLUPS = [
+    ('Order', 'orders', ['pending', 'confirmed', 'processing'], 'delivered', 'delivered_at',
+     'order_open_amount', 'delivered_orders', 'order_earnings'),
+    ('Rental', 'rentals', ['pending', 'confirmed', 'active'], 'completed', 'completed_at',
+     'rental_open_amount', 'completed_rentals', 'rental_earnings'),
+]
+
+
+def build_daily_stats(apps, schema_editor):
+    SupplierDailyStats = apps.get_model('suppliers', 'SupplierDailyStats')
+    fields = {field.name for field in SupplierDailyStats._meta.get_fields()}
+    rows = defaultdict(lambda: defaultdict(int))
+
+    for model_name, prefix, open_statuses, earned_status, earned_at, open_amount, earned_count, earnings in ROLLUPS:
+        model = apps.get_model('suppliers', model_name)
+        placed = model.objects.annotate(day=TruncDate('created_at')).values('supplier_id', 'day', 'status').annotate(
+            count=Count('id'), amount=Sum('total_amount')
+        )
+        for group in placed:
+            row = rows[group['supplier_id'], group['day']]
+            if f"{prefix}_{group['status']}" in fields:
+                row[f"{prefix}_{group['status']}"] += group['count']
+            if group['status'] in open_statuses:
+                row[open_amount] += group['amount'] or 0
+
+        earned = model.objects.filter(status=earned_status, **{f'{earned_at}__isnull': False}).annotate(
+            day=TruncDate(earned_at)
+        ).values('supplier_id', 'day').annotate(count=Count('id'), amount=Sum('total_amount'))
+        for group in earned:
+            row = rows[group['supplier_id'], group['day']]
+            row[earned_count] += group['count']
+            row[earnings] += group['amount'] or 0
+
+    SupplierDailyStats.objects.bulk_create(
+        [SupplierDailyStats(supplier_id=supplier_id, date=date, **values) for (supplier_id, date), values in rows.items()],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0011_supplierprofile_location_from_pin_code'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SupplierDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('orders_pending', models.IntegerField(default=0)),
+                ('orders_confirmed', models.IntegerField(default=0)),
+                ('orders_processing', models.IntegerField(default=0)),
+                ('orders_ready', models.IntegerField(default=0)),
+                ('orders_delivered', models.IntegerField(default=0)),
+                ('orders_cancelled', models.IntegerField(default=0)),
+                ('orders_rejected', models.IntegerField(default=0)),
+                ('order_open_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('rentals_pending', models.IntegerField(default=0)),
+                ('rentals_confirmed', models.IntegerField(default=0)),
+                ('rentals_active', models.IntegerField(default=0)),
+                ('rentals_completed', models.IntegerField(default=0)),
+                ('rentals_cancelled', models.IntegerField(default=0)),
+                ('rentals_rejected', models.IntegerField(default=0)),
+                ('rental_open_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('delivered_orders', models.IntegerField(default=0)),
+                ('order_earnings', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('completed_rentals', models.IntegerField(default=0)),
+                ('rental_earnings', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='suppliers.supplierprofile')),
+            ],
+            options={
+                'verbose_name_plural': 'Supplier daily stats',
+                'ordering': ['-date'],
+                'unique_together': {('supplier', 'date')},
+            },
+        ),
+        migrations.RunPython(build_daily_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:10
+
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def build_rating_aggregates(apps, schema_editor):
+    SupplierProfile = apps.get_model('suppliers', 'SupplierProfile')
+    SupplierReview = apps.get_model('suppliers', 'SupplierReview')
+
+    counts = defaultdict(dict)
+    for group in SupplierReview.objects.values('supplier_id', 'rating').annotate(count=Count('id')).order_by():
+        counts[group['supplier_id']][group['rating']] = group['count']
+
+    profiles = list(SupplierProfile.objects.all())
+    for profile in profiles:
+        by_star = {star: count for star, count in counts.get(profile.pk, {}).items() if 1 <= star <= 5}
+        for star in range(1, 6):
+            setattr(profile, f'rating_count_{star}', by_star.get(star, 0))
+        profile.rating_sum = sum(star * count for star, count in by_star.items())
+        profile.total_reviews = sum(by_star.values())
+        profile.rating = (
+            (Decimal(profile.rating_sum) / profile.total_reviews).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            if profile.total_reviews else Decimal('0.00')
+        )
+    SupplierProfile.objects.bulk_update(
+        profiles,
+        ['rating', 'total_reviews', 'rating_sum'] + [f'rating_count_{star}' for star in range(1, 6)],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0012_supplierdailystats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supplierprofile',
+            name='rating_sum',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='supplierprofile',
+            name='rating_count_1',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='supplierprofile',
+            name='rating_count_2',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='supplierprofile',
+            name='rating_count_3',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='supplierprofile',
+            name='rating_count_4',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='supplierprofile',
+            name='rating_count_5',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(build_rating_aggregates, migrations.RunPython.noop),
+    ]
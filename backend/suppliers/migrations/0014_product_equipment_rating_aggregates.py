@@ -0,0 +1,150 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:55
+
+import django.db.models.deletion
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+# (rated model, review model, review field pointing at it) as in suppliers.ratings
+RATED_MODELS = [
+    ('Product', 'ProductReview', 'product'),
+    ('Equipment', 'EquipmentReview', 'equipment'),
+]
+
+
+def build_rating_aggregates(apps, schema_editor):
+    for model_name, review_model_name, target_field in RATED_MODELS:
+        model = apps.get_model('suppliers', model_name)
+        review_model = apps.get_model('suppliers', review_model_name)
+
+        counts = defaultdict(dict)
+        reviews = review_model.objects.values(f'{target_field}_id', 'rating').annotate(count=Count('id')).order_by()
+        for group in reviews:
+            counts[group[f'{target_field}_id']][group['rating']] = group['count']
+
+        rows = list(model.objects.all())
+        for row in rows:
+            by_star = {star: count for star, count in counts.get(row.pk, {}).items() if 1 <= star <= 5}
+            for star in range(1, 6):
+                setattr(row, f'rating_count_{star}', by_star.get(star, 0))
+            row.rating_sum = sum(star * count for star, count in by_star.items())
+            row.total_reviews = sum(by_star.values())
+            row.rating = (
+                (Decimal(row.rating_sum) / row.total_reviews).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+                if row.total_reviews else Decimal('0.00')
+            )
+        model.objects.bulk_update(
+            rows,
+            ['rating', 'total_reviews', 'rating_sum'] + [f'rating_count_{star}' for star in range(1, 6)],
+            batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0013_supplierprofile_rating_aggregates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipment',
+            name='rating_count_1',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='equipment',
+            name='rating_count_2',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='equipment',
+            name='rating_count_3',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='equipment',
+            name='rating_count_4',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='equipment',
+            name='rating_count_5',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='equipment',
+            name='rating_sum',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='equipment',
+            name='total_reviews',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating',
+            field=models.DecimalField(decimal_places=2, default=0.0, editable=False, max_digits=3),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count_1',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count_2',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count_3',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count_4',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count_5',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='total_reviews',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='equipment',
+            name='rating',
+            field=models.DecimalField(decimal_places=2, default=0.0, editable=False, max_digits=3),
+        ),
+        migrations.CreateModel(
+            name='EquipmentReview',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rating', models.IntegerField(choices=[(1, 1), (2, 2), (3, 3), (4, 4), (5, 5)])),
+                ('comment', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('equipment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to='suppliers.equipment')),
+                ('reviewer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'unique_together': {('equipment', 'reviewer')},
+            },
+        ),
+        migrations.RunPython(build_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 6.0.2 on 2026-10-18 16:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_bookings(apps, schema_editor):
+    Rental = apps.get_model('suppliers', 'Rental')
+    EquipmentBooking = apps.get_model('suppliers', 'EquipmentBooking')
+    EquipmentBooking.objects.bulk_create(
+        [
+            EquipmentBooking(
+                equipment_id=rental.equipment_id, rental_id=rental.pk,
+                start_date=rental.start_date, end_date=rental.end_date
+            )
+            for rental in Rental.objects.filter(status__in=['confirmed', 'active']).only(
+                'pk', 'equipment_id', 'start_date', 'end_date'
+            )
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0015_stockreservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipmentBooking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('equipment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='suppliers.equipment')),
+                ('rental', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='booking', to='suppliers.rental')),
+            ],
+            options={
+                'ordering': ['start_date'],
+                'indexes': [models.Index(fields=['equipment', 'start_date'], name='suppliers_e_equipme_f38271_idx')],
+            },
+        ),
+        migrations.RunPython(build_bookings, migrations.RunPython.noop),
+    ]
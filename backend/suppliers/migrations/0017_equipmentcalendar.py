@@ -0,0 +1,50 @@
+# Generated by Django 6.0.2 on 2026-10-18 17:05
+
+from collections import defaultdict
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+HORIZON_DAYS = 180
+
+
+def build_calendars(apps, schema_editor):
+    EquipmentBooking = apps.get_model('suppliers', 'EquipmentBooking')
+    EquipmentCalendar = apps.get_model('suppliers', 'EquipmentCalendar')
+    today = timezone.localdate()
+    window_end = today + timedelta(days=HORIZON_DAYS - 1)
+    bitmaps = defaultdict(lambda: bytearray((HORIZON_DAYS + 7) // 8))
+    for equipment_id, start, end in EquipmentBooking.objects.filter(end_date__gte=today).values_list(
+        'equipment_id', 'start_date', 'end_date'
+    ):
+        bitmap = bitmaps[equipment_id]
+        for day in range(max((start - today).days, 0), (min(end, window_end) - today).days + 1):
+            bitmap[day // 8] |= 0x80 >> (day % 8)
+    EquipmentCalendar.objects.bulk_create(
+        [
+            EquipmentCalendar(equipment_id=equipment_id, window_start=today, busy=bytes(bitmap))
+            for equipment_id, bitmap in bitmaps.items()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0016_equipmentbooking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipmentCalendar',
+            fields=[
+                ('equipment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='calendar', serialize=False, to='suppliers.equipment')),
+                ('window_start', models.DateField()),
+                ('busy', models.BinaryField()),
+            ],
+        ),
+        migrations.RunPython(build_calendars, migrations.RunPython.noop),
+    ]
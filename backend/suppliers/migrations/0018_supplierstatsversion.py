@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-18 19:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0017_equipmentcalendar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SupplierStatsVersion',
+            fields=[
+                ('supplier', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats_version', serialize=False, to='suppliers.supplierprofile')),
+                ('orders', models.BigIntegerField(default=0)),
+                ('rentals', models.BigIntegerField(default=0)),
+                ('inventory', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.2 on 2026-10-18 21:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0018_supplierstatsversion'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='supplierprofile',
+            name='geo_cell',
+        ),
+    ]
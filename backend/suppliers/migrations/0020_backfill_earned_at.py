@@ -0,0 +1,46 @@
+# Generated by Django 6.0.2 on 2026-10-18 21:40
+
+from django.db import migrations
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+# (model, earned status, earned-at field, earned count field, earnings field) as in suppliers.rollups
+EARNED = [
+    ('Order', 'delivered', 'delivered_at', 'delivered_orders', 'order_earnings'),
+    ('Rental', 'completed', 'completed_at', 'completed_rentals', 'rental_earnings'),
+]
+
+
+def backfill_earned_at(apps, schema_editor):
+    """
+    Date delivered orders and completed rentals that have no delivered_at or
+    completed_at by their last update, and add their earnings to the daily
+    rollup, which only counts dated rows
+    """
+    SupplierDailyStats = apps.get_model('suppliers', 'SupplierDailyStats')
+    for model_name, earned_status, earned_at, earned_count, earnings in EARNED:
+        model = apps.get_model('suppliers', model_name)
+        undated = model.objects.filter(status=earned_status, **{f'{earned_at}__isnull': True})
+        groups = list(
+            undated.annotate(day=TruncDate('updated_at')).values('supplier_id', 'day').annotate(
+                count=Count('id'), amount=Sum('total_amount')
+            ).order_by()
+        )
+        undated.update(**{earned_at: F('updated_at')})
+
+        for group in groups:
+            deltas = {earned_count: group['count'], earnings: group['amount'] or 0}
+            row = SupplierDailyStats.objects.filter(supplier_id=group['supplier_id'], date=group['day'])
+            if not row.update(**{field: F(field) + delta for field, delta in deltas.items()}):
+                SupplierDailyStats.objects.create(supplier_id=group['supplier_id'], date=group['day'], **deltas)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0019_remove_supplierprofile_geo_cell'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_earned_at, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,13 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import F
 from django.conf import settings
+from django.utils import timezone
+
+from geo.utils import grid_cell, cells_within
+from geo.pincodes import pin_code_centroid
+
+# Delivery radii beyond this are not spread over grid cells (see DeliveryCell)
+MAX_INDEXED_DELIVERY_RADIUS_KM = 300
 
 class SupplierProfile(models.Model):
     """Extended profile for suppliers"""
@@ -34,6 +42,8 @@ class SupplierProfile(models.Model):
     landmark = models.CharField(max_length=200, blank=True)
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    # Set when latitude/longitude were filled in from the PIN code centroid
+    location_from_pin_code = models.BooleanField(default=False, editable=False)
     
     # Business Hours
     opening_time = models.TimeField(null=True, blank=True)
@@ -97,10 +107,85 @@ class SupplierProfile(models.Model):
     # Ratings
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.0)
     total_reviews = models.IntegerField(default=0)
+    # Running totals behind rating, maintained from review writes (see suppliers.ratings)
+    rating_sum = models.IntegerField(default=0, editable=False)
+    rating_count_1 = models.IntegerField(default=0, editable=False)
+    rating_count_2 = models.IntegerField(default=0, editable=False)
+    rating_count_3 = models.IntegerField(default=0, editable=False)
+    rating_count_4 = models.IntegerField(default=0, editable=False)
+    rating_count_5 = models.IntegerField(default=0, editable=False)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    def user_has_location(self):
+        return bool(self.user_id) and self.user.latitude is not None and self.user.longitude is not None
+    
+    def get_coordinates(self):
+        """Return (latitude, longitude), falling back to the user's location"""
+        if self.latitude is not None and self.longitude is not None:
+            # A PIN code centroid only stands in until the user shares a location
+            if not (self.location_from_pin_code and self.user_has_location()):
+                return self.latitude, self.longitude
+        if self.user_id:
+            return self.user.latitude, self.user.longitude
+        return None, None
+    
+    def fill_location_from_pin_code(self):
+        """Use the PIN code centroid as the location while no real coordinates are known"""
+        if not self.location_from_pin_code and self.latitude is not None and self.longitude is not None:
+            return
+        centroid = None if self.user_has_location() else pin_code_centroid(self.pin_code)
+        if centroid is not None:
+            self.latitude, self.longitude = centroid
+            self.location_from_pin_code = True
+        elif self.location_from_pin_code:
+            self.latitude = self.longitude = None
+            self.location_from_pin_code = False
+    
+    def save(self, *args, **kwargs):
+        skip_rating_aggregates(self, kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'pin_code', 'latitude', 'longitude'} & set(update_fields):
+            self.fill_location_from_pin_code()
+            if update_fields is not None:
+                update_fields = [*update_fields, 'latitude', 'longitude', 'location_from_pin_code']
+        if update_fields is not None:
+            kwargs['update_fields'] = list(dict.fromkeys(update_fields))
+        super().save(*args, **kwargs)
+        if update_fields is None or {'latitude', 'longitude'} & set(update_fields):
+            self.sync_listing_locations()
+        if update_fields is None or {'latitude', 'longitude', 'home_delivery_available',
+                                     'delivery_radius_km'} & set(update_fields):
+            self.sync_delivery_cells()
+    
+    def sync_listing_locations(self):
+        """Copy the effective location onto this supplier's products and equipment"""
+        latitude, longitude = self.get_coordinates()
+        location = {
+            'seller_latitude': latitude,
+            'seller_longitude': longitude,
+            'geo_cell': grid_cell(latitude, longitude),
+        }
+        self.products.update(**location)
+        self.equipment.update(**location)
+    
+    def sync_delivery_cells(self):
+        """Register the supplier in every grid cell its home-delivery radius reaches"""
+        latitude, longitude = self.get_coordinates()
+        cells = set()
+        if self.home_delivery_available and self.delivery_radius_km > 0 and latitude is not None and longitude is not None:
+            if self.delivery_radius_km > MAX_INDEXED_DELIVERY_RADIUS_KM:
+                cells = {DeliveryCell.WIDE_COVERAGE}
+            else:
+                cells = set(cells_within(float(latitude), float(longitude), self.delivery_radius_km))
+        
+        existing = set(self.delivery_cells.values_list('cell', flat=True))
+        if existing - cells:
+            self.delivery_cells.filter(cell__in=existing - cells).delete()
+        if cells - existing:
+            DeliveryCell.objects.bulk_create([DeliveryCell(supplier=self, cell=cell) for cell in cells - existing])
+    
     def __str__(self):
         return self.business_name
     
@@ -108,6 +193,56 @@ class SupplierProfile(models.Model):
         ordering = ['-rating', '-created_at']
 
 
+class DeliveryCell(models.Model):
+    """Grid cell reached by a supplier's home-delivery radius, for "who delivers to me" lookups"""
+    # Suppliers with a radius above MAX_INDEXED_DELIVERY_RADIUS_KM get this single
+    # cell instead and are always checked exactly
+    WIDE_COVERAGE = -1
+    
+    supplier = models.ForeignKey(SupplierProfile, on_delete=models.CASCADE, related_name='delivery_cells')
+    cell = models.IntegerField(db_index=True)
+    
+    def __str__(self):
+        return f"{self.supplier.business_name} - cell {self.cell}"
+    
+    class Meta:
+        unique_together = ['supplier', 'cell']
+
+
+def copy_seller_location(listing, save_kwargs):
+    """Denormalize the supplier's effective location onto a product or equipment row"""
+    update_fields = save_kwargs.get('update_fields')
+    if update_fields is not None and 'supplier' not in update_fields:
+        return
+    latitude, longitude = listing.supplier.get_coordinates()
+    listing.seller_latitude = latitude
+    listing.seller_longitude = longitude
+    listing.geo_cell = grid_cell(latitude, longitude)
+    if update_fields is not None:
+        save_kwargs['update_fields'] = [*update_fields, 'seller_latitude', 'seller_longitude', 'geo_cell']
+
+
+# Written only with F() increments by suppliers.ratings
+RATING_AGGREGATE_FIELDS = (
+    'rating', 'total_reviews', 'rating_sum',
+    'rating_count_1', 'rating_count_2', 'rating_count_3', 'rating_count_4', 'rating_count_5',
+)
+
+
+def skip_rating_aggregates(instance, save_kwargs):
+    """
+    Turn a full-row update of a supplier profile, product or equipment into
+    one of every column but the rating aggregates, so saving an instance
+    loaded before a review committed does not undo that review's increment.
+    """
+    if instance._state.adding or save_kwargs.get('update_fields') is not None or save_kwargs.get('force_insert'):
+        return
+    save_kwargs['update_fields'] = [
+        field.name for field in instance._meta.concrete_fields
+        if not field.primary_key and field.name not in RATING_AGGREGATE_FIELDS
+    ]
+
+
 class Product(models.Model):
     """Products/Services offered by suppliers"""
     
@@ -142,9 +277,30 @@ class Product(models.Model):
     is_available = models.BooleanField(default=True)
     is_rental = models.BooleanField(default=False)  # For tractors/equipment rental
     rental_price_per_day = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    
+    # Copy of the supplier's location so geo search needs no joins (see copy_seller_location)
+    seller_latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, editable=False)
+    seller_longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, editable=False)
+    geo_cell = models.IntegerField(null=True, blank=True, editable=False, db_index=True)
+    
+    # Ratings, maintained from review writes (see suppliers.ratings)
+    rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.0, editable=False)
+    total_reviews = models.IntegerField(default=0, editable=False)
+    rating_sum = models.IntegerField(default=0, editable=False)
+    rating_count_1 = models.IntegerField(default=0, editable=False)
+    rating_count_2 = models.IntegerField(default=0, editable=False)
+    rating_count_3 = models.IntegerField(default=0, editable=False)
+    rating_count_4 = models.IntegerField(default=0, editable=False)
+    rating_count_5 = models.IntegerField(default=0, editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    def save(self, *args, **kwargs):
+        copy_seller_location(self, kwargs)
+        skip_rating_aggregates(self, kwargs)
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         return f"{self.name} - {self.supplier.business_name}"
     
@@ -241,12 +397,30 @@ class Equipment(models.Model):
     # Media
     image = models.ImageField(upload_to='equipment/', null=True, blank=True)
     
+    # Copy of the supplier's location so geo search needs no joins (see copy_seller_location)
+    seller_latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, editable=False)
+    seller_longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, editable=False)
+    geo_cell = models.IntegerField(null=True, blank=True, editable=False, db_index=True)
+    
     # Metadata
     total_rentals = models.IntegerField(default=0)
-    rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.0)
+    # Ratings, maintained from review writes (see suppliers.ratings)
+    rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.0, editable=False)
+    total_reviews = models.IntegerField(default=0, editable=False)
+    rating_sum = models.IntegerField(default=0, editable=False)
+    rating_count_1 = models.IntegerField(default=0, editable=False)
+    rating_count_2 = models.IntegerField(default=0, editable=False)
+    rating_count_3 = models.IntegerField(default=0, editable=False)
+    rating_count_4 = models.IntegerField(default=0, editable=False)
+    rating_count_5 = models.IntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    def save(self, *args, **kwargs):
+        copy_seller_location(self, kwargs)
+        skip_rating_aggregates(self, kwargs)
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         return f"{self.name} - {self.supplier.business_name}"
     
@@ -255,6 +429,20 @@ class Equipment(models.Model):
         verbose_name_plural = 'Equipment'
 
 
+def stamp_earned_at(instance, earned_status, earned_at, save_kwargs):
+    """
+    Set the delivered_at/completed_at of an order or rental saved in its
+    earned status without one (e.g. from the admin), so its earnings are
+    counted in the daily rollup on that day.
+    """
+    if instance.status != earned_status or getattr(instance, earned_at) is not None:
+        return
+    setattr(instance, earned_at, timezone.now())
+    update_fields = save_kwargs.get('update_fields')
+    if update_fields is not None:
+        save_kwargs['update_fields'] = [*update_fields, earned_at]
+
+
 class Order(models.Model):
     """Orders for products"""
     
@@ -311,13 +499,18 @@ class Order(models.Model):
     confirmed_at = models.DateTimeField(null=True, blank=True)
     delivered_at = models.DateTimeField(null=True, blank=True)
     
+    @staticmethod
+    def make_order_number():
+        """Generate unique order number"""
+        import random
+        import string
+        from django.utils import timezone
+        return f"ORD-{timezone.now().strftime('%Y%m%d')}-{''.join(random.choices(string.ascii_uppercase + string.digits, k=6))}"
+    
     def save(self, *args, **kwargs):
         if not self.order_number:
-            # Generate unique order number
-            import random
-            import string
-            from django.utils import timezone
-            self.order_number = f"ORD-{timezone.now().strftime('%Y%m%d')}-{''.join(random.choices(string.ascii_uppercase + string.digits, k=6))}"
+            self.order_number = self.make_order_number()
+        stamp_earned_at(self, 'delivered', 'delivered_at', kwargs)
         super().save(*args, **kwargs)
     
     def __str__(self):
@@ -327,6 +520,27 @@ class Order(models.Model):
         ordering = ['-created_at']
 
 
+class StockReservation(models.Model):
+    """Units held for a pending order until it is confirmed or cancelled, or the hold expires"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name='stock_reservation')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} for order {self.order_id}"
+    
+    class Meta:
+        ordering = ['expires_at']
+        indexes = [
+            # Live holds of one product, for available-to-sell
+            models.Index(fields=['product', 'expires_at']),
+            # Expired holds, for the sweeper
+            models.Index(fields=['expires_at']),
+        ]
+
+
 class Rental(models.Model):
     """Equipment rentals"""
     
@@ -404,6 +618,7 @@ class Rental(models.Model):
         if self.start_date and self.end_date:
             self.rental_duration_days = (self.end_date - self.start_date).days + 1
         
+        stamp_earned_at(self, 'completed', 'completed_at', kwargs)
         super().save(*args, **kwargs)
     
     def __str__(self):
@@ -413,6 +628,131 @@ class Rental(models.Model):
         ordering = ['-created_at']
 
 
+class EquipmentBooking(models.Model):
+    """
+    Dates a confirmed or active rental holds its equipment. The bookings of
+    one piece of equipment never overlap (see suppliers.bookings), so sorted
+    by start_date they form an interval index.
+    """
+    equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name='bookings')
+    rental = models.OneToOneField(Rental, on_delete=models.CASCADE, related_name='booking')
+    start_date = models.DateField()
+    end_date = models.DateField()
+    
+    def __str__(self):
+        return f"{self.equipment_id}: {self.start_date} - {self.end_date}"
+    
+    class Meta:
+        ordering = ['start_date']
+        indexes = [
+            models.Index(fields=['equipment', 'start_date']),
+        ]
+
+
+class EquipmentCalendar(models.Model):
+    """
+    Busy days of one piece of equipment as a bitmap: bit i (most significant
+    first) is set when it is booked on window_start + i days. Kept in step
+    with its bookings by suppliers.busy_days.
+    """
+    equipment = models.OneToOneField(Equipment, on_delete=models.CASCADE, primary_key=True, related_name='calendar')
+    window_start = models.DateField()
+    busy = models.BinaryField()
+    
+    def __str__(self):
+        return f"{self.equipment_id} from {self.window_start}"
+
+
+class SupplierDailyStats(models.Model):
+    """
+    Per-supplier, per-day rollup of orders and rentals, kept current with F()
+    increments by suppliers.rollups. Status counts and open amounts are
+    bucketed by the day an order or rental was placed, earnings by the day it
+    was delivered or completed.
+    """
+    supplier = models.ForeignKey(SupplierProfile, on_delete=models.CASCADE, related_name='daily_stats')
+    date = models.DateField()
+
+    # Orders placed on this day, by current status
+    orders_pending = models.IntegerField(default=0)
+    orders_confirmed = models.IntegerField(default=0)
+    orders_processing = models.IntegerField(default=0)
+    orders_ready = models.IntegerField(default=0)
+    orders_delivered = models.IntegerField(default=0)
+    orders_cancelled = models.IntegerField(default=0)
+    orders_rejected = models.IntegerField(default=0)
+    # Value of those still pending, confirmed or processing
+    order_open_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    # Rentals placed on this day, by current status
+    rentals_pending = models.IntegerField(default=0)
+    rentals_confirmed = models.IntegerField(default=0)
+    rentals_active = models.IntegerField(default=0)
+    rentals_completed = models.IntegerField(default=0)
+    rentals_cancelled = models.IntegerField(default=0)
+    rentals_rejected = models.IntegerField(default=0)
+    # Value of those still pending, confirmed or active
+    rental_open_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    # Orders delivered and rentals completed on this day
+    delivered_orders = models.IntegerField(default=0)
+    order_earnings = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    completed_rentals = models.IntegerField(default=0)
+    rental_earnings = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.supplier.business_name} - {self.date}"
+
+    @classmethod
+    def increment(cls, supplier_id, date, deltas):
+        """Atomically add deltas ({field: amount}) to a supplier's row for a day"""
+        changes = {field: F(field) + delta for field, delta in deltas.items()}
+        if cls.objects.filter(supplier_id=supplier_id, date=date).update(**changes):
+            return
+        if all(delta <= 0 for delta in deltas.values()):
+            # Nothing to subtract from (e.g. the row went with a deleted supplier)
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(supplier_id=supplier_id, date=date, **deltas)
+        except IntegrityError:
+            # Another writer created the row first
+            cls.objects.filter(supplier_id=supplier_id, date=date).update(**changes)
+
+    class Meta:
+        ordering = ['-date']
+        unique_together = ['supplier', 'date']
+        verbose_name_plural = 'Supplier daily stats'
+
+
+class SupplierStatsVersion(models.Model):
+    """
+    Version counters of one supplier's cached statistics, shared by every
+    worker process: cache entries are keyed with the current counter, so a
+    bump retires them in every worker's cache at once.
+    """
+    supplier = models.OneToOneField(SupplierProfile, on_delete=models.CASCADE, primary_key=True, related_name='stats_version')
+    orders = models.BigIntegerField(default=0)
+    rentals = models.BigIntegerField(default=0)
+    inventory = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.supplier_id} stats v{self.orders}/{self.rentals}/{self.inventory}"
+    
+    @classmethod
+    def current(cls, supplier_id):
+        """
+        The supplier's counters, creating the row on first use so that a
+        later bump always has a row to move
+        """
+        return cls.objects.get_or_create(supplier_id=supplier_id)[0]
+    
+    @classmethod
+    def bump(cls, supplier_id, counter):
+        """Atomically increment one counter; a supplier without a row has nothing cached to retire"""
+        cls.objects.filter(supplier_id=supplier_id).update(**{counter: F(counter) + 1})
+
+
 class SupplierReview(models.Model):
     """Reviews for suppliers"""
     supplier = models.ForeignKey(SupplierProfile, on_delete=models.CASCADE, related_name='reviews')
@@ -443,3 +783,19 @@ class ProductReview(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ['product', 'reviewer']
+
+
+class EquipmentReview(models.Model):
+    """Reviews for rental equipment"""
+    equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name='reviews')
+    reviewer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    rating = models.IntegerField(choices=[(i, i) for i in range(1, 6)])
+    comment = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.equipment.name} - {self.rating} stars"
+    
+    class Meta:
+        ordering = ['-created_at']
+        unique_together = ['equipment', 'reviewer']
@@ -0,0 +1,104 @@
+"""
+Rental quotes from the hourly, daily, weekly and monthly rates.
+
+A rental is charged the cheapest combination of whole tiers covering its
+duration: 10 days may be a week plus three days, or two weeks if that costs
+less. The combinations worth trying depend only on the duration, so they
+are enumerated once into a matrix of tier counts and every item is priced
+against all of them with one integer matrix product in paise; the cheapest
+valid column per item wins. Amounts are Decimals, exact to the paisa.
+"""
+from decimal import Decimal
+from math import ceil
+
+import numpy as np
+
+# (rate field, length in days); a month is charged as 30 days
+DAY_TIERS = (('daily_rate', 1), ('weekly_rate', 7), ('monthly_rate', 30))
+# (rate field, length in hours) for rentals shorter than a day
+HOUR_TIERS = (('hourly_rate', 1), ('daily_rate', 24), ('weekly_rate', 24 * 7), ('monthly_rate', 24 * 30))
+# Most items one quote request may price
+MAX_QUOTE_ITEMS = 500
+
+UNPRICED = np.iinfo(np.int64).max
+
+
+def to_paise(amount):
+    return int((amount or 0) * 100)
+
+
+def from_paise(paise):
+    return Decimal(int(paise)).scaleb(-2)
+
+
+def tier_combinations(duration, lengths):
+    """
+    Matrix of tier counts (one row per combination, one column per tier)
+    covering duration units. The shortest tier fills what the longer ones
+    leave; each longer tier is tried from zero up to the count covering it all.
+    """
+    combinations = []
+
+    def extend(counts, tier, remaining):
+        if tier == 0:
+            combinations.append([ceil(max(remaining, 0) / lengths[0]), *counts])
+            return
+        for count in range(ceil(max(remaining, 0) / lengths[tier]) + 1):
+            extend([count, *counts], tier - 1, remaining - count * lengths[tier])
+
+    extend([], len(lengths) - 1, duration)
+    return np.array(combinations, dtype=np.int64)
+
+
+def cheapest_tiers(rates, duration, lengths):
+    """
+    For an (items x tiers) paise rate matrix with -1 for missing rates,
+    return (tier counts per item, cost in paise per item).
+    """
+    combinations = tier_combinations(duration, lengths)
+    costs = np.maximum(rates, 0) @ combinations.T
+    # A combination is only open to items that have every rate it uses
+    missing = (rates < 0).astype(np.int64) @ (combinations > 0).T.astype(np.int64)
+    costs[missing > 0] = UNPRICED
+    best = costs.argmin(axis=1)
+    return combinations[best], costs[np.arange(len(rates)), best]
+
+
+def quote_rentals(equipment, start, end, with_operator=False, hours=None):
+    """
+    {equipment id: quote} for renting each item from start to end inclusive,
+    or for `hours` hours on a single day. Equipment needs its supplier loaded
+    (for delivery charges). Operator charges apply when with_operator is set
+    or the item requires an operator.
+    """
+    equipment = list(equipment)
+    if not equipment:
+        return {}
+    days = (end - start).days + 1
+    tiers = HOUR_TIERS if hours is not None else DAY_TIERS
+    fields = [field for field, _ in tiers]
+    rates = np.array(
+        [[-1 if getattr(item, field) is None else to_paise(getattr(item, field)) for field in fields] for item in equipment],
+        dtype=np.int64
+    )
+    counts, rental_costs = cheapest_tiers(rates, hours if hours is not None else days, [length for _, length in tiers])
+
+    quotes = {}
+    for item, item_counts, rental_paise in zip(equipment, counts.tolist(), rental_costs.tolist()):
+        operator = with_operator or item.requires_operator
+        rental_cost = from_paise(rental_paise)
+        operator_charges = (item.operator_charge_per_day or Decimal('0')) * days if operator else Decimal('0.00')
+        delivery_charges = item.supplier.delivery_charges or Decimal('0.00')
+        quotes[item.pk] = {
+            'tiers': {field: count for field, count in zip(fields, item_counts) if count},
+            'rental_cost': rental_cost,
+            'operator_charges': operator_charges,
+            'delivery_charges': delivery_charges,
+            'security_deposit': item.security_deposit,
+            'total_amount': rental_cost + operator_charges + delivery_charges + item.security_deposit,
+        }
+    return quotes
+
+
+def quote_rental(equipment, start, end, with_operator=False, hours=None):
+    return quote_rentals([equipment], start, end, with_operator, hours)[equipment.pk]
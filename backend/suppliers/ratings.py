@@ -0,0 +1,158 @@
+"""
+Incremental rating aggregates.
+
+Rated rows keep a running rating_sum, a review count and a 1-5 star
+histogram. Reviews remember the supplier and rating they were loaded with;
+after a save or delete the rated row is adjusted with F() expressions, and
+the stored average is recomputed from the new sum and count in the same
+UPDATE, so a review costs O(1) however many the row already has. Writes made
+with queryset.update() bypass this; run the reconcile_ratings command after
+such bulk changes.
+"""
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db.models import Case, Count, DecimalField, F, FloatField, Value, When
+from django.db.models.functions import Cast
+from django.db.models.lookups import GreaterThan
+
+from .models import SupplierReview, ProductReview, EquipmentReview
+
+STARS = range(1, 6)
+# Most ids one batch ratings request may ask for
+MAX_RATING_BATCH = 100
+
+
+def histogram_field(star):
+    return f'rating_count_{star}'
+
+
+HISTOGRAM_FIELDS = [histogram_field(star) for star in STARS]
+
+
+def average_rating(rating_sum, count):
+    """Average of count ratings adding up to rating_sum, rounded like the rating column"""
+    if not count:
+        return Decimal('0.00')
+    return (Decimal(rating_sum) / count).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def rating_histogram(obj):
+    """{star: count} for a rated row"""
+    return {star: getattr(obj, histogram_field(star)) for star in STARS}
+
+
+def parse_ids(raw, limit=MAX_RATING_BATCH):
+    """Distinct ids from a comma-separated string, in order; ValueError if malformed or too many"""
+    ids = list(dict.fromkeys(int(part) for part in raw.split(',') if part.strip()))
+    if not ids:
+        raise ValueError('ids is required')
+    if len(ids) > limit:
+        raise ValueError(f'At most {limit} ids per request')
+    return ids
+
+
+class RatingAggregate:
+    """Keeps the rating columns of review_model's target (e.g. SupplierProfile) in step with its reviews"""
+
+    def __init__(self, review_model, target_field, count_field='total_reviews'):
+        self.review_model = review_model
+        self.target_model = review_model._meta.get_field(target_field).related_model
+        self.target_attname = f'{target_field}_id'
+        self.count_field = count_field
+        self.state_fields = [self.target_attname, 'rating']
+
+    def state(self, review):
+        """(target id, rating), or None if either was not loaded"""
+        values = review.__dict__
+        if any(field not in values for field in self.state_fields):
+            return None
+        return tuple(values[field] for field in self.state_fields)
+
+    def load_state(self, pk):
+        return self.review_model.objects.filter(pk=pk).values_list(*self.state_fields).first()
+
+    def apply(self, old_state, new_state):
+        """Move the aggregates from old_state's review to new_state's"""
+        if old_state == new_state:
+            return
+        deltas = defaultdict(lambda: defaultdict(int))
+        for state, sign in ((old_state, -1), (new_state, 1)):
+            if state is None or state[0] is None or state[1] not in STARS:
+                continue
+            target_id, rating = state
+            changes = deltas[target_id]
+            changes['rating_sum'] += sign * rating
+            changes[self.count_field] += sign
+            changes[histogram_field(rating)] += sign
+        for target_id, changes in deltas.items():
+            changes = {field: delta for field, delta in changes.items() if delta}
+            if changes:
+                self.increment(target_id, changes)
+
+    def increment(self, target_id, deltas):
+        """Add deltas to one target row and refresh its average in a single UPDATE"""
+        rating_sum = F('rating_sum') + deltas.get('rating_sum', 0)
+        count = F(self.count_field) + deltas.get(self.count_field, 0)
+        # Every expression reads the row as it was before this UPDATE; casting
+        # to the column's precision rounds the average
+        average = Case(
+            When(GreaterThan(count, 0), then=Cast(rating_sum, FloatField()) / count),
+            default=Value(0.0),
+        )
+        self.target_model.objects.filter(pk=target_id).update(
+            rating=Cast(average, DecimalField(max_digits=3, decimal_places=2)),
+            **{field: F(field) + delta for field, delta in deltas.items()}
+        )
+
+    def batch(self, target_ids):
+        """{id: {'rating', 'total_reviews', 'histogram'}} for the given target ids that exist, in one query"""
+        rows = self.target_model.objects.filter(pk__in=target_ids).values(
+            'pk', 'rating', self.count_field, *HISTOGRAM_FIELDS
+        )
+        return {
+            row['pk']: {
+                'rating': row['rating'],
+                'total_reviews': row[self.count_field],
+                'histogram': {star: row[histogram_field(star)] for star in STARS},
+            }
+            for row in rows
+        }
+
+    def reconcile(self, target_ids=None):
+        """Recompute every target's aggregates from its reviews; returns the number of rows corrected"""
+        reviews = self.review_model.objects.all()
+        targets = self.target_model.objects.all()
+        if target_ids is not None:
+            reviews = reviews.filter(**{f'{self.target_attname}__in': target_ids})
+            targets = targets.filter(pk__in=target_ids)
+
+        counts = defaultdict(dict)
+        for group in reviews.values(self.target_attname, 'rating').annotate(count=Count('id')).order_by():
+            counts[group[self.target_attname]][group['rating']] = group['count']
+
+        fields = ['rating', 'rating_sum', self.count_field, *HISTOGRAM_FIELDS]
+        corrected = []
+        for target in targets.only('pk', *fields).iterator(chunk_size=2000):
+            by_star = counts.get(target.pk, {})
+            expected = {histogram_field(star): by_star.get(star, 0) for star in STARS}
+            expected['rating_sum'] = sum(star * count for star, count in by_star.items() if star in STARS)
+            expected[self.count_field] = sum(count for star, count in by_star.items() if star in STARS)
+            expected['rating'] = average_rating(expected['rating_sum'], expected[self.count_field])
+            if any(getattr(target, field) != value for field, value in expected.items()):
+                for field, value in expected.items():
+                    setattr(target, field, value)
+                corrected.append(target)
+
+        self.target_model.objects.bulk_update(corrected, fields, batch_size=1000)
+        return len(corrected)
+
+
+SUPPLIER_RATINGS = RatingAggregate(SupplierReview, 'supplier')
+PRODUCT_RATINGS = RatingAggregate(ProductReview, 'product')
+EQUIPMENT_RATINGS = RatingAggregate(EquipmentReview, 'equipment')
+RATINGS = {
+    SupplierReview: SUPPLIER_RATINGS,
+    ProductReview: PRODUCT_RATINGS,
+    EquipmentReview: EQUIPMENT_RATINGS,
+}
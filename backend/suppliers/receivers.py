@@ -0,0 +1,183 @@
+from django.db.models.signals import post_init, pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from django.contrib.auth import get_user_model
+
+from .models import SupplierProfile, Product, Equipment, StockLog, Order, Rental, EquipmentBooking, SupplierReview, ProductReview, EquipmentReview
+from .rollups import ROLLUPS
+from .ratings import RATINGS
+from .busy_days import booking_state, load_booking_state, move_booking
+from .stats import invalidate_status_breakdown, invalidate_inventory_stats
+from .indexes import supplier_index, product_index, equipment_index, product_cache, equipment_cache
+
+User = get_user_model()
+
+
+def location_may_have_changed(update_fields):
+    """False when a save explicitly touched only non-location fields (e.g. last_login)"""
+    return update_fields is None or bool({'latitude', 'longitude'} & set(update_fields))
+
+
+@receiver(post_save, sender=User)
+def sync_supplier_location(sender, instance, update_fields=None, **kwargs):
+    """Propagate a supplier user's new location when the profile falls back to it"""
+    if instance.user_type != 'supplier' or not location_may_have_changed(update_fields):
+        return
+    try:
+        profile = instance.supplier_profile
+    except SupplierProfile.DoesNotExist:
+        return
+    if profile.latitude is not None and profile.longitude is not None and not profile.location_from_pin_code:
+        return
+
+    profile.sync_listing_locations()
+    profile.sync_delivery_cells()
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_supplier_user_indexes(sender, instance, update_fields=None, **kwargs):
+    """Supplier listings are located at the supplier user's coordinates"""
+    if instance.user_type == 'supplier' and location_may_have_changed(update_fields):
+        supplier_index.mark_stale()
+        product_index.mark_stale()
+        equipment_index.mark_stale()
+        product_cache.invalidate_all()
+        equipment_cache.invalidate_all()
+
+
+@receiver([post_save, post_delete], sender=SupplierProfile)
+def invalidate_supplier_index(sender, update_fields=None, **kwargs):
+    # Listing locations are copied from the profile with queryset.update(),
+    # which sends no signals of its own
+    supplier_index.mark_stale()
+    product_index.mark_stale()
+    equipment_index.mark_stale()
+    if location_may_have_changed(update_fields):
+        product_cache.invalidate_all()
+        equipment_cache.invalidate_all()
+
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_product_index(sender, instance, **kwargs):
+    product_index.mark_stale()
+    product_cache.invalidate_cell(instance.geo_cell)
+
+
+@receiver([post_save, post_delete], sender=Equipment)
+def invalidate_equipment_index(sender, instance, **kwargs):
+    equipment_index.mark_stale()
+    equipment_cache.invalidate_cell(instance.geo_cell)
+
+
+@receiver(post_init, sender=Order)
+@receiver(post_init, sender=Rental)
+def remember_rollup_state(sender, instance, **kwargs):
+    instance._rollup_state = ROLLUPS[sender].state(instance)
+
+
+@receiver([pre_save, pre_delete], sender=Order)
+@receiver([pre_save, pre_delete], sender=Rental)
+def load_rollup_state(sender, instance, **kwargs):
+    # Instances loaded with deferred fields did not capture their state
+    if instance._rollup_state is None and instance.pk is not None:
+        instance._rollup_state = ROLLUPS[sender].load_state(instance.pk)
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=Rental)
+def update_daily_stats(sender, instance, **kwargs):
+    rollup = ROLLUPS[sender]
+    state = rollup.state(instance) or rollup.load_state(instance.pk)
+    rollup.apply(instance._rollup_state, state)
+    instance._rollup_state = state
+
+
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=Rental)
+def remove_from_daily_stats(sender, instance, **kwargs):
+    ROLLUPS[sender].apply(instance._rollup_state, None)
+
+
+@receiver([post_save, post_delete], sender=Order)
+@receiver([post_save, post_delete], sender=Rental)
+def invalidate_status_statistics(sender, instance, **kwargs):
+    invalidate_status_breakdown(sender, instance.supplier_id)
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Equipment)
+def invalidate_listing_inventory_stats(sender, instance, **kwargs):
+    invalidate_inventory_stats(instance.supplier_id)
+
+
+@receiver(post_save, sender=SupplierProfile)
+def invalidate_profile_inventory_stats(sender, instance, **kwargs):
+    # The low stock list embeds the supplier's name and address
+    invalidate_inventory_stats(instance.id)
+
+
+@receiver([post_save, post_delete], sender=StockLog)
+def invalidate_stock_log_inventory_stats(sender, instance, **kwargs):
+    if StockLog.product.is_cached(instance):
+        supplier_id = instance.product.supplier_id
+    else:
+        # None once the product itself is gone, which invalidated already
+        supplier_id = Product.objects.filter(pk=instance.product_id).values_list('supplier_id', flat=True).first()
+    invalidate_inventory_stats(supplier_id)
+
+
+@receiver(post_init, sender=SupplierReview)
+@receiver(post_init, sender=ProductReview)
+@receiver(post_init, sender=EquipmentReview)
+def remember_rating_state(sender, instance, **kwargs):
+    instance._rating_state = RATINGS[sender].state(instance)
+
+
+@receiver([pre_save, pre_delete], sender=SupplierReview)
+@receiver([pre_save, pre_delete], sender=ProductReview)
+@receiver([pre_save, pre_delete], sender=EquipmentReview)
+def load_rating_state(sender, instance, **kwargs):
+    # Instances loaded with deferred fields did not capture their state
+    if instance._rating_state is None and instance.pk is not None:
+        instance._rating_state = RATINGS[sender].load_state(instance.pk)
+
+
+@receiver(post_save, sender=SupplierReview)
+@receiver(post_save, sender=ProductReview)
+@receiver(post_save, sender=EquipmentReview)
+def update_rating_aggregates(sender, instance, created, **kwargs):
+    aggregate = RATINGS[sender]
+    state = aggregate.state(instance) or aggregate.load_state(instance.pk)
+    # New instances captured their own values on init
+    aggregate.apply(None if created else instance._rating_state, state)
+    instance._rating_state = state
+
+
+@receiver(post_delete, sender=SupplierReview)
+@receiver(post_delete, sender=ProductReview)
+@receiver(post_delete, sender=EquipmentReview)
+def remove_from_rating_aggregates(sender, instance, **kwargs):
+    RATINGS[sender].apply(instance._rating_state, None)
+
+
+@receiver(post_init, sender=EquipmentBooking)
+def remember_booking_days(sender, instance, **kwargs):
+    instance._booked_days = booking_state(instance)
+
+
+@receiver([pre_save, pre_delete], sender=EquipmentBooking)
+def load_booking_days(sender, instance, **kwargs):
+    # Instances loaded with deferred fields did not capture their dates
+    if instance._booked_days is None and instance.pk is not None:
+        instance._booked_days = load_booking_state(instance.pk)
+
+
+@receiver(post_save, sender=EquipmentBooking)
+def update_busy_days(sender, instance, created, **kwargs):
+    state = booking_state(instance) or load_booking_state(instance.pk)
+    move_booking(None if created else instance._booked_days, state)
+    instance._booked_days = state
+
+
+@receiver(post_delete, sender=EquipmentBooking)
+def clear_busy_days(sender, instance, **kwargs):
+    move_booking(instance._booked_days, None)
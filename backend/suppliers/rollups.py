@@ -0,0 +1,158 @@
+"""
+Incremental maintenance of SupplierDailyStats.
+
+Orders and rentals remember the values they were loaded with. After a save
+or delete, the rollup rows are adjusted by the difference between the old
+and new contribution of that row, using F() increments so concurrent writers
+never overwrite each other. Writes made with queryset.update() bypass this;
+run the rebuild_supplier_stats command after such bulk changes. Rows
+inserted with bulk_create are added with Rollup.add_created.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Order, Rental, SupplierDailyStats
+
+ROLLUP_FIELDS = {field.name for field in SupplierDailyStats._meta.get_fields()}
+
+
+class Rollup:
+    """How one model (Order or Rental) contributes to SupplierDailyStats"""
+
+    def __init__(self, model, prefix, open_statuses, earned_status, earned_at,
+                 open_amount_field, earned_count_field, earnings_field):
+        self.model = model
+        self.prefix = prefix
+        self.open_statuses = open_statuses
+        self.earned_status = earned_status
+        self.earned_at = earned_at
+        self.open_amount_field = open_amount_field
+        self.earned_count_field = earned_count_field
+        self.earnings_field = earnings_field
+        self.state_fields = ['supplier_id', 'status', 'total_amount', 'created_at', earned_at]
+
+    def state(self, instance):
+        """Values that drive the rollup, or None if some were not loaded"""
+        values = instance.__dict__
+        if any(field not in values for field in self.state_fields):
+            return None
+        return tuple(values[field] for field in self.state_fields)
+
+    def load_state(self, pk):
+        return self.model.objects.filter(pk=pk).values_list(*self.state_fields).first()
+
+    def status_field(self, status):
+        field = f'{self.prefix}_{status}'
+        return field if field in ROLLUP_FIELDS else None
+
+    def contribution(self, state):
+        """{(supplier_id, date): {field: amount}} added by one row in the given state"""
+        changes = defaultdict(lambda: defaultdict(int))
+        if state is None:
+            return changes
+        supplier_id, status, amount, created_at, earned_at = state
+        if supplier_id is None or created_at is None:
+            return changes
+        amount = Decimal(str(amount or 0))
+
+        placed = changes[supplier_id, timezone.localdate(created_at)]
+        if self.status_field(status):
+            placed[self.status_field(status)] += 1
+        if status in self.open_statuses:
+            placed[self.open_amount_field] += amount
+        if status == self.earned_status and earned_at is not None:
+            earned = changes[supplier_id, timezone.localdate(earned_at)]
+            earned[self.earned_count_field] += 1
+            earned[self.earnings_field] += amount
+        return changes
+
+    def apply(self, old_state, new_state):
+        """Move the rollup from old_state's contribution to new_state's"""
+        if old_state == new_state:
+            return
+        old, new = self.contribution(old_state), self.contribution(new_state)
+        for supplier_id, date in set(old) | set(new):
+            before, after = old.get((supplier_id, date), {}), new.get((supplier_id, date), {})
+            deltas = {
+                field: after.get(field, 0) - before.get(field, 0)
+                for field in set(before) | set(after)
+            }
+            deltas = {field: delta for field, delta in deltas.items() if delta}
+            if deltas:
+                SupplierDailyStats.increment(supplier_id, date, deltas)
+
+    def add_created(self, instances):
+        """Account for rows inserted with bulk_create, which sends no post_save, one increment per supplier and day"""
+        totals = defaultdict(lambda: defaultdict(int))
+        for instance in instances:
+            state = self.state(instance)
+            for key, fields in self.contribution(state).items():
+                for field, amount in fields.items():
+                    totals[key][field] += amount
+            instance._rollup_state = state
+        for (supplier_id, date), deltas in totals.items():
+            deltas = {field: delta for field, delta in deltas.items() if delta}
+            if deltas:
+                SupplierDailyStats.increment(supplier_id, date, deltas)
+
+    def rebuild_rows(self, queryset, rows):
+        """Add the contribution of every row in queryset to rows ({(supplier_id, date): {field: amount}})"""
+        placed = queryset.annotate(day=TruncDate('created_at')).values('supplier_id', 'day', 'status').annotate(
+            count=Count('id'), amount=Sum('total_amount')
+        )
+        for group in placed:
+            row = rows[group['supplier_id'], group['day']]
+            if self.status_field(group['status']):
+                row[self.status_field(group['status'])] += group['count']
+            if group['status'] in self.open_statuses:
+                row[self.open_amount_field] += group['amount'] or 0
+
+        earned = queryset.filter(status=self.earned_status, **{f'{self.earned_at}__isnull': False}).annotate(
+            day=TruncDate(self.earned_at)
+        ).values('supplier_id', 'day').annotate(count=Count('id'), amount=Sum('total_amount'))
+        for group in earned:
+            row = rows[group['supplier_id'], group['day']]
+            row[self.earned_count_field] += group['count']
+            row[self.earnings_field] += group['amount'] or 0
+
+
+ORDER_ROLLUP = Rollup(
+    Order, 'orders',
+    open_statuses=['pending', 'confirmed', 'processing'],
+    earned_status='delivered', earned_at='delivered_at',
+    open_amount_field='order_open_amount', earned_count_field='delivered_orders', earnings_field='order_earnings',
+)
+RENTAL_ROLLUP = Rollup(
+    Rental, 'rentals',
+    open_statuses=['pending', 'confirmed', 'active'],
+    earned_status='completed', earned_at='completed_at',
+    open_amount_field='rental_open_amount', earned_count_field='completed_rentals', earnings_field='rental_earnings',
+)
+ROLLUPS = {Order: ORDER_ROLLUP, Rental: RENTAL_ROLLUP}
+
+
+def rebuild_daily_stats(supplier_ids=None):
+    """Recompute SupplierDailyStats from scratch; returns the number of rows written"""
+    rows = defaultdict(lambda: defaultdict(int))
+    for rollup in ROLLUPS.values():
+        queryset = rollup.model.objects.all()
+        if supplier_ids is not None:
+            queryset = queryset.filter(supplier_id__in=supplier_ids)
+        rollup.rebuild_rows(queryset, rows)
+
+    existing = SupplierDailyStats.objects.all()
+    if supplier_ids is not None:
+        existing = existing.filter(supplier_id__in=supplier_ids)
+    existing.delete()
+    SupplierDailyStats.objects.bulk_create(
+        [
+            SupplierDailyStats(supplier_id=supplier_id, date=date, **fields)
+            for (supplier_id, date), fields in rows.items()
+        ],
+        batch_size=1000
+    )
+    return len(rows)
@@ -1,5 +1,8 @@
+from django.db import transaction
 from rest_framework import serializers
-from .models import SupplierProfile, Product, Equipment, Order, Rental, StockLog, SupplierReview, ProductReview
+from .models import SupplierProfile, Product, Equipment, Order, Rental, StockLog, SupplierReview, ProductReview, EquipmentReview
+from .ratings import HISTOGRAM_FIELDS, rating_histogram
+from .stock import change_stock, with_available_to_sell, InsufficientStock
 from accounts.serializers import UserSerializer
 
 class SupplierProfileSerializer(serializers.ModelSerializer):
@@ -7,10 +10,11 @@ class SupplierProfileSerializer(serializers.ModelSerializer):
     business_types_list = serializers.SerializerMethodField()
     full_address = serializers.SerializerMethodField()
     shop_image_url = serializers.SerializerMethodField()
+    rating_histogram = serializers.SerializerMethodField()
     
     class Meta:
         model = SupplierProfile
-        fields = '__all__'
+        exclude = ['rating_sum', *HISTOGRAM_FIELDS]
         read_only_fields = ['rating', 'total_reviews', 'created_at', 'updated_at', 
                           'verification_status', 'admin_comments', 'subscription_plan', 
                           'commission_percentage', 'is_bank_verified']
@@ -34,6 +38,10 @@ class SupplierProfileSerializer(serializers.ModelSerializer):
             address_parts.append(obj.pin_code)
         return ', '.join(address_parts) if address_parts else 'Not provided'
     
+    def get_rating_histogram(self, obj):
+        """Number of reviews per star rating"""
+        return rating_histogram(obj)
+    
     def get_shop_image_url(self, obj):
         """Return shop image URL if it exists, otherwise None"""
         if obj.shop_image:
@@ -161,6 +169,13 @@ class SupplierProfileUpdateSerializer(serializers.ModelSerializer):
             business_types_list = validated_data.pop('business_types_list')
             instance.business_types = ','.join(business_types_list)
         
+        # Coordinates that differ from the stored PIN code centroid were set by the user
+        if instance.location_from_pin_code and any(
+            field in validated_data and validated_data[field] != float(getattr(instance, field) or 0)
+            for field in ('latitude', 'longitude')
+        ):
+            instance.location_from_pin_code = False
+        
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
@@ -181,14 +196,26 @@ class SupplierDashboardSerializer(serializers.Serializer):
     available_equipment = serializers.IntegerField()
 
 
+class EarningsBucketSerializer(serializers.Serializer):
+    """One period of the supplier earnings time series"""
+    period = serializers.DateField()
+    earnings = serializers.DecimalField(max_digits=14, decimal_places=2)
+    order_earnings = serializers.DecimalField(max_digits=14, decimal_places=2)
+    rental_earnings = serializers.DecimalField(max_digits=14, decimal_places=2)
+    delivered_orders = serializers.IntegerField()
+    completed_rentals = serializers.IntegerField()
+
+
 class ProductSerializer(serializers.ModelSerializer):
     supplier_name = serializers.CharField(source='supplier.business_name', read_only=True)
     supplier_location = serializers.SerializerMethodField()
     image_url = serializers.SerializerMethodField()
+    rating_histogram = serializers.SerializerMethodField()
+    available_to_sell = serializers.SerializerMethodField()
     
     class Meta:
         model = Product
-        fields = '__all__'
+        exclude = ['seller_latitude', 'seller_longitude', 'geo_cell', 'rating_sum', *HISTOGRAM_FIELDS]
         read_only_fields = ['supplier', 'created_at', 'updated_at']
     
     def get_supplier_location(self, obj):
@@ -209,6 +236,16 @@ class ProductSerializer(serializers.ModelSerializer):
             'full_address': ', '.join(address_parts) if address_parts else 'Location not specified'
         }
     
+    def get_rating_histogram(self, obj):
+        """Number of reviews per star rating"""
+        return rating_histogram(obj)
+    
+    def get_available_to_sell(self, obj):
+        """Stock not held by pending orders; list querysets annotate it (see with_available_to_sell)"""
+        if hasattr(obj, 'available_to_sell'):
+            return obj.available_to_sell
+        return with_available_to_sell(Product.objects.filter(pk=obj.pk)).values_list('available_to_sell', flat=True).first()
+    
     def get_image_url(self, obj):
         """Return absolute URL for product image"""
         if obj.image:
@@ -217,6 +254,27 @@ class ProductSerializer(serializers.ModelSerializer):
                 return request.build_absolute_uri(obj.image.url)
             return obj.image.url
         return None
+    
+    def update(self, instance, validated_data):
+        # An edited stock is applied as an adjustment by the difference through
+        # suppliers.stock, and only the sent fields are saved, so a concurrent
+        # sale is neither undone nor left out of the stock log
+        stock_quantity = validated_data.pop('stock_quantity', None)
+        with transaction.atomic():
+            if stock_quantity is not None and stock_quantity != instance.stock_quantity:
+                request = self.context.get('request')
+                try:
+                    log = change_stock(
+                        instance.pk, stock_quantity - instance.stock_quantity, 'adjustment',
+                        note='Stock edited with the product', user=request.user if request else None
+                    )
+                except InsufficientStock as e:
+                    raise serializers.ValidationError({'stock_quantity': str(e)})
+                instance.stock_quantity = log.current_stock
+            for field, value in validated_data.items():
+                setattr(instance, field, value)
+            instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
 
 
 class EquipmentSerializer(serializers.ModelSerializer):
@@ -226,10 +284,11 @@ class EquipmentSerializer(serializers.ModelSerializer):
     condition_display = serializers.CharField(source='get_condition_display', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     image_url = serializers.SerializerMethodField()
+    rating_histogram = serializers.SerializerMethodField()
     
     class Meta:
         model = Equipment
-        fields = '__all__'
+        exclude = ['seller_latitude', 'seller_longitude', 'geo_cell', 'rating_sum', *HISTOGRAM_FIELDS]
         read_only_fields = ['supplier', 'total_rentals', 'rating', 'created_at', 'updated_at']
     
     def get_supplier_location(self, obj):
@@ -250,6 +309,10 @@ class EquipmentSerializer(serializers.ModelSerializer):
             'full_address': ', '.join(address_parts) if address_parts else 'Location not specified'
         }
     
+    def get_rating_histogram(self, obj):
+        """Number of reviews per star rating"""
+        return rating_histogram(obj)
+    
     def get_image_url(self, obj):
         """Return absolute URL for equipment image"""
         if obj.image:
@@ -342,3 +405,31 @@ class ProductReviewSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['created_at']
 
+
+class EquipmentReviewSerializer(serializers.ModelSerializer):
+    reviewer_name = serializers.CharField(source='reviewer.username', read_only=True)
+    equipment_name = serializers.CharField(source='equipment.name', read_only=True)
+    
+    class Meta:
+        model = EquipmentReview
+        fields = '__all__'
+        read_only_fields = ['created_at']
+
+
+class RatingSummarySerializer(serializers.Serializer):
+    """Rating aggregates of one product or piece of equipment"""
+    id = serializers.IntegerField()
+    rating = serializers.DecimalField(max_digits=3, decimal_places=2)
+    total_reviews = serializers.IntegerField()
+    histogram = serializers.DictField(child=serializers.IntegerField())
+
+
+class RentalQuoteSerializer(serializers.Serializer):
+    """Price of renting one piece of equipment for a date range (see suppliers.pricing)"""
+    equipment_id = serializers.IntegerField()
+    tiers = serializers.DictField(child=serializers.IntegerField())
+    rental_cost = serializers.DecimalField(max_digits=12, decimal_places=2)
+    operator_charges = serializers.DecimalField(max_digits=12, decimal_places=2)
+    delivery_charges = serializers.DecimalField(max_digits=12, decimal_places=2)
+    security_deposit = serializers.DecimalField(max_digits=12, decimal_places=2)
+    total_amount = serializers.DecimalField(max_digits=12, decimal_places=2)
@@ -0,0 +1,267 @@
+"""
+Aggregate statistics for the supplier dashboard.
+
+Each table is read with a single aggregate query: every figure is a
+filtered Count/Sum over the same supplier's rows, so the database scans
+them once instead of once per number. Order and rental figures come from
+the SupplierDailyStats rollup, one row per day with activity, rather than
+from the raw order and rental history.
+
+The status breakdowns and inventory overviews are cached, keyed with the
+supplier's SupplierStatsVersion counters. The cache may be local to each
+worker, so writes bump the shared counter instead of deleting the entry:
+every worker's copy stops matching at once and simply expires.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import add
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Sum, Q, F
+from django.db.models.functions import TruncDay, TruncWeek, TruncMonth
+from django.utils import timezone
+
+from .models import Product, Equipment, StockLog, SupplierDailyStats, SupplierStatsVersion
+from .serializers import ProductSerializer, StockLogSerializer
+from .stock import with_available_to_sell
+
+ACTIVE_ORDER_STATUSES = ['pending', 'confirmed', 'processing', 'ready']
+ACTIVE_RENTAL_STATUSES = ['pending', 'confirmed', 'active']
+# Available products below this many units count as low stock
+LOW_STOCK_THRESHOLD = 10
+
+
+def status_total(prefix, statuses):
+    """Expression adding up the SupplierDailyStats counters of several statuses"""
+    return reduce(add, (F(f'{prefix}_{status}') for status in statuses))
+
+
+def supplier_dashboard_stats(profile):
+    """Return the SupplierDashboardSerializer figures for a supplier profile"""
+    today = timezone.localdate()
+
+    product_stats = Product.objects.filter(supplier=profile).aggregate(
+        total_products=Count('id'),
+        available_stock=Sum('stock_quantity', filter=Q(is_available=True), default=0),
+        low_stock_count=Count('id', filter=Q(is_available=True, stock_quantity__lt=LOW_STOCK_THRESHOLD)),
+    )
+    equipment_stats = Equipment.objects.filter(supplier=profile).aggregate(
+        total_equipment=Count('id'),
+        available_equipment=Count('id', filter=Q(status='available')),
+    )
+    daily = SupplierDailyStats.objects.filter(supplier=profile).aggregate(
+        active_orders=Sum(status_total('orders', ACTIVE_ORDER_STATUSES), default=0),
+        active_rentals=Sum(status_total('rentals', ACTIVE_RENTAL_STATUSES), default=0),
+        pending_requests=Sum(F('orders_pending') + F('rentals_pending'), default=0),
+        today_earnings=Sum(F('order_earnings') + F('rental_earnings'), filter=Q(date=today), default=0),
+        total_earnings=Sum(F('order_earnings') + F('rental_earnings'), default=0),
+    )
+
+    return {
+        'total_products': product_stats['total_products'],
+        'available_stock': product_stats['available_stock'],
+        'active_orders': daily['active_orders'],
+        'active_rentals': daily['active_rentals'],
+        'today_earnings': daily['today_earnings'],
+        'pending_requests': daily['pending_requests'],
+        'low_stock_count': product_stats['low_stock_count'],
+        'total_earnings': daily['total_earnings'],
+        'total_equipment': equipment_stats['total_equipment'],
+        'available_equipment': equipment_stats['available_equipment'],
+    }
+
+
+EARNINGS_GRANULARITIES = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+# Longest series a single request may ask for
+MAX_EARNINGS_BUCKETS = 366
+
+
+def bucket_start(day, granularity):
+    """First day of the day/week (Monday)/month bucket containing day"""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start, granularity):
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    if granularity == 'month':
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def series_periods(start, end, granularity, limit=MAX_EARNINGS_BUCKETS + 1):
+    """Bucket start dates covering start..end, stopping after limit buckets"""
+    periods = []
+    period = bucket_start(start, granularity)
+    while period <= end and len(periods) < limit:
+        periods.append(period)
+        period = next_bucket(period, granularity)
+    return periods
+
+
+def default_series_start(end, granularity):
+    """Start of the last 30 days, 12 weeks or 12 months up to end"""
+    if granularity == 'day':
+        return end - timedelta(days=29)
+    if granularity == 'week':
+        return bucket_start(end, 'week') - timedelta(weeks=11)
+    month = bucket_start(end, 'month')
+    for _ in range(11):
+        month = bucket_start(month - timedelta(days=1), 'month')
+    return month
+
+
+def earnings_series(profile, start, end, granularity):
+    """
+    Earnings and delivered/completed counts per bucket between two dates
+    (inclusive), oldest first, with empty buckets filled in. Reads one range
+    of SupplierDailyStats rows in a single grouped query.
+    """
+    first = bucket_start(start, granularity)
+    rows = SupplierDailyStats.objects.filter(
+        supplier=profile, date__range=(first, end)
+    ).annotate(
+        period=EARNINGS_GRANULARITIES[granularity]('date')
+    ).values('period').annotate(
+        order_earnings=Sum('order_earnings'),
+        rental_earnings=Sum('rental_earnings'),
+        delivered_orders=Sum('delivered_orders'),
+        completed_rentals=Sum('completed_rentals'),
+    ).order_by('period')
+    by_period = {row['period']: row for row in rows}
+
+    series = []
+    for period in series_periods(start, end, granularity):
+        row = by_period.get(period, {})
+        order_earnings = row.get('order_earnings') or Decimal('0')
+        rental_earnings = row.get('rental_earnings') or Decimal('0')
+        series.append({
+            'period': period,
+            'earnings': order_earnings + rental_earnings,
+            'order_earnings': order_earnings,
+            'rental_earnings': rental_earnings,
+            'delivered_orders': row.get('delivered_orders') or 0,
+            'completed_rentals': row.get('completed_rentals') or 0,
+        })
+    return series
+
+
+# Cached per-status breakdowns are retired on every order or rental write
+STATUS_BREAKDOWN_TIMEOUT = 300
+# SupplierStatsVersion counter of each model's breakdown
+STATUS_BREAKDOWN_COUNTERS = {'order': 'orders', 'rental': 'rentals'}
+
+
+def status_breakdown_counter(model):
+    return STATUS_BREAKDOWN_COUNTERS[model._meta.model_name]
+
+
+def status_breakdown_key(model, supplier_id, version):
+    return f'supplier-status:{model._meta.model_name}:{supplier_id}:v{version}'
+
+
+def status_breakdown(model, supplier_id):
+    """
+    Return {status: {'count': n, 'amount': Decimal}} for a supplier's orders
+    or rentals from one GROUP BY status query, cached until the next write.
+    """
+    version = getattr(SupplierStatsVersion.current(supplier_id), status_breakdown_counter(model))
+    key = status_breakdown_key(model, supplier_id, version)
+    breakdown = cache.get(key)
+    if breakdown is None:
+        rows = model.objects.filter(supplier_id=supplier_id).values('status').annotate(
+            count=Count('id'), amount=Sum('total_amount')
+        ).order_by()
+        breakdown = {
+            row['status']: {'count': row['count'], 'amount': row['amount'] or Decimal('0')}
+            for row in rows
+        }
+        cache.set(key, breakdown, STATUS_BREAKDOWN_TIMEOUT)
+    return breakdown
+
+
+def invalidate_status_breakdown(model, supplier_id):
+    """Retire a supplier's cached breakdown in every worker once the current transaction commits"""
+    counter = status_breakdown_counter(model)
+    transaction.on_commit(lambda: SupplierStatsVersion.bump(supplier_id, counter))
+
+
+def breakdown_count(breakdown, *statuses):
+    if not statuses:
+        return sum(entry['count'] for entry in breakdown.values())
+    return sum(breakdown[status]['count'] for status in statuses if status in breakdown)
+
+
+def breakdown_amount(breakdown, *statuses):
+    return sum((breakdown[status]['amount'] for status in statuses if status in breakdown), Decimal('0'))
+
+
+# Cached inventory overviews are retired on every write to the supplier's profile, products,
+# equipment or stock logs
+INVENTORY_STATS_TIMEOUT = 300
+LOW_STOCK_LIST_LIMIT = 50
+RECENT_ACTIVITY_LIMIT = 20
+
+
+def inventory_stats_key(supplier_id, version):
+    return f'supplier-inventory:{supplier_id}:v{version}'
+
+
+def supplier_inventory_stats(profile):
+    """ProductViewSet.inventory_stats payload for a supplier, cached until the next write"""
+    key = inventory_stats_key(profile.id, SupplierStatsVersion.current(profile.id).inventory)
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_inventory_stats(profile)
+        cache.set(key, stats, INVENTORY_STATS_TIMEOUT)
+    return stats
+
+
+def compute_inventory_stats(profile):
+    products = Product.objects.filter(supplier=profile)
+    low_stock = Q(is_available=True, stock_quantity__lt=LOW_STOCK_THRESHOLD)
+    product_stats = products.aggregate(
+        total_items=Count('id'),
+        low_stock_count=Count('id', filter=low_stock),
+        out_of_stock_count=Count('id', filter=Q(is_available=True, stock_quantity=0)),
+    )
+    equipment_stats = Equipment.objects.filter(supplier=profile).aggregate(
+        total_equipment=Count('id'),
+        available_equipment=Count('id', filter=Q(status='available')),
+    )
+    category_stats = products.values('category').annotate(count=Count('id')).order_by('category')
+
+    logs = StockLog.objects.filter(product__supplier=profile).select_related(
+        'product', 'updated_by'
+    ).order_by('-created_at')[:RECENT_ACTIVITY_LIMIT]
+    # The lowest stock first; low_stock_count still counts every such product
+    low_stock_items = with_available_to_sell(
+        products.filter(low_stock).select_related('supplier')
+    ).order_by('stock_quantity', 'id')[:LOW_STOCK_LIST_LIMIT]
+
+    return {
+        'total_items': product_stats['total_items'],
+        'low_stock_count': product_stats['low_stock_count'],
+        'out_of_stock_count': product_stats['out_of_stock_count'],
+        'total_equipment': equipment_stats['total_equipment'],
+        'available_equipment': equipment_stats['available_equipment'],
+        'category_distribution': list(category_stats),
+        'recent_activity': StockLogSerializer(logs, many=True).data,
+        'low_stock_list': ProductSerializer(low_stock_items, many=True).data,
+    }
+
+
+def invalidate_inventory_stats(supplier_id):
+    """Retire a supplier's cached inventory overview in every worker once the current transaction commits"""
+    if supplier_id is not None:
+        transaction.on_commit(lambda: SupplierStatsVersion.bump(supplier_id, 'inventory'))
@@ -0,0 +1,164 @@
+"""
+Race-free stock changes.
+
+Stock is moved with a single conditional UPDATE (stock_quantity =
+stock_quantity + change, guarded by stock_quantity >= -change for
+deductions), so concurrent orders can neither oversell nor overwrite each
+other's changes, and the StockLog row is written in the same transaction.
+
+Pending orders hold their units with a StockReservation that expires after
+STOCK_RESERVATION_TTL_MINUTES. Available-to-sell is the stock minus the
+live reservations; reserving and selling lock the product row so they see
+each other's holds. Confirmation turns the hold into a sale, cancellation
+drops it, and release_expired_reservations deletes the lapsed ones.
+Product payloads show available-to-sell through with_available_to_sell, so
+taking or dropping a hold also expires the cached searches of the
+product's cell and its supplier's inventory overview.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Product, StockLog, StockReservation, SupplierStatsVersion
+from .indexes import product_cache
+
+
+# Pending orders hold their units this long before others may buy them
+DEFAULT_RESERVATION_TTL_MINUTES = 24 * 60
+
+
+def reservation_ttl():
+    return timedelta(minutes=getattr(settings, 'STOCK_RESERVATION_TTL_MINUTES', DEFAULT_RESERVATION_TTL_MINUTES))
+
+
+class InsufficientStock(Exception):
+    """A deduction asked for more units than the product has"""
+
+    def __init__(self, available, product_id=None):
+        super().__init__(f'Insufficient stock. Available: {available}')
+        self.available = available
+        self.product_id = product_id
+
+
+def change_stock(product_id, change, change_type, note='', user=None):
+    """
+    Add change (negative to deduct) to a product's stock and log it, in one
+    transaction. Returns the StockLog; raises InsufficientStock if the stock
+    would go negative and Product.DoesNotExist if the product is gone.
+    """
+    with transaction.atomic():
+        products = Product.objects.filter(pk=product_id)
+        guarded = products.filter(stock_quantity__gte=-change) if change < 0 else products
+        if not guarded.update(stock_quantity=F('stock_quantity') + change, updated_at=timezone.now()):
+            available = products.values_list('stock_quantity', flat=True).first()
+            if available is None:
+                raise Product.DoesNotExist(f'Product {product_id} does not exist')
+            raise InsufficientStock(available)
+
+        # The UPDATE holds the row lock until commit, so this reads our own result
+        current_stock, geo_cell = products.values_list('stock_quantity', 'geo_cell').get()
+        log = StockLog.objects.create(
+            product_id=product_id,
+            change_type=change_type,
+            quantity=change,
+            previous_stock=current_stock - change,
+            current_stock=current_stock,
+            note=note,
+            updated_by=user,
+        )
+    # queryset.update() sends no post_save, so expire cached searches showing the old stock here
+    product_cache.invalidate_cell(geo_cell)
+    return log
+
+
+def reserved_quantities(product_ids, exclude_order_id=None):
+    """{product_id: units held by live reservations} for the given products"""
+    reservations = StockReservation.objects.filter(product_id__in=product_ids, expires_at__gt=timezone.now())
+    if exclude_order_id is not None:
+        reservations = reservations.exclude(order_id=exclude_order_id)
+    rows = reservations.values('product_id').annotate(reserved=Sum('quantity')).order_by()
+    return {row['product_id']: row['reserved'] for row in rows}
+
+
+def with_available_to_sell(queryset):
+    """Annotate a Product queryset with available_to_sell: the stock not held by live reservations"""
+    held = StockReservation.objects.filter(
+        product=OuterRef('pk'), expires_at__gt=timezone.now()
+    ).values('product').annotate(total=Sum('quantity')).values('total')
+    return queryset.annotate(
+        available_to_sell=Greatest(F('stock_quantity') - Coalesce(Subquery(held), 0), 0)
+    )
+
+
+def invalidate_available_to_sell(product_ids):
+    """
+    Expire the cached searches and inventory overviews showing the given
+    products' available-to-sell once the current transaction commits
+    """
+    rows = set(Product.objects.filter(pk__in=product_ids).values_list('geo_cell', 'supplier_id'))
+    for cell in {cell for cell, _ in rows}:
+        product_cache.invalidate_cell(cell)
+    supplier_ids = {supplier_id for _, supplier_id in rows}
+
+    def bump_inventory_versions():
+        for supplier_id in supplier_ids:
+            SupplierStatsVersion.bump(supplier_id, 'inventory')
+    transaction.on_commit(bump_inventory_versions)
+
+
+def locked_available(product_id, exclude_order_id=None):
+    """Lock a product row and return its stock not held by others; call inside a transaction"""
+    stock = Product.objects.select_for_update().filter(pk=product_id).values_list('stock_quantity', flat=True).get()
+    reserved = reserved_quantities([product_id], exclude_order_id).get(product_id, 0)
+    return max(stock - reserved, 0)
+
+
+def reserve_stock(order):
+    """
+    Hold order.quantity units of its product for the order. Must run in the
+    transaction that creates the order; raises InsufficientStock if fewer
+    units are available to sell.
+    """
+    available = locked_available(order.product_id)
+    if available < order.quantity:
+        raise InsufficientStock(available)
+    invalidate_available_to_sell([order.product_id])
+    return StockReservation.objects.create(
+        product_id=order.product_id,
+        order=order,
+        quantity=order.quantity,
+        expires_at=timezone.now() + reservation_ttl(),
+    )
+
+
+def sell_reserved_stock(order, user=None):
+    """
+    Deduct a confirmed order's units, consuming its reservation. An order
+    whose hold lapsed may only take units nobody else holds.
+    """
+    with transaction.atomic():
+        available = locked_available(order.product_id, exclude_order_id=order.pk)
+        StockReservation.objects.filter(order=order).delete()
+        if available < order.quantity:
+            raise InsufficientStock(available)
+        return change_stock(
+            order.product_id, -order.quantity, 'sale',
+            note=f"Automatic deduction for Order {order.order_number}", user=user
+        )
+
+
+def release_reservation(order):
+    if StockReservation.objects.filter(order=order).delete()[0]:
+        invalidate_available_to_sell([order.product_id])
+
+
+def release_expired_reservations():
+    """Delete every lapsed reservation in one statement; returns how many were released"""
+    lapsed = StockReservation.objects.filter(expires_at__lte=timezone.now())
+    invalidate_available_to_sell(lapsed.values('product_id'))
+    deleted, _ = lapsed.delete()
+    return deleted
@@ -1,3 +1,617 @@
-from django.test import TestCase
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import skipIf
 
-# Create your tests here.
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from geo.models import IndexVersion
+from .models import (
+    SupplierProfile, Product, Equipment, Order, Rental, EquipmentBooking, SupplierDailyStats, StockLog, StockReservation,
+    SupplierReview, ProductReview, EquipmentReview,
+)
+from .bookings import sync_booking
+from .pricing import quote_rental
+from .rollups import rebuild_daily_stats
+from .stock import change_stock, reserve_stock, sell_reserved_stock, InsufficientStock
+
+
+class DashboardStatsTests(TestCase):
+    """SupplierProfileViewSet.dashboard_stats"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='supplier', password='pass', phone_number='9000000001', user_type='supplier'
+        )
+        cls.farmer = User.objects.create_user(
+            username='farmer', password='pass', phone_number='9000000002', user_type='farmer'
+        )
+        cls.profile = SupplierProfile.objects.create(user=cls.user, business_name='Green Seeds')
+
+        seeds = Product.objects.create(
+            supplier=cls.profile, name='Paddy seeds', category='seeds', description='-',
+            price=Decimal('40'), unit='kg', stock_quantity=5
+        )
+        Product.objects.create(
+            supplier=cls.profile, name='Urea', category='fertilizer', description='-',
+            price=Decimal('300'), unit='bag', stock_quantity=50
+        )
+        Product.objects.create(
+            supplier=cls.profile, name='Old stock', category='seeds', description='-',
+            price=Decimal('10'), unit='kg', stock_quantity=2, is_available=False
+        )
+        tractor = Equipment.objects.create(
+            supplier=cls.profile, name='Tractor', equipment_type='tractor', description='-',
+            daily_rate=Decimal('1500'), weekly_rate=Decimal('9000'), security_deposit=Decimal('5000')
+        )
+        Equipment.objects.create(
+            supplier=cls.profile, name='Sprayer', equipment_type='sprayer', description='-',
+            daily_rate=Decimal('200'), weekly_rate=Decimal('1200'), security_deposit=Decimal('500'),
+            status='maintenance'
+        )
+
+        now = timezone.now()
+        order_defaults = dict(supplier=cls.profile, customer=cls.farmer, product=seeds, quantity=1, unit_price=Decimal('40'))
+        Order.objects.create(status='pending', total_amount=Decimal('40'), **order_defaults)
+        Order.objects.create(status='processing', total_amount=Decimal('80'), **order_defaults)
+        Order.objects.create(status='delivered', delivered_at=now, total_amount=Decimal('120'), **order_defaults)
+        Order.objects.create(
+            status='delivered', delivered_at=now - timedelta(days=3), total_amount=Decimal('200'), **order_defaults
+        )
+
+        rental_defaults = dict(
+            supplier=cls.profile, customer=cls.farmer, equipment=tractor,
+            start_date=date.today(), end_date=date.today() + timedelta(days=1),
+            daily_rate=Decimal('1500'), total_rental_cost=Decimal('3000'),
+            security_deposit=Decimal('5000'), delivery_address='Farm'
+        )
+        Rental.objects.create(status='pending', total_amount=Decimal('3000'), **rental_defaults)
+        Rental.objects.create(status='completed', completed_at=now, total_amount=Decimal('1500'), **rental_defaults)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('supplier-dashboard-stats')
+
+    def test_stats(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {
+            'total_products': 3,
+            'available_stock': 55,
+            'active_orders': 2,
+            'active_rentals': 1,
+            'today_earnings': '1620.00',
+            'pending_requests': 2,
+            'low_stock_count': 1,
+            'total_earnings': '1820.00',
+            'total_equipment': 2,
+            'available_equipment': 1,
+        })
+
+    def test_query_budget(self):
+        # Profile lookup plus one aggregate each over products, equipment and the daily rollup
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_rollup_follows_status_changes(self):
+        order = Order.objects.get(status='pending')
+        order.status = 'delivered'
+        order.delivered_at = timezone.now()
+        order.save()
+        Rental.objects.get(status='completed').delete()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['pending_requests'], 1)
+        self.assertEqual(response.data['today_earnings'], '160.00')
+
+        incremental = list(SupplierDailyStats.objects.order_by('date').values())
+        rebuild_daily_stats()
+        rebuilt = list(SupplierDailyStats.objects.order_by('date').values())
+        for row in incremental + rebuilt:
+            del row['id']
+        self.assertEqual(incremental, rebuilt)
+
+
+@skipIf(connection.vendor == 'sqlite', 'SQLite test databases cannot take concurrent writers')
+class StockConcurrencyTests(TransactionTestCase):
+    """suppliers.stock.change_stock under many parallel writers"""
+    THREADS = 40
+
+    def setUp(self):
+        user = User.objects.create_user(
+            username='supplier', password='pass', phone_number='9000000001', user_type='supplier'
+        )
+        profile = SupplierProfile.objects.create(user=user, business_name='Green Seeds')
+        self.product = Product.objects.create(
+            supplier=profile, name='Paddy seeds', category='seeds', description='-',
+            price=Decimal('40'), unit='kg', stock_quantity=25
+        )
+
+    def run_in_threads(self, changes):
+        """Apply each change from its own thread at once; returns how many were rejected"""
+        barrier = threading.Barrier(len(changes))
+        rejected = []
+
+        def worker(change):
+            try:
+                barrier.wait()
+                change_stock(self.product.pk, change, 'sale' if change < 0 else 'restock')
+            except InsufficientStock:
+                rejected.append(change)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(change,)) for change in changes]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return len(rejected)
+
+    def test_no_overselling(self):
+        rejected = self.run_in_threads([-1] * self.THREADS)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 0)
+        self.assertEqual(rejected, self.THREADS - 25)
+        logs = StockLog.objects.filter(product=self.product)
+        self.assertEqual(logs.count(), 25)
+        # Every sale saw a distinct stock level: no two read the same value
+        self.assertEqual(sorted(logs.values_list('previous_stock', flat=True)), list(range(1, 26)))
+
+    def test_no_lost_updates(self):
+        rejected = self.run_in_threads([-1, 2] * (self.THREADS // 2))
+
+        self.product.refresh_from_db()
+        self.assertEqual(rejected, 0)
+        self.assertEqual(self.product.stock_quantity, 25 + self.THREADS // 2)
+
+
+class RentalBookingTests(TestCase):
+    """RentalViewSet.update_status against the booking calendar"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='supplier', password='pass', phone_number='9000000001', user_type='supplier'
+        )
+        farmer = User.objects.create_user(
+            username='farmer', password='pass', phone_number='9000000002', user_type='farmer'
+        )
+        profile = SupplierProfile.objects.create(user=cls.user, business_name='Green Seeds')
+        tractor = Equipment.objects.create(
+            supplier=profile, name='Tractor', equipment_type='tractor', description='-',
+            daily_rate=Decimal('1500'), weekly_rate=Decimal('9000'), security_deposit=Decimal('5000')
+        )
+        start = date.today() + timedelta(days=10)
+        rental_defaults = dict(
+            supplier=profile, customer=farmer, equipment=tractor, status='pending',
+            daily_rate=Decimal('1500'), total_rental_cost=Decimal('4500'), total_amount=Decimal('4500'),
+            security_deposit=Decimal('5000'), delivery_address='Farm'
+        )
+        cls.first = Rental.objects.create(start_date=start, end_date=start + timedelta(days=2), **rental_defaults)
+        cls.overlapping = Rental.objects.create(
+            start_date=start + timedelta(days=2), end_date=start + timedelta(days=4), **rental_defaults
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def confirm(self, rental):
+        return self.client.patch(reverse('rental-update-status', args=[rental.pk]), {'status': 'confirmed'}, format='json')
+
+    def test_overlapping_confirmation_is_rejected(self):
+        self.assertEqual(self.confirm(self.first).status_code, 200)
+
+        response = self.confirm(self.overlapping)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('already booked', response.data['error'])
+        self.assertEqual(list(EquipmentBooking.objects.values_list('rental_id', flat=True)), [self.first.pk])
+        self.overlapping.refresh_from_db()
+        self.assertEqual(self.overlapping.status, 'pending')
+
+
+class RentalPricingTests(TestCase):
+    """suppliers.pricing.quote_rental"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(
+            username='supplier', password='pass', phone_number='9000000001', user_type='supplier'
+        )
+        cls.profile = SupplierProfile.objects.create(user=user, business_name='Green Seeds')
+
+    def equipment(self, **rates):
+        return Equipment.objects.create(
+            supplier=self.profile, name='Tractor', equipment_type='tractor', description='-',
+            security_deposit=Decimal('0'), **rates
+        )
+
+    def test_cheaper_week_covers_six_days(self):
+        tractor = self.equipment(daily_rate=Decimal('1000'), weekly_rate=Decimal('5000'))
+        start = date.today()
+
+        quote = quote_rental(tractor, start, start + timedelta(days=5))
+
+        self.assertEqual(quote['tiers'], {'weekly_rate': 1})
+        self.assertEqual(quote['rental_cost'], Decimal('5000.00'))
+
+    def test_missing_weekly_rate_falls_back_to_days(self):
+        tractor = self.equipment(daily_rate=Decimal('1000'), weekly_rate=None)
+        start = date.today()
+
+        quote = quote_rental(tractor, start, start + timedelta(days=5))
+
+        self.assertEqual(quote['tiers'], {'daily_rate': 6})
+        self.assertEqual(quote['rental_cost'], Decimal('6000.00'))
+
+
+class StockReservationTests(TestCase):
+    """Pending-order holds in suppliers.stock"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(
+            username='supplier', password='pass', phone_number='9000000001', user_type='supplier'
+        )
+        cls.farmer = User.objects.create_user(
+            username='farmer', password='pass', phone_number='9000000002', user_type='farmer'
+        )
+        cls.profile = SupplierProfile.objects.create(user=user, business_name='Green Seeds')
+        cls.product = Product.objects.create(
+            supplier=cls.profile, name='Paddy seeds', category='seeds', description='-',
+            price=Decimal('40'), unit='kg', stock_quantity=5
+        )
+
+    def order(self):
+        return Order.objects.create(
+            supplier=self.profile, customer=self.farmer, product=self.product, quantity=5,
+            unit_price=Decimal('40'), total_amount=Decimal('200')
+        )
+
+    def test_expired_hold_does_not_block_a_sale(self):
+        lapsed = reserve_stock(self.order())
+        lapsed.expires_at = timezone.now() - timedelta(minutes=1)
+        lapsed.save()
+
+        order = self.order()
+        reserve_stock(order)
+        sell_reserved_stock(order)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 0)
+        self.assertFalse(StockReservation.objects.filter(order=order).exists())
+
+
+class ProductUpdateTests(TestCase):
+    """ProductViewSet update with an edited stock"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='supplier', password='pass', phone_number='9000000001', user_type='supplier'
+        )
+        profile = SupplierProfile.objects.create(user=cls.user, business_name='Green Seeds')
+        cls.product = Product.objects.create(
+            supplier=profile, name='Paddy seeds', category='seeds', description='-',
+            price=Decimal('40'), unit='kg', stock_quantity=5
+        )
+
+    def test_stock_edit_is_logged_as_adjustment(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse('product-detail', args=[self.product.pk])
+
+        response = client.patch(url, {'stock_quantity': 50, 'price': '45'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock_quantity, self.product.price), (50, Decimal('45')))
+        log = StockLog.objects.get(product=self.product)
+        self.assertEqual((log.change_type, log.quantity, log.updated_by), ('adjustment', 45, self.user))
+
+
+def reset_search_state():
+    """
+    Start a test with fresh search indexes and an empty search cache. Tests
+    never commit, so version bumps queued with on_commit do not run, and each
+    test rolls IndexVersion back; a version no earlier test reached forces
+    every worker-local index to rebuild from this test's rows.
+    """
+    for name in ('suppliers', 'products', 'equipment'):
+        IndexVersion.objects.update_or_create(name=name, defaults={'version': time.time_ns()})
+    caches['geo_search'].clear()
+
+
+class RatingAggregateTests(TestCase):
+    """Rating columns kept in step with reviews, and the batch ratings endpoints"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(
+            username='supplier', password='pass', phone_number='9000000001', user_type='supplier'
+        )
+        cls.farmers = [
+            User.objects.create_user(
+                username=f'farmer{i}', password='pass', phone_number=f'90000000{10 + i}', user_type='farmer'
+            )
+            for i in range(3)
+        ]
+        cls.profile = SupplierProfile.objects.create(user=user, business_name='Green Seeds')
+        cls.product = Product.objects.create(
+            supplier=cls.profile, name='Paddy seeds', category='seeds', description='-',
+            price=Decimal('40'), unit='kg', stock_quantity=5
+        )
+        cls.tractor = Equipment.objects.create(
+            supplier=cls.profile, name='Tractor', equipment_type='tractor', description='-',
+            daily_rate=Decimal('1500'), security_deposit=Decimal('5000')
+        )
+
+    def ratings(self, url_name, *ids):
+        response = APIClient().get(reverse(url_name), {'ids': ','.join(map(str, ids))})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_create_update_delete(self):
+        reviews = [
+            ProductReview.objects.create(product=self.product, reviewer=farmer, rating=rating)
+            for farmer, rating in zip(self.farmers, (5, 4, 4))
+        ]
+        [summary] = self.ratings('product-ratings', self.product.pk)
+        self.assertEqual((summary['rating'], summary['total_reviews']), ('4.33', 3))
+        self.assertEqual(summary['histogram'], {'1': 0, '2': 0, '3': 0, '4': 2, '5': 1})
+
+        reviews[0].rating = 1
+        reviews[0].save()
+        reviews[1].delete()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.rating, self.product.total_reviews, self.product.rating_sum), (Decimal('2.50'), 2, 5))
+        self.assertEqual(
+            [getattr(self.product, f'rating_count_{star}') for star in range(1, 6)], [1, 0, 0, 1, 0]
+        )
+
+    def test_batch_keeps_request_order_and_skips_unknown_ids(self):
+        EquipmentReview.objects.create(equipment=self.tractor, reviewer=self.farmers[0], rating=3)
+        other = Equipment.objects.create(
+            supplier=self.profile, name='Sprayer', equipment_type='sprayer', description='-',
+            daily_rate=Decimal('200'), security_deposit=Decimal('500')
+        )
+
+        data = self.ratings('equipment-ratings', other.pk, 999999, self.tractor.pk)
+        self.assertEqual([(row['id'], row['total_reviews']) for row in data], [(other.pk, 0), (self.tractor.pk, 1)])
+        self.assertEqual(APIClient().get(reverse('equipment-ratings'), {'ids': 'x'}).status_code, 400)
+
+    def test_stale_saves_keep_review_counts(self):
+        stale_profile = SupplierProfile.objects.get(pk=self.profile.pk)
+        stale_product = Product.objects.get(pk=self.product.pk)
+        stale_tractor = Equipment.objects.get(pk=self.tractor.pk)
+        SupplierReview.objects.create(supplier=self.profile, reviewer=self.farmers[0], rating=4)
+        ProductReview.objects.create(product=self.product, reviewer=self.farmers[0], rating=4)
+        EquipmentReview.objects.create(equipment=self.tractor, reviewer=self.farmers[0], rating=4)
+
+        # Full saves of rows loaded before the reviews committed
+        for stale in (stale_profile, stale_product, stale_tractor):
+            stale.description = 'Edited'
+            stale.save()
+            stale.refresh_from_db()
+            self.assertEqual((stale.total_reviews, stale.rating_sum, stale.rating_count_4), (1, 4, 1))
+            self.assertEqual(stale.description, 'Edited')
+
+
+class NearbySearchTests(TestCase):
+    """Product and equipment search_nearby over the spatial index and search cache"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='supplier', password='pass', phone_number='9000000001', user_type='supplier'
+        )
+        cls.profile = SupplierProfile.objects.create(
+            user=cls.user, business_name='Green Seeds', latitude=Decimal('12.000000'), longitude=Decimal('78.000000')
+        )
+        # A second seller 0.1 degrees north (about 11 km)
+        other_user = User.objects.create_user(
+            username='supplier2', password='pass', phone_number='9000000002', user_type='supplier'
+        )
+        cls.other_profile = SupplierProfile.objects.create(
+            user=other_user, business_name='Agro Tools', latitude=Decimal('12.100000'), longitude=Decimal('78.000000')
+        )
+        cls.products = [
+            Product.objects.create(
+                supplier=profile, name=f'Seeds {i}', category='seeds', description='-',
+                price=Decimal('40'), unit='kg', stock_quantity=20
+            )
+            for profile in (cls.profile, cls.other_profile)
+            for i in range(4)
+        ]
+        cls.tractors = [
+            Equipment.objects.create(
+                supplier=profile, name='Tractor', equipment_type='tractor', description='-',
+                daily_rate=Decimal('1000'), weekly_rate=Decimal('5000'), security_deposit=Decimal('0')
+            )
+            for profile in (cls.profile, cls.other_profile)
+        ]
+
+    def setUp(self):
+        reset_search_state()
+        self.client = APIClient()
+        self.search = {'latitude': '12.003', 'longitude': '78.001', 'max_distance': '30'}
+
+    def test_listing_edit_expires_cached_search(self):
+        url = reverse('product-search-nearby')
+        first = self.client.get(url, self.search)
+        self.assertEqual(len(first.data), 8)
+        self.assertEqual(first.data[0]['price'], '40.00')
+
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                reverse('product-detail', args=[self.products[0].pk]), {'price': '35'}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+
+        prices = {row['id']: row['price'] for row in self.client.get(url, self.search).data}
+        self.assertEqual(prices[self.products[0].pk], '35.00')
+
+    def test_cursor_pages_have_no_duplicates_or_gaps(self):
+        url = reverse('product-search-nearby')
+        expected = [row['id'] for row in self.client.get(url, self.search).data]
+
+        seen = []
+        response = self.client.get(url, {**self.search, 'page_size': 3})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row['id'] for row in response.data['results'])
+            if response.data['next'] is None:
+                break
+            response = self.client.get(response.data['next'])
+
+        self.assertEqual(seen, expected)
+        distances = [row['distance'] for row in self.client.get(url, self.search).data]
+        self.assertEqual(distances, sorted(distances))
+
+    def test_date_filter_skips_booked_equipment_and_quotes_the_rest(self):
+        start = date.today() + timedelta(days=5)
+        farmer = User.objects.create_user(
+            username='farmer', password='pass', phone_number='9000000003', user_type='farmer'
+        )
+        booked = Rental.objects.create(
+            supplier=self.profile, customer=farmer, equipment=self.tractors[0], status='confirmed',
+            start_date=start + timedelta(days=2), end_date=start + timedelta(days=8),
+            daily_rate=Decimal('1000'), total_rental_cost=Decimal('7000'), total_amount=Decimal('7000'),
+            security_deposit=Decimal('0'), delivery_address='Farm'
+        )
+        sync_booking(booked)
+
+        response = self.client.get(reverse('equipment-search-nearby'), {
+            **self.search, 'start_date': start.isoformat(), 'end_date': (start + timedelta(days=5)).isoformat(),
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data], [self.tractors[1].pk])
+        self.assertEqual(response.data[0]['quote']['tiers'], {'weekly_rate': 1})
+
+        # Dates clear of the booking find both
+        response = self.client.get(reverse('equipment-search-nearby'), {
+            **self.search, 'start_date': start.isoformat(), 'end_date': (start + timedelta(days=1)).isoformat(),
+        })
+        self.assertEqual(len(response.data), 2)
+
+
+class EarningsSeriesTests(TestCase):
+    """SupplierProfileViewSet.earnings"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='supplier', password='pass', phone_number='9000000001', user_type='supplier'
+        )
+        farmer = User.objects.create_user(
+            username='farmer', password='pass', phone_number='9000000002', user_type='farmer'
+        )
+        profile = SupplierProfile.objects.create(user=cls.user, business_name='Green Seeds')
+        seeds = Product.objects.create(
+            supplier=profile, name='Paddy seeds', category='seeds', description='-',
+            price=Decimal('40'), unit='kg', stock_quantity=50
+        )
+        now = timezone.now()
+        cls.today = timezone.localdate(now)
+        for days_ago, amount in ((0, '100'), (0, '50'), (2, '30')):
+            Order.objects.create(
+                supplier=profile, customer=farmer, product=seeds, quantity=1, unit_price=Decimal('40'),
+                status='delivered', delivered_at=now - timedelta(days=days_ago), total_amount=Decimal(amount)
+            )
+        Order.objects.create(
+            supplier=profile, customer=farmer, product=seeds, quantity=1, unit_price=Decimal('40'),
+            status='pending', total_amount=Decimal('999')
+        )
+
+    def test_daily_series_fills_empty_days(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.get(reverse('supplier-earnings'), {
+            'granularity': 'day', 'start': (self.today - timedelta(days=2)).isoformat(), 'end': self.today.isoformat(),
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['earnings'], row['delivered_orders']) for row in response.data['results']],
+            [('30.00', 1), ('0.00', 0), ('150.00', 2)]
+        )
+
+    def test_rejects_bad_granularity_and_reversed_range(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse('supplier-earnings')
+        self.assertEqual(client.get(url, {'granularity': 'hour'}).status_code, 400)
+        self.assertEqual(client.get(url, {'start': '2026-02-01', 'end': '2026-01-01'}).status_code, 400)
+
+
+class OrderCheckoutTests(TestCase):
+    """OrderViewSet.checkout"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(
+            username='supplier', password='pass', phone_number='9000000001', user_type='supplier'
+        )
+        cls.farmer = User.objects.create_user(
+            username='farmer', password='pass', phone_number='9000000002', user_type='farmer'
+        )
+        profile = SupplierProfile.objects.create(user=user, business_name='Green Seeds')
+        cls.seeds, cls.urea = (
+            Product.objects.create(
+                supplier=profile, name=name, category='seeds', description='-',
+                price=Decimal(price), unit='kg', stock_quantity=stock
+            )
+            for name, price, stock in (('Paddy seeds', '40', 10), ('Urea', '300', 2))
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.farmer)
+        self.url = reverse('order-checkout')
+
+    def test_orders_and_holds_every_item(self):
+        response = self.client.post(self.url, {'items': [
+            {'product_id': self.seeds.pk, 'quantity': 3},
+            {'product_id': self.urea.pk, 'quantity': 2},
+            {'product_id': self.seeds.pk, 'quantity': 1},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            sorted(Order.objects.values_list('product_id', 'quantity', 'total_amount')),
+            sorted([(self.seeds.pk, 4, Decimal('160.00')), (self.urea.pk, 2, Decimal('600.00'))])
+        )
+        self.assertEqual(
+            dict(StockReservation.objects.values_list('product_id', 'quantity')), {self.seeds.pk: 4, self.urea.pk: 2}
+        )
+        # Holds are not sales: the stock itself moves on confirmation
+        self.seeds.refresh_from_db()
+        self.assertEqual(self.seeds.stock_quantity, 10)
+
+    def test_short_item_rejects_whole_checkout(self):
+        response = self.client.post(self.url, {'items': [
+            {'product_id': self.seeds.pk, 'quantity': 3},
+            {'product_id': self.urea.pk, 'quantity': 3},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual((response.data['product_id'], response.data['available']), (self.urea.pk, 2))
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(StockReservation.objects.exists())
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import SupplierProfileViewSet, ProductViewSet, EquipmentViewSet, OrderViewSet, RentalViewSet, SupplierReviewViewSet, ProductReviewViewSet
+from .views import SupplierProfileViewSet, ProductViewSet, EquipmentViewSet, OrderViewSet, RentalViewSet, SupplierReviewViewSet, ProductReviewViewSet, EquipmentReviewViewSet
 
 # Create router
 router = DefaultRouter()
@@ -11,6 +11,7 @@ router.register(r'orders', OrderViewSet, basename='order')
 router.register(r'rentals', RentalViewSet, basename='rental')
 router.register(r'reviews/supplier', SupplierReviewViewSet, basename='supplier-review')
 router.register(r'reviews/product', ProductReviewViewSet, basename='product-review')
+router.register(r'reviews/equipment', EquipmentReviewViewSet, basename='equipment-review')
 
 # URL patterns combining explicit paths and router
 urlpatterns = [
@@ -25,6 +26,9 @@ urlpatterns = [
     path('profiles/dashboard_stats/', 
          SupplierProfileViewSet.as_view({'get': 'dashboard_stats'}), 
          name='supplier-dashboard-stats'),
+    path('profiles/earnings/', 
+         SupplierProfileViewSet.as_view({'get': 'earnings'}), 
+         name='supplier-earnings'),
     path('profiles/update_profile/', 
          SupplierProfileViewSet.as_view({'patch': 'update_profile', 'put': 'update_profile'}), 
          name='supplier-update-profile'),
@@ -55,6 +59,9 @@ urlpatterns = [
     path('orders/place_order/', 
          OrderViewSet.as_view({'post': 'place_order'}), 
          name='farmer-place-order'),
+    path('orders/checkout/', 
+         OrderViewSet.as_view({'post': 'checkout'}), 
+         name='farmer-checkout'),
     path('orders/farmer_orders/', 
          OrderViewSet.as_view({'get': 'farmer_orders'}), 
          name='farmer-orders'),
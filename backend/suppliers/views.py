@@ -2,37 +2,49 @@ from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from django.db.models import Sum, Count, Q
+from django.db import transaction
+from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from math import radians, cos, sin, asin, sqrt
+from datetime import date
 
-from .models import SupplierProfile, Product, Equipment, Order, Rental, StockLog, SupplierReview, ProductReview
+from geo.utils import hydrate, grid_cell, haversine_array, MAX_SEARCH_RADIUS_KM
+from geo.pagination import DistanceCursorPagination
+from geo.clusters import cluster_response
+from .models import SupplierProfile, DeliveryCell, Product, Equipment, Order, Rental, SupplierReview, ProductReview, EquipmentReview
+from .stats import (
+    supplier_dashboard_stats, earnings_series, series_periods, default_series_start,
+    status_breakdown, breakdown_count, breakdown_amount, supplier_inventory_stats,
+    EARNINGS_GRANULARITIES, MAX_EARNINGS_BUCKETS
+)
+from .bookings import BookingConflict, conflicting_booking, bookings_between, sync_booking, parse_date_range, MAX_RANGE_DAYS
+from .busy_days import free_mask
+from .pricing import quote_rental, quote_rentals, MAX_QUOTE_ITEMS
+from .checkout import checkout, parse_items, UnavailableProducts
+from .stock import change_stock, with_available_to_sell, reserve_stock, sell_reserved_stock, release_reservation, InsufficientStock
+from .ratings import PRODUCT_RATINGS, EQUIPMENT_RATINGS, MAX_RATING_BATCH, parse_ids
+from .indexes import (
+    supplier_index, product_index, equipment_index, product_cache, equipment_cache,
+    supplier_clusters, equipment_clusters
+)
 from notifications.models import Notification
+from notifications.outbox import publish
 from .serializers import (
     SupplierProfileSerializer, 
     SupplierProfileUpdateSerializer,
     SupplierDashboardSerializer,
+    EarningsBucketSerializer,
     ProductSerializer,
     EquipmentSerializer,
     OrderSerializer,
     RentalSerializer,
-    StockLogSerializer,
     SupplierReviewSerializer,
-    ProductReviewSerializer
+    ProductReviewSerializer,
+    EquipmentReviewSerializer,
+    RatingSummarySerializer,
+    RentalQuoteSerializer
 )
 
 
-def haversine(lon1, lat1, lon2, lat2):
-    """Calculate the great circle distance between two points on the earth"""
-    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
-    dlon = lon2 - lon1
-    dlat = lat2 - lat1
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * asin(sqrt(a))
-    km = 6371 * c
-    return km
-
-
 def get_or_create_supplier_profile(user):
     """Get or create supplier profile for a user - prevents duplicate errors"""
     profile, created = SupplierProfile.objects.get_or_create(
@@ -46,6 +58,20 @@ def get_or_create_supplier_profile(user):
     return profile
 
 
+def rating_batch_response(request, aggregate):
+    """Rating aggregates for the comma-separated ids in ?ids=, in request order; unknown ids are left out"""
+    try:
+        ids = parse_ids(request.query_params.get('ids', ''))
+    except ValueError:
+        return Response(
+            {'error': f'ids must be a comma-separated list of 1 to {MAX_RATING_BATCH} integers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    ratings = aggregate.batch(ids)
+    rows = [{'id': pk, **ratings[pk]} for pk in ids if pk in ratings]
+    return Response(RatingSummarySerializer(rows, many=True).data)
+
+
 class SupplierProfileViewSet(viewsets.ModelViewSet):
     """ViewSet for supplier profiles"""
     queryset = SupplierProfile.objects.filter(is_active=True)
@@ -97,62 +123,53 @@ class SupplierProfileViewSet(viewsets.ModelViewSet):
     def dashboard_stats(self, request):
         """Get dashboard statistics for current supplier - auto-creates profile if needed"""
         profile = get_or_create_supplier_profile(request.user)
-        products = Product.objects.filter(supplier=profile)
-        equipment = Equipment.objects.filter(supplier=profile)
-        orders = Order.objects.filter(supplier=profile)
-        rentals = Rental.objects.filter(supplier=profile)
-        
-        # Calculate stats
-        total_products = products.count()
-        available_stock = products.filter(is_available=True).aggregate(
-            total=Sum('stock_quantity')
-        )['total'] or 0
-        
-        # Equipment stats
-        total_equipment = equipment.count()
-        available_equipment = equipment.filter(status='available').count()
-        
-        # Real Transaction Stats
-        active_orders = orders.filter(status__in=['pending', 'confirmed', 'processing', 'ready']).count()
-        active_rentals = rentals.filter(status__in=['pending', 'confirmed', 'active']).count()
-        
-        # Earnings
-        today = timezone.now().date()
-        today_order_earnings = orders.filter(status='delivered', delivered_at__date=today).aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-        today_rental_earnings = rentals.filter(status='completed', completed_at__date=today).aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-        today_earnings = today_order_earnings + today_rental_earnings
-        
-        pending_requests = orders.filter(status='pending').count() + rentals.filter(status='pending').count()
-        
-        total_order_earnings = orders.filter(status='delivered').aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-        total_rental_earnings = rentals.filter(status='completed').aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-        total_earnings = total_order_earnings + total_rental_earnings
-        
-        # Low stock alert (< 10 units)
-        low_stock_count = products.filter(stock_quantity__lt=10, is_available=True).count()
-        
-        stats = {
-            'total_products': total_products,
-            'available_stock': available_stock,
-            'active_orders': active_orders,
-            'active_rentals': active_rentals,
-            'today_earnings': today_earnings,
-            'pending_requests': pending_requests,
-            'low_stock_count': low_stock_count,
-            'total_earnings': total_earnings,
-            'total_equipment': total_equipment,
-            'available_equipment': available_equipment,
-        }
+        # One aggregate query per table (see suppliers.stats)
+        stats = supplier_dashboard_stats(profile)
         
         serializer = SupplierDashboardSerializer(stats)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'], url_path='earnings')
+    def earnings(self, request):
+        """Earnings time series for the current supplier at day, week or month granularity"""
+        granularity = request.query_params.get('granularity', 'day')
+        if granularity not in EARNINGS_GRANULARITIES:
+            return Response(
+                {'error': f"granularity must be one of: {', '.join(EARNINGS_GRANULARITIES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            end = request.query_params.get('end')
+            end = date.fromisoformat(end) if end else timezone.localdate()
+            start = request.query_params.get('start')
+            start = date.fromisoformat(start) if start else default_series_start(end, granularity)
+        except ValueError:
+            return Response({'error': 'start and end must be dates (YYYY-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if start > end:
+            return Response({'error': 'start must not be after end'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(series_periods(start, end, granularity)) > MAX_EARNINGS_BUCKETS:
+            return Response(
+                {'error': f'At most {MAX_EARNINGS_BUCKETS} periods can be requested at once'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        profile = get_or_create_supplier_profile(request.user)
+        series = earnings_series(profile, start, end, granularity)
+        return Response({
+            'granularity': granularity,
+            'start': start,
+            'end': end,
+            'results': EarningsBucketSerializer(series, many=True).data,
+        })
+    
     @action(detail=False, methods=['get'], url_path='search_nearby')
     def search_nearby(self, request):
         """Search suppliers by location with distance calculation"""
         latitude = request.query_params.get('latitude')
         longitude = request.query_params.get('longitude')
-        max_distance = float(request.query_params.get('max_distance', 50))  # km
+        max_distance = request.query_params.get('max_distance', 50)  # km
         business_type = request.query_params.get('business_type')  # Optional filter
         
         if not latitude or not longitude:
@@ -168,52 +185,94 @@ class SupplierProfileViewSet(viewsets.ModelViewSet):
             serializer = self.get_serializer(suppliers, many=True)
             return Response(serializer.data)
         
+        limit = request.query_params.get('limit')  # Optional: only the k nearest
         try:
             latitude = float(latitude)
             longitude = float(longitude)
+            max_distance = float(max_distance)
+            limit = int(limit) if limit else None
+            if not 0 < max_distance <= MAX_SEARCH_RADIUS_KM or (limit is not None and limit < 1):
+                raise ValueError
         except (ValueError, TypeError):
             return Response(
-                {'error': 'Invalid latitude or longitude format'}, 
+                {'error': f'Invalid latitude, longitude, max_distance (up to {MAX_SEARCH_RADIUS_KM} km) '
+                          'or limit (a positive integer)'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get all verified active suppliers
+        # Verified active suppliers around the point, nearest first, from the spatial index
+        paginator = DistanceCursorPagination(request)
+        if paginator.enabled:
+            ids, distances = paginator.paginate(supplier_index, latitude, longitude, max_distance, tag=business_type)
+        else:
+            ids, distances = supplier_index.search(latitude, longitude, max_distance, tag=business_type, limit=limit)
+        suppliers = hydrate(
+            SupplierProfile.objects.filter(is_active=True, verification_status='verified').select_related('user'),
+            ids
+        )
+        
+        distance_by_id = dict(zip(ids.tolist(), distances.tolist()))
+        nearby_suppliers = self.get_serializer(suppliers, many=True).data
+        for supplier_data in nearby_suppliers:
+            supplier_data['distance_km'] = round(distance_by_id[supplier_data['id']], 2)
+        
+        if paginator.enabled:
+            return paginator.get_paginated_response(nearby_suppliers)
+        return Response(nearby_suppliers)
+
+    @action(detail=False, methods=['get'], url_path='delivers_to')
+    def delivers_to(self, request):
+        """Suppliers whose home-delivery radius covers the given location"""
+        latitude = request.query_params.get('latitude')
+        longitude = request.query_params.get('longitude')
+        business_type = request.query_params.get('business_type')  # Optional filter
+        
+        try:
+            latitude = float(latitude)
+            longitude = float(longitude)
+        except (ValueError, TypeError):
+            return Response(
+                {'error': 'Valid latitude and longitude are required'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Candidates come from the delivery cell index; only they are checked exactly
         suppliers = SupplierProfile.objects.filter(
+            delivery_cells__cell__in=[grid_cell(latitude, longitude), DeliveryCell.WIDE_COVERAGE],
             is_active=True,
-            verification_status='verified'
+            verification_status='verified',
+            home_delivery_available=True,
         ).select_related('user')
         
-        # Filter by business type if provided
         if business_type:
             suppliers = suppliers.filter(business_types__icontains=business_type)
         
-        # Calculate distance for each supplier
-        nearby_suppliers = []
-        for supplier in suppliers:
-            # Use supplier's lat/long if available, otherwise use user's lat/long
-            supplier_lat = supplier.latitude if supplier.latitude else (
-                supplier.user.latitude if hasattr(supplier.user, 'latitude') else None
-            )
-            supplier_lon = supplier.longitude if supplier.longitude else (
-                supplier.user.longitude if hasattr(supplier.user, 'longitude') else None
-            )
-            
-            if supplier_lat and supplier_lon:
-                distance = haversine(
-                    longitude, latitude,
-                    float(supplier_lon),
-                    float(supplier_lat)
-                )
-                
-                if distance <= max_distance:
-                    supplier_data = self.get_serializer(supplier).data
-                    supplier_data['distance_km'] = round(distance, 2)
-                    nearby_suppliers.append(supplier_data)
+        suppliers = [supplier for supplier in suppliers if None not in supplier.get_coordinates()]
+        if not suppliers:
+            return Response([])
         
-        # Sort by distance
-        nearby_suppliers.sort(key=lambda x: x['distance_km'])
+        coordinates = [supplier.get_coordinates() for supplier in suppliers]
+        distances = haversine_array(
+            latitude, longitude,
+            [float(lat) for lat, _ in coordinates],
+            [float(lon) for _, lon in coordinates]
+        )
+        matches = sorted(
+            (distance, supplier.id, supplier)
+            for distance, supplier in zip(distances.tolist(), suppliers)
+            if distance <= supplier.delivery_radius_km
+        )
         
-        return Response(nearby_suppliers)
+        delivering_suppliers = self.get_serializer([supplier for _, _, supplier in matches], many=True).data
+        for supplier_data, (distance, _, _) in zip(delivering_suppliers, matches):
+            supplier_data['distance_km'] = round(distance, 2)
+        
+        return Response(delivering_suppliers)
+
+    @action(detail=False, methods=['get'], url_path='clusters')
+    def clusters(self, request):
+        """Map clusters of verified suppliers inside a bounding box at a zoom level"""
+        return cluster_response(request, supplier_clusters, tag=request.query_params.get('business_type'))
 
 
 class ProductViewSet(viewsets.ModelViewSet):
@@ -223,10 +282,14 @@ class ProductViewSet(viewsets.ModelViewSet):
     serializer_class = ProductSerializer
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['name', 'description', 'category']
-    ordering_fields = ['price', 'created_at']
+    ordering_fields = ['price', 'created_at', 'rating']
+
+    def get_queryset(self):
+        # Holds expire with time, so the stock they leave is computed per request
+        return with_available_to_sell(super().get_queryset())
 
     def get_permissions(self):
-        if self.action in ['list', 'retrieve', 'search_nearby']:
+        if self.action in ['list', 'retrieve', 'search_nearby', 'ratings']:
             return [AllowAny()]
         return [IsAuthenticated()]
 
@@ -239,7 +302,7 @@ class ProductViewSet(viewsets.ModelViewSet):
         """Get current supplier's products (all statuses) - auto-creates profile if needed"""
         supplier_profile = get_or_create_supplier_profile(request.user)
         # Suppliers see ALL their products (available + unavailable) so they can manage them
-        products = Product.objects.filter(supplier=supplier_profile).select_related('supplier', 'supplier__user')
+        products = with_available_to_sell(Product.objects.filter(supplier=supplier_profile).select_related('supplier', 'supplier__user'))
         serializer = self.get_serializer(products, many=True)
         return Response(serializer.data)
     
@@ -249,37 +312,53 @@ class ProductViewSet(viewsets.ModelViewSet):
         latitude = request.query_params.get('latitude')
         longitude = request.query_params.get('longitude')
         category = request.query_params.get('category')
-        max_distance = float(request.query_params.get('max_distance', 50))  # km
+        max_distance = request.query_params.get('max_distance', 50)  # km
         
         if not latitude or not longitude:
             return Response({'error': 'Latitude and longitude required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        latitude = float(latitude)
-        longitude = float(longitude)
-        
-        products = Product.objects.filter(is_available=True)
-        
-        if category:
-            products = products.filter(category=category)
+        limit = request.query_params.get('limit')  # Optional: only the k nearest
+        try:
+            latitude = float(latitude)
+            longitude = float(longitude)
+            max_distance = float(max_distance)
+            limit = int(limit) if limit else None
+            if not 0 < max_distance <= MAX_SEARCH_RADIUS_KM or (limit is not None and limit < 1):
+                raise ValueError
+        except (ValueError, TypeError):
+            return Response(
+                {'error': f'Invalid latitude, longitude, max_distance (up to {MAX_SEARCH_RADIUS_KM} km) '
+                          'or limit (a positive integer)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Filter by distance
-        nearby_products = []
-        for product in products:
-            if product.supplier.user.latitude and product.supplier.user.longitude:
-                distance = haversine(
-                    longitude, latitude,
-                    float(product.supplier.user.longitude),
-                    float(product.supplier.user.latitude)
-                )
-                if distance <= max_distance:
-                    product_data = ProductSerializer(product).data
-                    product_data['distance'] = round(distance, 2)
-                    nearby_products.append(product_data)
+        def serialize(ids, distances):
+            """Load and serialize only the matches, nearest first"""
+            products = hydrate(with_available_to_sell(Product.objects.filter(is_available=True).select_related('supplier', 'supplier__user')), ids)
+            distance_by_id = dict(zip(ids.tolist(), distances.tolist()))
+            data = ProductSerializer(products, many=True).data
+            for product_data in data:
+                product_data['distance'] = round(distance_by_id[product_data['id']], 2)
+            return data
         
-        # Sort by distance
-        nearby_products.sort(key=lambda x: x['distance'])
+        paginator = DistanceCursorPagination(request)
+        if paginator.enabled:
+            ids, distances = paginator.paginate(product_index, latitude, longitude, max_distance, tag=category)
+            return paginator.get_paginated_response(serialize(ids, distances))
         
-        return Response(nearby_products)
+        # Filter by distance through the spatial index, reusing a cached payload when possible;
+        # nearby users share cached results, so this search runs from the snapped point
+        snapped_latitude, snapped_longitude = product_cache.snap(latitude, longitude)
+        nearby_products = product_cache.fetch(
+            snapped_latitude, snapped_longitude, max_distance, category,
+            build=lambda radius: serialize(*product_index.within(snapped_latitude, snapped_longitude, radius, tag=category))
+        )
+        return Response(nearby_products[:limit])
+
+    @action(detail=False, methods=['get'])
+    def ratings(self, request):
+        """Rating average, count and histogram for up to 100 products (?ids=1,2,3)"""
+        return rating_batch_response(request, PRODUCT_RATINGS)
 
     @action(detail=True, methods=['post'])
     def adjust_stock(self, request, pk=None):
@@ -293,28 +372,14 @@ class ProductViewSet(viewsets.ModelViewSet):
             if quantity_change == 0:
                 return Response({'error': 'Quantity change cannot be zero'}, status=status.HTTP_400_BAD_REQUEST)
             
-            previous_stock = product.stock_quantity
-            product.stock_quantity += quantity_change
-            
-            if product.stock_quantity < 0:
+            try:
+                log = change_stock(product.pk, quantity_change, change_type, note=note, user=request.user)
+            except InsufficientStock:
                 return Response({'error': 'Stock cannot be negative'}, status=status.HTTP_400_BAD_REQUEST)
-                
-            product.save()
-            
-            # Log the change
-            StockLog.objects.create(
-                product=product,
-                change_type=change_type,
-                quantity=quantity_change,
-                previous_stock=previous_stock,
-                current_stock=product.stock_quantity,
-                note=note,
-                updated_by=request.user
-            )
             
             return Response({
                 'status': 'Stock adjusted successfully',
-                'new_stock': product.stock_quantity
+                'new_stock': log.current_stock
             })
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -324,30 +389,8 @@ class ProductViewSet(viewsets.ModelViewSet):
         """Get inventory overview statistics"""
         try:
             supplier_profile = SupplierProfile.objects.get(user=request.user)
-            products = Product.objects.filter(supplier=supplier_profile)
-            equipment = Equipment.objects.filter(supplier=supplier_profile)
-            
-            total_items = products.count()
-            low_stock_items = products.filter(stock_quantity__lt=10, is_available=True)
-            out_of_stock = products.filter(stock_quantity=0, is_available=True).count()
-            
-            # Category-wise distribution
-            category_stats = products.values('category').annotate(count=Count('id'))
-            
-            # Stock logs (last 20)
-            logs = StockLog.objects.filter(product__supplier=supplier_profile).order_by('-created_at')[:20]
-            log_serializer = StockLogSerializer(logs, many=True)
-            
-            stats = {
-                'total_items': total_items,
-                'low_stock_count': low_stock_items.count(),
-                'out_of_stock_count': out_of_stock,
-                'total_equipment': equipment.count(),
-                'available_equipment': equipment.filter(status='available').count(),
-                'category_distribution': list(category_stats),
-                'recent_activity': log_serializer.data,
-                'low_stock_list': ProductSerializer(low_stock_items, many=True).data
-            }
+            # Cached per supplier until its profile, products, equipment or stock logs change
+            stats = supplier_inventory_stats(supplier_profile)
             
             return Response(stats)
         except SupplierProfile.DoesNotExist:
@@ -364,7 +407,7 @@ class EquipmentViewSet(viewsets.ModelViewSet):
     ordering_fields = ['daily_rate', 'created_at', 'rating']
 
     def get_permissions(self):
-        if self.action in ['list', 'retrieve', 'search_nearby']:
+        if self.action in ['list', 'retrieve', 'search_nearby', 'clusters', 'ratings', 'availability', 'quote']:
             return [AllowAny()]
         return [IsAuthenticated()]
 
@@ -384,41 +427,136 @@ class EquipmentViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def search_nearby(self, request):
-        """Search equipment by location and type"""
+        """Search equipment by location and type, optionally free between start_date and end_date"""
         latitude = request.query_params.get('latitude')
         longitude = request.query_params.get('longitude')
         equipment_type = request.query_params.get('equipment_type')
-        max_distance = float(request.query_params.get('max_distance', 50))  # km
+        max_distance = request.query_params.get('max_distance', 50)  # km
         
         if not latitude or not longitude:
             return Response({'error': 'Latitude and longitude required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        latitude = float(latitude)
-        longitude = float(longitude)
+        limit = request.query_params.get('limit')  # Optional: only the k nearest
+        try:
+            latitude = float(latitude)
+            longitude = float(longitude)
+            max_distance = float(max_distance)
+            limit = int(limit) if limit else None
+            if not 0 < max_distance <= MAX_SEARCH_RADIUS_KM or (limit is not None and limit < 1):
+                raise ValueError
+        except (ValueError, TypeError):
+            return Response(
+                {'error': f'Invalid latitude, longitude, max_distance (up to {MAX_SEARCH_RADIUS_KM} km) '
+                          'or limit (a positive integer)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        equipment = Equipment.objects.filter(is_available=True, status='available')
+        # Optional: only equipment with no booking between start_date and end_date
+        keep = None
+        if 'start_date' in request.query_params or 'end_date' in request.query_params:
+            try:
+                start, end = parse_date_range(
+                    request.query_params.get('start_date', ''), request.query_params.get('end_date', '')
+                )
+            except ValueError:
+                return Response(
+                    {'error': f'start_date and end_date must be dates (YYYY-MM-DD), at most {MAX_RANGE_DAYS} days apart'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            keep = lambda ids: free_mask(ids, start, end)
+            with_operator = request.query_params.get('operator') == 'true'
         
-        if equipment_type:
-            equipment = equipment.filter(equipment_type=equipment_type)
+        def serialize(ids, distances):
+            """Load and serialize only the matches, nearest first"""
+            equipment = hydrate(Equipment.objects.filter(is_available=True, status='available').select_related('supplier', 'supplier__user'), ids)
+            distance_by_id = dict(zip(ids.tolist(), distances.tolist()))
+            data = EquipmentSerializer(equipment, many=True).data
+            # Date searches also price each result for the requested dates
+            quotes = quote_rentals(equipment, start, end, with_operator) if keep is not None else {}
+            for equip_data in data:
+                equip_data['distance'] = round(distance_by_id[equip_data['id']], 2)
+                if equip_data['id'] in quotes:
+                    equip_data['quote'] = RentalQuoteSerializer({'equipment_id': equip_data['id'], **quotes[equip_data['id']]}).data
+            return data
         
-        # Filter by distance
-        nearby_equipment = []
-        for equip in equipment:
-            if equip.supplier.user.latitude and equip.supplier.user.longitude:
-                distance = haversine(
-                    longitude, latitude,
-                    float(equip.supplier.user.longitude),
-                    float(equip.supplier.user.latitude)
-                )
-                if distance <= max_distance:
-                    equip_data = EquipmentSerializer(equip).data
-                    equip_data['distance'] = round(distance, 2)
-                    nearby_equipment.append(equip_data)
+        paginator = DistanceCursorPagination(request)
+        if paginator.enabled:
+            ids, distances = paginator.paginate(equipment_index, latitude, longitude, max_distance, tag=equipment_type, keep=keep)
+            return paginator.get_paginated_response(serialize(ids, distances))
         
-        # Sort by distance
-        nearby_equipment.sort(key=lambda x: x['distance'])
+        if keep is not None:
+            # Bookings change all the time, so date searches skip the shared cache
+            ids, distances = equipment_index.within(latitude, longitude, max_distance, tag=equipment_type, keep=keep)
+            return Response(serialize(ids[:limit], distances[:limit]))
         
-        return Response(nearby_equipment)
+        # Filter by distance through the spatial index, reusing a cached payload when possible;
+        # nearby users share cached results, so this search runs from the snapped point
+        snapped_latitude, snapped_longitude = equipment_cache.snap(latitude, longitude)
+        nearby_equipment = equipment_cache.fetch(
+            snapped_latitude, snapped_longitude, max_distance, equipment_type,
+            build=lambda radius: serialize(*equipment_index.within(snapped_latitude, snapped_longitude, radius, tag=equipment_type))
+        )
+        return Response(nearby_equipment[:limit])
+
+    @action(detail=False, methods=['get'])
+    def clusters(self, request):
+        """Map clusters of available equipment inside a bounding box at a zoom level"""
+        return cluster_response(request, equipment_clusters, tag=request.query_params.get('equipment_type'))
+
+    @action(detail=False, methods=['get'])
+    def ratings(self, request):
+        """Rating average, count and histogram for up to 100 pieces of equipment (?ids=1,2,3)"""
+        return rating_batch_response(request, EQUIPMENT_RATINGS)
+
+    @action(detail=False, methods=['get'])
+    def quote(self, request):
+        """
+        Cheapest price of renting up to 500 pieces of equipment (?ids=1,2,3)
+        from start_date to end_date, or for `hours` hours on start_date, with
+        operator charges when operator=true. Unknown ids are left out.
+        """
+        try:
+            ids = parse_ids(request.query_params.get('ids', ''), limit=MAX_QUOTE_ITEMS)
+            start, end = parse_date_range(
+                request.query_params.get('start_date', ''),
+                request.query_params.get('end_date') or request.query_params.get('start_date', '')
+            )
+            hours = request.query_params.get('hours')
+            hours = int(hours) if hours else None
+            if hours is not None and (start != end or not 1 <= hours <= 24):
+                raise ValueError
+        except ValueError:
+            return Response(
+                {'error': f'ids (1 to {MAX_QUOTE_ITEMS}), start_date and end_date (YYYY-MM-DD) are required; '
+                          'hours must be 1-24 on a single day'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        equipment = Equipment.objects.filter(pk__in=ids).select_related('supplier')
+        quotes = quote_rentals(equipment, start, end, request.query_params.get('operator') == 'true', hours)
+        rows = [{'equipment_id': pk, **quotes[pk]} for pk in ids if pk in quotes]
+        return Response(RentalQuoteSerializer(rows, many=True).data)
+
+    @action(detail=True, methods=['get'])
+    def availability(self, request, pk=None):
+        """Whether equipment is free between start_date and end_date, with the bookings in that range"""
+        equipment = get_object_or_404(Equipment, pk=pk)
+        try:
+            start, end = parse_date_range(
+                request.query_params.get('start_date', ''), request.query_params.get('end_date', '')
+            )
+        except ValueError:
+            return Response(
+                {'error': f'start_date and end_date must be dates (YYYY-MM-DD), at most {MAX_RANGE_DAYS} days apart'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        bookings = bookings_between(equipment.pk, start, end)
+        return Response({
+            'equipment_id': equipment.pk,
+            'start_date': start,
+            'end_date': end,
+            'available': conflicting_booking(equipment.pk, start, end) is None,
+            'booked': [{'start_date': b.start_date, 'end_date': b.end_date} for b in bookings],
+        })
 
 
 class SupplierReviewViewSet(viewsets.ModelViewSet):
@@ -428,14 +566,8 @@ class SupplierReviewViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def perform_create(self, serializer):
-        review = serializer.save(reviewer=self.request.user)
-        # Update supplier rating
-        supplier = review.supplier
-        reviews = SupplierReview.objects.filter(supplier=supplier)
-        avg_rating = sum([r.rating for r in reviews]) / len(reviews)
-        supplier.rating = round(avg_rating, 2)
-        supplier.total_reviews = len(reviews)
-        supplier.save()
+        # The supplier's rating aggregates follow review writes (see suppliers.ratings)
+        serializer.save(reviewer=self.request.user)
 
     @action(detail=False, methods=['get'])
     def my_reviews(self, request):
@@ -492,52 +624,84 @@ class OrderViewSet(viewsets.ModelViewSet):
         except Product.DoesNotExist:
             return Response({'error': 'Product not found or unavailable.'}, status=status.HTTP_404_NOT_FOUND)
 
-        if product.stock_quantity < quantity:
-            return Response(
-                {'error': f'Insufficient stock. Only {product.stock_quantity} available.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
         delivery_charges = float(product.supplier.delivery_charges or 0) if delivery_method == 'delivery' else 0
         total_amount = float(product.price) * quantity + delivery_charges
 
-        order = Order.objects.create(
-            supplier=product.supplier,
-            customer=request.user,
-            product=product,
-            quantity=quantity,
-            unit_price=product.price,
-            total_amount=total_amount,
-            delivery_method=delivery_method,
-            delivery_address=delivery_address,
-            delivery_charges=delivery_charges,
-            customer_notes=customer_notes,
-            status='pending',
-            payment_status='pending',
-        )
+        try:
+            with transaction.atomic():
+                order = Order.objects.create(
+                    supplier=product.supplier,
+                    customer=request.user,
+                    product=product,
+                    quantity=quantity,
+                    unit_price=product.price,
+                    total_amount=total_amount,
+                    delivery_method=delivery_method,
+                    delivery_address=delivery_address,
+                    delivery_charges=delivery_charges,
+                    customer_notes=customer_notes,
+                    status='pending',
+                    payment_status='pending',
+                )
+                # Hold the units until the supplier confirms; rolls the order back if they are taken
+                reserve_stock(order)
+                # Notify the supplier and the farmer once the order commits
+                publish('order_placed', [
+                    Notification(
+                        user_id=order.supplier.user_id,
+                        title="New Order Received",
+                        message=f"You have received a new order #{order.id} for {product.name}.",
+                        notification_type='order',
+                        related_object_id=f"SORD-{order.id}"
+                    ),
+                    Notification(
+                        user=request.user,
+                        title="Order Placed",
+                        message=f"Your order for {product.name} has been placed successfully.",
+                        notification_type='order',
+                        related_object_id=f"SORD-{order.id}"
+                    ),
+                ])
+        except InsufficientStock as e:
+            return Response(
+                {'error': f'Insufficient stock. Only {e.available} available.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         serializer = self.get_serializer(order)
         
-        # Create notification for supplier
-        Notification.objects.create(
-            user=order.supplier.user,
-            title="New Order Received",
-            message=f"You have received a new order #{order.id} for {product.name}.",
-            notification_type='order',
-            related_object_id=f"SORD-{order.id}"
-        )
-        
-        # Create notification for farmer
-        Notification.objects.create(
-            user=request.user,
-            title="Order Placed",
-            message=f"Your order for {product.name} has been placed successfully.",
-            notification_type='order',
-            related_object_id=f"SORD-{order.id}"
-        )
-        
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    # ── FARMER: Order several products at once ───────────────────
+    @action(detail=False, methods=['post'])
+    def checkout(self, request):
+        """Farmer orders several products in one go: items=[{"product_id", "quantity"}, ...]."""
+        try:
+            quantities = parse_items(request.data.get('items'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            orders = checkout(
+                request.user, quantities,
+                delivery_method=request.data.get('delivery_method', 'pickup'),
+                delivery_address=request.data.get('delivery_address', ''),
+                customer_notes=request.data.get('customer_notes', ''),
+            )
+        except UnavailableProducts as e:
+            return Response({'error': str(e), 'product_ids': e.product_ids}, status=status.HTTP_404_NOT_FOUND)
+        except InsufficientStock as e:
+            return Response(
+                {'error': f'Insufficient stock for product {e.product_id}. Only {e.available} available.',
+                 'product_id': e.product_id, 'available': e.available},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({
+            'order_numbers': [order.order_number for order in orders],
+            'orders': self.get_serializer(orders, many=True).data,
+        }, status=status.HTTP_201_CREATED)
+
     # ── FARMER: Get their purchase history ───────────────────────
     @action(detail=False, methods=['get'])
     def farmer_orders(self, request):
@@ -559,8 +723,10 @@ class OrderViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Order not found.'}, status=status.HTTP_404_NOT_FOUND)
         if order.status not in ('pending',):
             return Response({'error': f'Cannot cancel order with status: {order.status}.'}, status=status.HTTP_400_BAD_REQUEST)
-        order.status = 'cancelled'
-        order.save(update_fields=['status', 'updated_at'])
+        with transaction.atomic():
+            order.status = 'cancelled'
+            order.save(update_fields=['status', 'updated_at'])
+            release_reservation(order)
         serializer = self.get_serializer(order)
         return Response(serializer.data)
 
@@ -586,68 +752,51 @@ class OrderViewSet(viewsets.ModelViewSet):
         """Update order status and handle inventory"""
         order = self.get_object()
         new_status = request.data.get('status')
-        old_status = order.status
         
         if new_status not in dict(Order.STATUS_CHOICES):
             return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Logic for inventory deduction on confirmation
-        if new_status == 'confirmed' and old_status != 'confirmed':
-            product = order.product
-            if product.stock_quantity < order.quantity:
-                return Response({'error': f'Insufficient stock. Available: {product.stock_quantity}'}, status=status.HTTP_400_BAD_REQUEST)
-            
-            previous_stock = product.stock_quantity
-            product.stock_quantity -= order.quantity
-            product.save()
+        with transaction.atomic():
+            # Lock the order so two concurrent updates cannot both move its stock
+            order = Order.objects.select_for_update().get(pk=order.pk)
+            old_status = order.status
             
-            # Log the stock deduction
-            StockLog.objects.create(
-                product=product,
-                change_type='sale',
-                quantity=-order.quantity,
-                previous_stock=previous_stock,
-                current_stock=product.stock_quantity,
-                note=f"Automatic deduction for Order {order.order_number}",
-                updated_by=request.user
-            )
-        
-        # Logic for inventory return on cancellation
-        if new_status == 'cancelled' and old_status == 'confirmed':
-            product = order.product
-            previous_stock = product.stock_quantity
-            product.stock_quantity += order.quantity
-            product.save()
-            
-            # Log the stock return
-            StockLog.objects.create(
-                product=product,
-                change_type='return',
-                quantity=order.quantity,
-                previous_stock=previous_stock,
-                current_stock=product.stock_quantity,
-                note=f"Stock returned for cancelled Order {order.order_number}",
-                updated_by=request.user
-            )
+            try:
+                # Logic for inventory deduction on confirmation
+                if new_status == 'confirmed' and old_status != 'confirmed':
+                    sell_reserved_stock(order, user=request.user)
+                
+                # Logic for inventory return on cancellation
+                if new_status == 'cancelled' and old_status == 'confirmed':
+                    change_stock(
+                        order.product_id, order.quantity, 'return',
+                        note=f"Stock returned for cancelled Order {order.order_number}", user=request.user
+                    )
 
-        order.status = new_status
-        
-        # Update timestamps based on status
-        if new_status == 'confirmed' and not order.confirmed_at:
-            order.confirmed_at = timezone.now()
-        elif new_status == 'delivered' and not order.delivered_at:
-            order.delivered_at = timezone.now()
+                # Turning down a pending order frees the units it held
+                if new_status in ('cancelled', 'rejected') and old_status == 'pending':
+                    release_reservation(order)
+            except InsufficientStock as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            order.status = new_status
             
-        order.save()
-        
-        # Create notification for customer
-        Notification.objects.create(
-            user=order.customer,
-            title="Order Status Updated",
-            message=f"Your order #{order.id} status has been updated to {new_status}.",
-            notification_type='order',
-            related_object_id=f"SORD-{order.id}"
-        )
+            # Update timestamps based on status
+            if new_status == 'confirmed' and not order.confirmed_at:
+                order.confirmed_at = timezone.now()
+            elif new_status == 'delivered' and not order.delivered_at:
+                order.delivered_at = timezone.now()
+                
+            order.save()
+            
+            # Notify the customer once the update commits
+            publish('order_status_changed', [Notification(
+                user_id=order.customer_id,
+                title="Order Status Updated",
+                message=f"Your order #{order.id} status has been updated to {new_status}.",
+                notification_type='order',
+                related_object_id=f"SORD-{order.id}"
+            )])
         
         serializer = self.get_serializer(order)
         return Response(serializer.data)
@@ -671,17 +820,18 @@ class OrderViewSet(viewsets.ModelViewSet):
         """Get order statistics"""
         try:
             supplier_profile = SupplierProfile.objects.get(user=request.user)
-            orders = Order.objects.filter(supplier=supplier_profile)
+            # Per-status counts and sums from one cached GROUP BY query
+            orders = status_breakdown(Order, supplier_profile.id)
             
             stats = {
-                'total_orders': orders.count(),
-                'pending_orders': orders.filter(status='pending').count(),
-                'confirmed_orders': orders.filter(status='confirmed').count(),
-                'processing_orders': orders.filter(status='processing').count(),
-                'delivered_orders': orders.filter(status='delivered').count(),
-                'cancelled_orders': orders.filter(status='cancelled').count(),
-                'total_revenue': orders.filter(status='delivered').aggregate(Sum('total_amount'))['total_amount__sum'] or 0,
-                'pending_revenue': orders.filter(status__in=['pending', 'confirmed', 'processing']).aggregate(Sum('total_amount'))['total_amount__sum'] or 0,
+                'total_orders': breakdown_count(orders),
+                'pending_orders': breakdown_count(orders, 'pending'),
+                'confirmed_orders': breakdown_count(orders, 'confirmed'),
+                'processing_orders': breakdown_count(orders, 'processing'),
+                'delivered_orders': breakdown_count(orders, 'delivered'),
+                'cancelled_orders': breakdown_count(orders, 'cancelled'),
+                'total_revenue': breakdown_amount(orders, 'delivered'),
+                'pending_revenue': breakdown_amount(orders, 'pending', 'confirmed', 'processing'),
             }
             
             return Response(stats)
@@ -720,66 +870,66 @@ class RentalViewSet(viewsets.ModelViewSet):
             return Response({'error': 'equipment_id, start_date, and end_date are required.'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            equipment = Equipment.objects.get(pk=equipment_id, is_available=True, status='available')
+            equipment = Equipment.objects.select_related('supplier').get(pk=equipment_id, is_available=True, status='available')
         except Equipment.DoesNotExist:
             return Response({'error': 'Equipment not found or currently unavailable for rent.'}, status=status.HTTP_404_NOT_FOUND)
 
-        # Basic duration calculation (days)
-        from datetime import datetime, date
+        # Bounded like every other date range, which also keeps quoting cheap
         try:
-            d1 = datetime.strptime(start_date, '%Y-%m-%d').date()
-            d2 = datetime.strptime(end_date, '%Y-%m-%d').date()
-            duration_days = (d2 - d1).days + 1
-            if duration_days <= 0:
-                raise ValueError
-        except ValueError:
-            return Response({'error': 'Invalid dates. End date must be after start date.'}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Pricing calculations
-        rental_cost = float(equipment.daily_rate) * duration_days
-        operator_charges = float(equipment.operator_charge_per_day or 0) * duration_days if operator_required else 0
-        delivery_charges = float(equipment.supplier.delivery_charges or 0)
-        total_amount = rental_cost + operator_charges + delivery_charges + float(equipment.security_deposit)
-
-        rental = Rental.objects.create(
-            supplier=equipment.supplier,
-            customer=request.user,
-            equipment=equipment,
-            start_date=d1,
-            end_date=d2,
-            daily_rate=equipment.daily_rate,
-            total_rental_cost=rental_cost,
-            security_deposit=equipment.security_deposit,
-            operator_required=operator_required,
-            operator_charges=operator_charges,
-            total_amount=total_amount,
-            delivery_address=delivery_address,
-            delivery_charges=delivery_charges,
-            customer_notes=customer_notes,
-            status='pending',
-            payment_status='pending',
-        )
+            d1, d2 = parse_date_range(start_date, end_date)
+        except (TypeError, ValueError):
+            return Response(
+                {'error': f'Invalid dates. End date must not be before start date, at most {MAX_RANGE_DAYS} days apart.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Fail early when a confirmed rental already holds some of the dates
+        conflict = conflicting_booking(equipment.pk, d1, d2)
+        if conflict is not None:
+            return Response({'error': str(BookingConflict(conflict))}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Cheapest mix of daily, weekly and monthly rates (see suppliers.pricing)
+        operator_required = bool(operator_required) or equipment.requires_operator
+        quote = quote_rental(equipment, d1, d2, operator_required)
+
+        with transaction.atomic():
+            rental = Rental.objects.create(
+                supplier=equipment.supplier,
+                customer=request.user,
+                equipment=equipment,
+                start_date=d1,
+                end_date=d2,
+                daily_rate=equipment.daily_rate,
+                total_rental_cost=quote['rental_cost'],
+                security_deposit=quote['security_deposit'],
+                operator_required=operator_required,
+                operator_charges=quote['operator_charges'],
+                total_amount=quote['total_amount'],
+                delivery_address=delivery_address,
+                delivery_charges=quote['delivery_charges'],
+                customer_notes=customer_notes,
+                status='pending',
+                payment_status='pending',
+            )
+            # Notify the supplier and the farmer once the request commits
+            publish('rental_requested', [
+                Notification(
+                    user_id=equipment.supplier.user_id,
+                    title="New Rental Request",
+                    message=f"You have received a new rental request for {equipment.name}.",
+                    notification_type='rental',
+                    related_object_id=f"RENT-{rental.id}"
+                ),
+                Notification(
+                    user=request.user,
+                    title="Rental Requested",
+                    message=f"Your rental request for {equipment.name} has been submitted.",
+                    notification_type='rental',
+                    related_object_id=f"RENT-{rental.id}"
+                ),
+            ])
 
         serializer = self.get_serializer(rental)
-        
-        # Create notification for supplier
-        Notification.objects.create(
-            user=rental.supplier.user,
-            title="New Rental Request",
-            message=f"You have received a new rental request for {equipment.name}.",
-            notification_type='rental',
-            related_object_id=f"RENT-{rental.id}"
-        )
-        
-        # Create notification for farmer
-        Notification.objects.create(
-            user=request.user,
-            title="Rental Requested",
-            message=f"Your rental request for {equipment.name} has been submitted.",
-            notification_type='rental',
-            related_object_id=f"RENT-{rental.id}"
-        )
-        
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     # ── FARMER: Get their rental requests ────────────────────────
@@ -836,37 +986,45 @@ class RentalViewSet(viewsets.ModelViewSet):
         if new_status not in dict(Rental.STATUS_CHOICES):
             return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
         
-        rental.status = new_status
-        
-        # Update timestamps and equipment status based on rental status
-        if new_status == 'confirmed' and not rental.confirmed_at:
-            rental.confirmed_at = timezone.now()
-        elif new_status == 'active' and not rental.started_at:
-            rental.started_at = timezone.now()
-            # Update equipment status to rented
-            rental.equipment.status = 'rented'
-            rental.equipment.save()
-        elif new_status == 'completed' and not rental.completed_at:
-            rental.completed_at = timezone.now()
-            # Update equipment status back to available
-            rental.equipment.status = 'available'
-            rental.equipment.total_rentals += 1
-            rental.equipment.save()
-        elif new_status == 'cancelled':
-            # Make equipment available again
-            rental.equipment.status = 'available'
-            rental.equipment.save()
-        
-        rental.save()
-        
-        # Create notification for farmer/customer
-        Notification.objects.create(
-            user=rental.customer,
-            title="Rental Status Updated",
-            message=f"Your rental request for {rental.equipment.name} is now {new_status}.",
-            notification_type='rental',
-            related_object_id=f"RENT-{rental.id}"
-        )
+        with transaction.atomic():
+            rental = Rental.objects.select_for_update().select_related('equipment').get(pk=rental.pk)
+            rental.status = new_status
+            
+            # Hold or free the rental's dates in the booking calendar
+            try:
+                sync_booking(rental)
+            except BookingConflict as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Update timestamps and equipment status based on rental status
+            if new_status == 'confirmed' and not rental.confirmed_at:
+                rental.confirmed_at = timezone.now()
+            elif new_status == 'active' and not rental.started_at:
+                rental.started_at = timezone.now()
+                # Update equipment status to rented
+                rental.equipment.status = 'rented'
+                rental.equipment.save(update_fields=['status', 'updated_at'])
+            elif new_status == 'completed' and not rental.completed_at:
+                rental.completed_at = timezone.now()
+                # Update equipment status back to available
+                rental.equipment.status = 'available'
+                rental.equipment.total_rentals += 1
+                rental.equipment.save(update_fields=['status', 'total_rentals', 'updated_at'])
+            elif new_status == 'cancelled':
+                # Make equipment available again
+                rental.equipment.status = 'available'
+                rental.equipment.save(update_fields=['status', 'updated_at'])
+            
+            rental.save()
+            
+            # Notify the farmer once the update commits
+            publish('rental_status_changed', [Notification(
+                user_id=rental.customer_id,
+                title="Rental Status Updated",
+                message=f"Your rental request for {rental.equipment.name} is now {new_status}.",
+                notification_type='rental',
+                related_object_id=f"RENT-{rental.id}"
+            )])
         
         serializer = self.get_serializer(rental)
         return Response(serializer.data)
@@ -890,17 +1048,18 @@ class RentalViewSet(viewsets.ModelViewSet):
         """Get rental statistics"""
         try:
             supplier_profile = SupplierProfile.objects.get(user=request.user)
-            rentals = Rental.objects.filter(supplier=supplier_profile)
+            # Per-status counts and sums from one cached GROUP BY query
+            rentals = status_breakdown(Rental, supplier_profile.id)
             
             stats = {
-                'total_rentals': rentals.count(),
-                'pending_rentals': rentals.filter(status='pending').count(),
-                'confirmed_rentals': rentals.filter(status='confirmed').count(),
-                'active_rentals': rentals.filter(status='active').count(),
-                'completed_rentals': rentals.filter(status='completed').count(),
-                'cancelled_rentals': rentals.filter(status='cancelled').count(),
-                'total_revenue': rentals.filter(status='completed').aggregate(Sum('total_amount'))['total_amount__sum'] or 0,
-                'pending_revenue': rentals.filter(status__in=['pending', 'confirmed', 'active']).aggregate(Sum('total_amount'))['total_amount__sum'] or 0,
+                'total_rentals': breakdown_count(rentals),
+                'pending_rentals': breakdown_count(rentals, 'pending'),
+                'confirmed_rentals': breakdown_count(rentals, 'confirmed'),
+                'active_rentals': breakdown_count(rentals, 'active'),
+                'completed_rentals': breakdown_count(rentals, 'completed'),
+                'cancelled_rentals': breakdown_count(rentals, 'cancelled'),
+                'total_revenue': breakdown_amount(rentals, 'completed'),
+                'pending_revenue': breakdown_amount(rentals, 'pending', 'confirmed', 'active'),
             }
             
             return Response(stats)
@@ -929,5 +1088,22 @@ class ProductReviewViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Supplier profile not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
-
-
+class EquipmentReviewViewSet(viewsets.ModelViewSet):
+    """ViewSet for equipment reviews"""
+    queryset = EquipmentReview.objects.all()
+    serializer_class = EquipmentReviewSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def perform_create(self, serializer):
+        serializer.save(reviewer=self.request.user)
+        
+    @action(detail=False, methods=['get'])
+    def my_equipment_reviews(self, request):
+        """Get reviews for all equipment of the current supplier"""
+        try:
+            supplier_profile = SupplierProfile.objects.get(user=request.user)
+            reviews = EquipmentReview.objects.filter(equipment__supplier=supplier_profile)
+            serializer = self.get_serializer(reviews, many=True)
+            return Response(serializer.data)
+        except SupplierProfile.DoesNotExist:
+            return Response({'error': 'Supplier profile not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -66,7 +66,7 @@ def test_search_api():
     print("\n4. Testing distance calculation...")
     test_lat, test_lon = 13.0827, 77.5877  # Bangalore center
     
-    from suppliers.views import haversine
+    from geo.utils import haversine
     
     for supplier in SupplierProfile.objects.filter(
         is_active=True, 
@@ -112,7 +112,7 @@ const BuyProducts = () => {
     const addToCart = (product) => {
         const existing = cart.find(item => item.id === product.id);
         if (existing) {
-            if (existing.quantity >= product.stock_quantity) {
+            if (existing.quantity >= product.available_to_sell) {
                 toast.warn('Cannot add more than available stock.');
                 return;
             }
@@ -133,7 +133,7 @@ const BuyProducts = () => {
         setCart(cart.map(item => {
             if (item.id === productId) {
                 const newQuantity = item.quantity + change;
-                if (newQuantity > (product?.stock_quantity || 999)) {
+                if (newQuantity > (product?.available_to_sell || 999)) {
                     toast.warn('Limit reached according to stock.');
                     return item;
                 }
@@ -331,15 +331,15 @@ const BuyProducts = () => {
                                                 <span style={{ fontSize: 22, fontWeight: 800, color: '#166534' }}>₹{product.price}</span>
                                                 <span style={{ fontSize: 13, color: '#6B7280' }}> / {product.unit}</span>
                                             </div>
-                                            <span style={{ fontSize: 12, color: product.stock_quantity < 10 ? '#DC2626' : '#166534', fontWeight: 600 }}>
-                                                {product.stock_quantity > 0 ? `${product.stock_quantity} in stock` : 'Out of stock'}
+                                            <span style={{ fontSize: 12, color: product.available_to_sell < 10 ? '#DC2626' : '#166534', fontWeight: 600 }}>
+                                                {product.available_to_sell > 0 ? `${product.available_to_sell} in stock` : 'Out of stock'}
                                             </span>
                                         </div>
 
                                         <button
                                             className="adv-btn-primary"
                                             onClick={() => addToCart(product)}
-                                            disabled={product.stock_quantity <= 0}
+                                            disabled={product.available_to_sell <= 0}
                                             style={{ marginTop: 16, width: '100%', justifyContent: 'center' }}
                                         >
                                             <FaPlus /> Add to Cart